@@ -4,6 +4,17 @@ setup(
     name="lemmatization-lists",
     version="0.1",
     packages=find_packages(),
+    install_requires=[
+        "numpy",
+        "spacy",
+        "unidecode"
+    ],
+    extras_require={
+        # lemmatization_lists.columnar
+        "columnar": ["pandas", "pyarrow"],
+        # Zstandard compressed lemmatization lists
+        "zstd": ["zstandard"]
+    },
 
     # metadata to display on PyPI
     author="jpquiroga",
@@ -0,0 +1,306 @@
+"""
+Reproducible benchmarks of the lemmatizers: dictionary load time and memory, lookup throughput on a Zipfian token
+stream and Spanish verb tools throughput.
+
+Results are written as JSON and can be compared against a stored baseline:
+
+    python -m lemmatization_lists.benchmarks --output results.json
+    python -m lemmatization_lists.benchmarks --baseline results.json --tolerance 0.2
+
+Metric names tell how they compare: `*_per_s` metrics are better when higher, every other timing (`*_s`, `*_ms`)
+and memory (`*_mb`) metric is better when lower.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Text
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+
+def rss_mb() -> float:
+    """
+    :return: Current resident set size of the process in MB (peak RSS on platforms without /proc).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        factor = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * factor / (1024 * 1024)
+
+
+def zipf_stream(words: List[Text], num_tokens: int, exponent: float = 1.0, seed: int = 0) -> List[Text]:
+    """
+    Draw a token stream where the frequency of the word of rank r is proportional to 1 / r^exponent.
+    :param words: Vocabulary. Ranks are assigned by a seeded shuffle.
+    :param num_tokens: Length of the stream.
+    :param exponent: Zipf exponent.
+    :param seed: Random seed.
+    :return: List of tokens.
+    """
+    rnd = random.Random(seed)
+    ranked = sorted(words)
+    rnd.shuffle(ranked)
+    weights = [1.0 / (r ** exponent) for r in range(1, len(ranked) + 1)]
+    return rnd.choices(ranked, weights=weights, k=num_tokens)
+
+
+def _throughput(f, tokens: List[Text], repeat: int) -> float:
+    """
+    :return: Best number of calls per second of f over the tokens.
+    """
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for t in tokens:
+            f(t)
+        elapsed = time.perf_counter() - start_time
+        if best is None or elapsed < best:
+            best = elapsed
+    return len(tokens) / best
+
+
+def benchmark_language(lang: Text, num_tokens: int = 100000, repeat: int = 3, seed: int = 0,
+                       lexicon_format: Text = "dict") -> Dict[Text, float]:
+    """
+    Benchmark DictionaryLemmatizer for one language, in the current process.
+    :param lang: Language.
+    :param num_tokens: Length of the Zipfian token stream.
+    :param repeat: Number of runs of every throughput measure (the best one is kept).
+    :param seed: Random seed.
+    :param lexicon_format: See DictionaryLemmatizer.
+    :return: Dictionary of metrics.
+    """
+    from lemmatization_lists.lemmatizers import DictionaryLemmatizer
+    rss_before = rss_mb()
+    start_time = time.perf_counter()
+    lemmatizer = DictionaryLemmatizer(lang, lexicon_format=lexicon_format)
+    load_time = time.perf_counter() - start_time
+    rss_after = rss_mb()
+    tokens = zipf_stream(list(lemmatizer.lemma_dict), num_tokens, seed=seed)
+    return {
+        "load_s": load_time,
+        "rss_mb": rss_after - rss_before,
+        "entries": len(lemmatizer.lemma_dict),
+        "get_lemma_per_s": _throughput(lemmatizer.get_lemma, tokens, repeat),
+        "get_lema_norm_per_s": _throughput(lemmatizer.get_lema_norm, tokens, repeat)
+    }
+
+
+def benchmark_spanish_verbs(num_tokens: int = 20000, num_verbs: int = 500, repeat: int = 3, seed: int = 0,
+                            db_file_path: Optional[Text] = None) -> Dict[Text, float]:
+    """
+    Benchmark SpanishVerbFlexioner and SpanishVerbAnalyzer, in the current process.
+    :param num_tokens: Length of the Zipfian stream of verbal forms.
+    :param num_verbs: Number of verbs of the temporary database (if db_file_path is None).
+    :param repeat: Number of runs of every throughput measure (the best one is kept).
+    :param seed: Random seed.
+    :param db_file_path: Verbs database. If None, a temporary database with num_verbs verbs is built.
+    :return: Dictionary of metrics.
+    """
+    from lemmatization_lists.language.lemma.es.lemma_tools import _VERB_LIST_PATH, SpanishVerbAnalyzer, \
+        SpanishVerbDatabaseBuilder, SpanishVerbFlexioner
+    with open(_VERB_LIST_PATH, "r") as f:
+        verbs = [l.strip() for l in f if len(l.strip()) > 0 and not l.startswith("#")]
+    res = {}
+    start_time = time.perf_counter()
+    flexioner = SpanishVerbFlexioner()
+    res["flexioner_load_s"] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    num_forms = 0
+    for v in verbs:
+        forms = flexioner.get_all_simple_forms(v)
+        if forms is not None:
+            num_forms += len(forms)
+    res["flexioner_forms_per_s"] = num_forms / (time.perf_counter() - start_time)
+
+    sample = random.Random(seed).sample(verbs, min(num_verbs, len(verbs)))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if db_file_path is None:
+            db_file_path = os.path.join(tmp_dir, "spanish_verbs.db")
+            SpanishVerbDatabaseBuilder(db_file_path).insert_data(sample)
+        forms = [f for v in sample for f in (flexioner.get_all_simple_forms(v) or [])]
+        tokens = zipf_stream(list(set(forms)), num_tokens, seed=seed)
+        analyzer = SpanishVerbAnalyzer(db_file_path)
+        res["get_verb_info_per_s"] = _throughput(analyzer.get_verb_info, tokens, repeat)
+        res["get_verb_info_accent_insensitive_per_s"] = _throughput(
+            lambda t: analyzer.get_verb_info(t, accent_insensitive=True), tokens, repeat)
+        analyzer.close()
+    return res
+
+
+def benchmark_formats(lang: Text, repeat: int = 3) -> Dict[Text, Dict[Text, float]]:
+    """
+    Compare the size and parse time of the lemmatization list of a language stored in every supported format.
+    :param lang: Language.
+    :param repeat: Number of parses of every format (the best one is kept).
+    :return: Dictionary format -> metrics.
+    """
+    import gzip
+    import lzma
+    from lemmatization_lists.lemmatizers import LEMMATIZATION_LIST_EXTENSIONS, _decompressing_stream, \
+        _parse_lemmatization_line, open_lemmatization_list, zstandard
+    with open_lemmatization_list(lang) as f:
+        content = f.read()
+    compressors = {
+        ".txt": lambda b: b,
+        ".txt.gz": gzip.compress,
+        ".txt.xz": lzma.compress
+    }
+    if zstandard is not None:
+        compressors[".txt.zst"] = lambda b: zstandard.ZstdCompressor(level=19).compress(b)
+    res = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for extension in LEMMATIZATION_LIST_EXTENSIONS:
+            if extension not in compressors:
+                continue
+            path = os.path.join(tmp_dir, "lemmatization-{}{}".format(lang, extension))
+            with open(path, "wb") as f:
+                f.write(compressors[extension](content))
+            best = None
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                with open(path, "rb") as raw:
+                    with _decompressing_stream(raw, extension) as f:
+                        for line in f:
+                            _parse_lemmatization_line(line)
+                elapsed = time.perf_counter() - start_time
+                if best is None or elapsed < best:
+                    best = elapsed
+            res[extension.lstrip(".")] = {
+                "size_mb": os.path.getsize(path) / (1024 * 1024),
+                "parse_s": best
+            }
+    return res
+
+
+def benchmark_lists_processing(lang: Text, processes: Optional[int] = None) -> Dict[Text, float]:
+    """
+    Compare the generation of the normalized list of a language in memory and with external sorts (serial and with a
+    process pool).
+    :param lang: Language.
+    :param processes: Size of the process pool (default: number of CPUs).
+    :return: Dictionary metric -> value.
+    """
+    from lemmatization_lists.lists_processing import list_process
+    res = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dest_file = os.path.join(tmp_dir, "lemmatization-norm-{}.txt".format(lang))
+        start_time = time.perf_counter()
+        list_process(lang, dest_file, in_memory=True)
+        res["in_memory_s"] = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        list_process(lang, dest_file, tmp_dir=tmp_dir, in_memory=False)
+        res["external_s"] = time.perf_counter() - start_time
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            start_time = time.perf_counter()
+            list_process(lang, dest_file, executor, tmp_dir=tmp_dir, in_memory=False)
+            res["external_pool_s"] = time.perf_counter() - start_time
+    return res
+
+
+def _run_isolated(f, *args):
+    """
+    Run f in a fresh interpreter, so that load time and memory are not affected by previous benchmarks.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(f, *args).result()
+
+
+def run_benchmarks(langs: List[Text], num_tokens: int = 100000, repeat: int = 3, seed: int = 0,
+                   spanish_verbs: bool = True, isolated: bool = True, formats: bool = False,
+                   lists_processing: bool = False) -> Dict:
+    """
+    :param langs: Languages to benchmark.
+    :param num_tokens: Length of the Zipfian token streams.
+    :param repeat: Number of runs of every throughput measure (the best one is kept).
+    :param seed: Random seed.
+    :param spanish_verbs: Whether to benchmark the Spanish verb tools.
+    :param isolated: Whether to run every benchmark in a fresh interpreter.
+    :param formats: Whether to benchmark the compressed list formats.
+    :param lists_processing: Whether to benchmark the generation of the normalized lists.
+    :return: Benchmark results: {"meta": {...}, "results": {benchmark: {metric: value}}}.
+    """
+    run = _run_isolated if isolated else (lambda f, *args: f(*args))
+    results = {}
+    for lang in langs:
+        results["dictionary_{}".format(lang)] = run(benchmark_language, lang, num_tokens, repeat, seed)
+        if formats:
+            for extension, metrics in benchmark_formats(lang, repeat).items():
+                results["format_{}_{}".format(lang, extension.replace(".", "_"))] = metrics
+        if lists_processing:
+            results["lists_processing_{}".format(lang)] = run(benchmark_lists_processing, lang)
+    if spanish_verbs:
+        results["spanish_verbs"] = run(benchmark_spanish_verbs, num_tokens // 5, 500, repeat, seed)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tokens": num_tokens,
+            "repeat": repeat,
+            "seed": seed
+        },
+        "results": results
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Text]:
+    """
+    Compare benchmark results against a baseline.
+    :param results: Results of run_benchmarks.
+    :param baseline: Baseline results of run_benchmarks.
+    :param tolerance: Allowed relative degradation of every metric.
+    :return: Descriptions of the metrics that degraded more than tolerance.
+    """
+    regressions = []
+    for name, metrics in results["results"].items():
+        baseline_metrics = baseline["results"].get(name, {})
+        for metric, value in metrics.items():
+            base = baseline_metrics.get(metric)
+            if base is None or base == 0 or metric == "entries":
+                continue
+            change = (value - base) / abs(base)
+            if metric.endswith("_per_s"):
+                change = -change
+            if change > tolerance:
+                regressions.append("{}.{}: {:.4g} -> {:.4g} ({:+.1%})".format(name, metric, base, value, change))
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+    from lemmatization_lists.lemmatizers import get_available_languages
+    parser = argparse.ArgumentParser(description="Lemmatizers benchmarks.")
+    parser.add_argument("--langs", nargs="*", help="Languages (default: all the available ones)")
+    parser.add_argument("--tokens", type=int, default=100000, help="Length of the token streams")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-spanish-verbs", action="store_true")
+    parser.add_argument("--in-process", action="store_true", help="Do not isolate benchmarks in subprocesses")
+    parser.add_argument("--formats", action="store_true", help="Also compare compressed list formats")
+    parser.add_argument("--lists-processing", action="store_true",
+                        help="Also compare the generation of the normalized lists in memory and with external sorts")
+    parser.add_argument("--output", help="JSON file to write the results to (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    _results = run_benchmarks(args.langs or get_available_languages(), args.tokens, args.repeat, args.seed,
+                              not args.no_spanish_verbs, not args.in_process, args.formats, args.lists_processing)
+    if args.output:
+        with open(args.output, "w") as _f:
+            json.dump(_results, _f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(_results, indent=2, sort_keys=True))
+    if args.baseline:
+        with open(args.baseline) as _f:
+            _regressions = compare(_results, json.load(_f), args.tolerance)
+        for _r in _regressions:
+            print("REGRESSION " + _r, file=sys.stderr)
+        sys.exit(1 if len(_regressions) > 0 else 0)
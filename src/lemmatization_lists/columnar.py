@@ -0,0 +1,107 @@
+"""
+Vectorized lemmatization of pandas and Arrow columns of tokens.
+
+Columns are factorized first, so that every distinct token is lemmatized once and the cost grows with the vocabulary
+of the column instead of its length. Results are dictionary encoded (pandas categoricals, Arrow dictionary arrays):
+the lemma of every row is an integer code into the distinct lemmas.
+"""
+from typing import List, Text, Tuple, Union
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow
+    import pyarrow.compute
+except ImportError:
+    pyarrow = None
+
+from .lemmatizers import DictionaryLemmatizer
+
+
+OUTPUTS = [
+    "first",
+    "list"
+]
+
+
+def _lemmatize_uniques(lemmatizer: DictionaryLemmatizer, uniques: List[Text], output: Text,
+                       normalized: bool) -> Tuple[np.ndarray, List]:
+    """
+    :param lemmatizer:
+    :param uniques: Distinct tokens.
+    :param output: "first" or "list".
+    :param normalized: Whether to return normalized lemmas (get_lema_norm) instead of lemmas (get_lemma).
+    :return: For "first", (codes, lemmas): codes[i] is the position in lemmas of the first lemma of uniques[i].
+      For "list", (None, lemmas): lemmas[i] is the list of lemmas of uniques[i].
+    """
+    if output not in OUTPUTS:
+        raise ValueError("Output '{}' is not supported".format(output))
+    get_lemma = lemmatizer.get_lema_norm if normalized else lemmatizer.get_lemma
+    if output == "list":
+        return None, [get_lemma(t) for t in uniques]
+    codes = np.empty(len(uniques), dtype=np.int64)
+    lemma_codes = {}
+    for i, t in enumerate(uniques):
+        lemma = get_lemma(t)[0]
+        code = lemma_codes.get(lemma)
+        if code is None:
+            code = len(lemma_codes)
+            lemma_codes[lemma] = code
+        codes[i] = code
+    return codes, list(lemma_codes)
+
+
+def lemmatize_series(lemmatizer: DictionaryLemmatizer, tokens: pd.Series, output: Text = "first",
+                     normalized: bool = False) -> pd.Series:
+    """
+    Lemmatize a pandas Series of tokens.
+    :param lemmatizer:
+    :param tokens: Series of strings. Missing values stay missing.
+    :param output: "first" for the first lemma of every token, as a categorical Series; "list" for the list of all
+      its lemmas (the lists of equal tokens are the same object, and must not be modified).
+    :param normalized: Whether to return normalized lemmas (get_lema_norm) instead of lemmas (get_lemma).
+    :return: Series of lemmas with the index of tokens.
+    """
+    token_codes, uniques = pd.factorize(tokens)
+    lemma_codes, lemmas = _lemmatize_uniques(lemmatizer, list(uniques), output, normalized)
+    if output == "list":
+        values = np.empty(len(lemmas) + 1, dtype=object)
+        values[:len(lemmas)] = lemmas
+        values[-1] = None
+        # Missing tokens have code -1, which selects the trailing None
+        return pd.Series(values[token_codes], index=tokens.index, name=tokens.name)
+    codes = np.where(token_codes >= 0, lemma_codes[np.maximum(token_codes, 0)], -1) if len(uniques) > 0 \
+        else token_codes
+    return pd.Series(pd.Categorical.from_codes(codes, categories=lemmas), index=tokens.index, name=tokens.name)
+
+
+def lemmatize_arrow(lemmatizer: DictionaryLemmatizer, tokens: Union["pyarrow.Array", "pyarrow.ChunkedArray"],
+                    output: Text = "first", normalized: bool = False) -> "pyarrow.Array":
+    """
+    Lemmatize an Arrow array of tokens.
+    :param lemmatizer:
+    :param tokens: String array, chunked array or dictionary array. Nulls stay null.
+    :param output: "first" for the first lemma of every token, as a dictionary array; "list" for the list of all
+      its lemmas, as a list array.
+    :param normalized: Whether to return normalized lemmas (get_lema_norm) instead of lemmas (get_lemma).
+    :return: Array of lemmas.
+    """
+    if pyarrow is None:
+        raise ImportError("pyarrow is required to lemmatize Arrow arrays")
+    if isinstance(tokens, pyarrow.ChunkedArray):
+        tokens = tokens.combine_chunks()
+    if not isinstance(tokens, pyarrow.DictionaryArray):
+        tokens = pyarrow.compute.dictionary_encode(tokens)
+    lemma_codes, lemmas = _lemmatize_uniques(lemmatizer, tokens.dictionary.to_pylist(), output, normalized)
+    if output == "list":
+        return pyarrow.array(lemmas, type=pyarrow.list_(pyarrow.string())).take(tokens.indices)
+    indices = pyarrow.compute.take(pyarrow.array(lemma_codes, type=pyarrow.int32()), tokens.indices)
+    return pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(lemmas, type=pyarrow.string()))
+
+
+def lemmatize_column(lemmatizer: DictionaryLemmatizer, tokens, output: Text = "first", normalized: bool = False):
+    """
+    Lemmatize a pandas Series (see lemmatize_series) or an Arrow array (see lemmatize_arrow).
+    """
+    if isinstance(tokens, pd.Series):
+        return lemmatize_series(lemmatizer, tokens, output, normalized)
+    return lemmatize_arrow(lemmatizer, tokens, output, normalized)
@@ -0,0 +1,258 @@
+# coding=utf-8
+"""
+Lemmatization lexicons stored in a shared MySQL/MariaDB database.
+
+All languages share one table with a row per (word, lemma) pair, indexed from forms to lemmas (exact and
+normalized) and from lemmas to forms. Lookups are batched into IN queries and served through a local read-through
+cache, so that repeated words never reach the database.
+"""
+from lemmatization_lists.cache import LRUCache
+from lemmatization_lists.lemmatizers import _normalize_word, read_lemmatization_pairs
+import time
+
+
+_TABLE = "lemmatization_lexicon"
+
+_CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS {} (
+        lang VARCHAR(8) NOT NULL,
+        word VARCHAR(255) NOT NULL,
+        word_norm VARCHAR(255) NOT NULL,
+        lemma VARCHAR(255) NOT NULL,
+        lemma_norm VARCHAR(255) NOT NULL,
+        position SMALLINT UNSIGNED NOT NULL,
+        word_order INT UNSIGNED NOT NULL,
+        PRIMARY KEY (lang, word, position),
+        KEY word_norm_idx (lang, word_norm),
+        KEY lemma_idx (lang, lemma, word)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin
+""".format(_TABLE)
+
+_INSERT_PREFIX = "INSERT INTO {} (lang, word, word_norm, lemma, lemma_norm, position, word_order) VALUES ".format(
+    _TABLE)
+_INSERT_ROW = "(%s, %s, %s, %s, %s, %s, %s)"
+_ROW_SIZE = _INSERT_ROW.count("%s")
+
+
+class MySQLLexiconStore(object):
+    """
+    DictionaryLemmatizer compatible lookups (get_lemma, get_lema_norm) backed by a MySQL table.
+    """
+
+    def __init__(self, connection_manager, lang, cache_size=100000, batch_size=1000, metrics=None):
+        """
+        Args:
+            - connection_manager: database.mysql_utils.DBConnectionManager.
+            - lang: Language.
+            - cache_size: Maximum number of cached lookups (0 disables the cache).
+            - batch_size: Maximum number of rows per insert statement and of words per lookup query.
+            - metrics: Optional lemmatization_lists.metrics.Metrics instance to record cache and query metrics.
+        """
+        self.connection_manager = connection_manager
+        self.lang = lang
+        self.batch_size = batch_size
+        self.metrics = metrics
+        self._metrics_labels = (("lang", lang),)
+        self._cache = LRUCache(cache_size) if cache_size > 0 else None
+        self._cache_norm = LRUCache(cache_size) if cache_size > 0 else None
+
+    def create_table(self):
+        with self.connection_manager.pooled_connection() as db_connection:
+            db_connection.cursor().execute(_CREATE_TABLE)
+            db_connection.commit()
+
+    def load(self, pairs=None):
+        """
+        Replace the lexicon of the language with the entries of its lemmatization list, using multi-row inserts of
+        batch_size rows. As in DictionaryLemmatizer, every lemma is also registered as a form of itself, and words
+        keep the order of their first appearance (word_order), which decides the normalized lookups.
+        Args:
+            - pairs: Iterable of (lemma, word) pairs. If None, the pairs of the lemmatization list of the language.
+        Returns:
+            Number of inserted rows.
+        """
+        if pairs is None:
+            pairs = read_lemmatization_pairs(self.lang)
+        _lemma_dict = {}
+        for lemma, word in pairs:
+            for _w in (word, lemma):
+                _lemmas = _lemma_dict.setdefault(_w, [])
+                if lemma not in _lemmas:
+                    _lemmas.append(lemma)
+        self.create_table()
+        _num_rows = 0
+        with self.connection_manager.pooled_connection() as db_connection:
+            cursor = db_connection.cursor()
+            cursor.execute("DELETE FROM {} WHERE lang = %s".format(_TABLE), (self.lang,))
+            _rows = []
+            for word_order, (word, lemmas) in enumerate(_lemma_dict.items()):
+                _word_norm = _normalize_word(word)
+                for position, lemma in enumerate(lemmas):
+                    _rows.extend((self.lang, word, _word_norm, lemma, _normalize_word(lemma), position, word_order))
+                    if len(_rows) >= _ROW_SIZE * self.batch_size:
+                        _num_rows += self._insert_rows(cursor, _rows)
+                        _rows = []
+            if len(_rows) > 0:
+                _num_rows += self._insert_rows(cursor, _rows)
+            db_connection.commit()
+        self.clear_cache()
+        return _num_rows
+
+    def _insert_rows(self, cursor, flat_rows):
+        _num_rows = len(flat_rows) // _ROW_SIZE
+        cursor.execute(_INSERT_PREFIX + ",".join([_INSERT_ROW] * _num_rows), flat_rows)
+        return _num_rows
+
+    def clear_cache(self):
+        if self._cache is not None:
+            self._cache.clear()
+            self._cache_norm.clear()
+
+    def _query(self, sql, words):
+        """
+        Run a lookup query for a batch of words, in chunks of batch_size words.
+        Args:
+            - sql: Query template with a {} placeholder for the IN list. Its parameters are the language followed by
+              the words, repeated `sql.count("{}")` times.
+            - words: List of distinct words.
+        Returns:
+            List of result rows.
+        """
+        _res = []
+        _num_lists = sql.count("{}")
+        with self.connection_manager.pooled_connection() as db_connection:
+            cursor = db_connection.cursor()
+            for i in range(0, len(words), self.batch_size):
+                _chunk = words[i:i + self.batch_size]
+                _placeholders = ",".join(["%s"] * len(_chunk))
+                _start_time = time.perf_counter()
+                cursor.execute(sql.format(*([_placeholders] * _num_lists)), [self.lang] + _chunk * _num_lists)
+                _res.extend(cursor.fetchall())
+                if self.metrics is not None:
+                    self.metrics.observe("lexicon_query_seconds", time.perf_counter() - _start_time,
+                                         self._metrics_labels)
+        return _res
+
+    def _fetch_lemmas(self, words):
+        _found = {}
+        for word, lemma in self._query("SELECT word, lemma FROM {} WHERE lang = %s AND word IN ({{}}) "
+                                       "ORDER BY word, position".format(_TABLE), words):
+            _found.setdefault(word, []).append(lemma)
+        return _found
+
+    def _fetch_lemmas_norm(self, words):
+        return self._select_lemmas_norm(self._query(
+            "SELECT word, word_norm, lemma_norm, word_order FROM {} WHERE lang = %s "
+            "AND (word IN ({{}}) OR word_norm IN ({{}})) ORDER BY word, position".format(_TABLE), words), words)
+
+    @staticmethod
+    def _select_lemmas_norm(rows, words):
+        """
+        Reproduce DictionaryLemmatizer.lemma_dict_norm: words are processed in order of first appearance, and each one
+        sets its normalized lemmas for itself and then for its normalized form, so the last one wins.
+        Args:
+            - rows: (word, word_norm, lemma_norm, word_order) rows, sorted by word and position.
+            - words: Requested words.
+        Returns:
+            Dictionary word -> normalized lemmas, for the requested words which were found.
+        """
+        _lemmas = {}
+        _steps = {}
+        _words = set(words)
+        for word, word_norm, lemma_norm, word_order in rows:
+            _lemmas.setdefault(word, []).append(lemma_norm)
+            if word in _words:
+                _steps[word] = max(_steps.get(word, (-1, 0, None)), (word_order, 0, word))
+            if word_norm in _words:
+                _steps[word_norm] = max(_steps.get(word_norm, (-1, 0, None)), (word_order, 1, word))
+        return {key: _lemmas[word] for key, (_, _, word) in _steps.items()}
+
+    def _lookup(self, words, cache, fetch):
+        """
+        Args:
+            - words: Iterable of words.
+            - cache: Read-through cache (or None).
+            - fetch: Function from a list of distinct lower cased words to a dictionary word -> lemmas.
+        Returns:
+            List of lists of lemmas, one per word. Unknown words are their own lemma. Lists are copies, so that
+            callers cannot modify the cached ones.
+        """
+        _words = [w.lower() for w in words]
+        _res = {}
+        _missing = []
+        for w in _words:
+            if w in _res:
+                continue
+            _lemmas = cache.get(w) if cache is not None else None
+            if self.metrics is not None and cache is not None:
+                self.metrics.cache_access("lexicon", _lemmas is not None, self._metrics_labels)
+            if _lemmas is None:
+                _missing.append(w)
+                _res[w] = None
+            else:
+                _res[w] = _lemmas
+        if len(_missing) > 0:
+            _found = fetch(_missing)
+            for w in _missing:
+                # Unknown words are cached too, as their own lemma
+                _lemmas = _found.get(w, [w])
+                _res[w] = _lemmas
+                if cache is not None:
+                    cache.put(w, _lemmas)
+        return [list(_res[w]) for w in _words]
+
+    def get_lemmas(self, words):
+        """
+        Batched get_lemma: at most one query per batch_size words not in the cache.
+        """
+        return self._lookup(words, self._cache, self._fetch_lemmas)
+
+    def get_lemmas_norm(self, words):
+        """
+        Batched get_lema_norm.
+        """
+        return self._lookup(words, self._cache_norm, self._fetch_lemmas_norm)
+
+    def get_lemma(self, word):
+        """
+        Same contract as DictionaryLemmatizer.get_lemma.
+        """
+        return self.get_lemmas([word])[0]
+
+    def get_lema_norm(self, word):
+        """
+        Same contract as DictionaryLemmatizer.get_lema_norm.
+        """
+        return self.get_lemmas_norm([word])[0]
+
+    def get_forms(self, lemma):
+        """
+        Reverse lookup.
+        Args:
+            - lemma:
+        Returns:
+            Sorted list of the words with the given lemma.
+        """
+        with self.connection_manager.pooled_connection() as db_connection:
+            cursor = db_connection.cursor()
+            cursor.execute("SELECT word FROM {} WHERE lang = %s AND lemma = %s ORDER BY word".format(_TABLE),
+                           (self.lang, lemma))
+            return [row[0] for row in cursor.fetchall()]
+
+
+if __name__ == "__main__":
+    import argparse
+    import configparser
+    from lemmatization_lists.database.mysql_utils import DBConnectionManagerInitializer
+    parser = argparse.ArgumentParser(description="Bulk load lemmatization lists into a MySQL database.")
+    parser.add_argument("config", help="Config file with a [DATABASE] section")
+    parser.add_argument("langs", nargs="+")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    _config_parser = configparser.ConfigParser()
+    _config_parser.read(args.config)
+    _manager = DBConnectionManagerInitializer(_config_parser)
+    for _lang in args.langs:
+        _start_time = time.perf_counter()
+        _rows = MySQLLexiconStore(_manager, _lang, batch_size=args.batch_size).load()
+        print("{}: {} rows in {:.1f} s".format(_lang, _rows, time.perf_counter() - _start_time))
@@ -1,64 +1,280 @@
 # coding=utf-8
+from contextlib import contextmanager
 import MySQLdb
+import threading
 import time
 
+
+class PoolExhaustedError(Exception):
+    """
+    No connection could be checked out from the pool before the timeout.
+    """
+    pass
+
+
 class DBConnectionManager(object):
+    """
+    Bounded, thread safe pool of MySQL connections.
 
-    def __init__(self, db_host, db_port, db_user, db_password, db_name):
+    Connections are checked out with checkout_connection and must be given back with release_connection (or used
+    through the pooled_connection() context manager). get_connection keeps returning a single shared connection,
+    which stays checked out, for the callers which never release it. Idle connections are reused in LIFO order, so
+    the most recently used ones stay warm and the others expire after idle_timeout seconds. A connection idle for
+    more than ping_interval seconds is validated with a ping before being handed out.
+    """
+
+    def __init__(self, db_host, db_port, db_user, db_password, db_name, max_connections=10, idle_timeout=300.0,
+                 ping_interval=30.0, checkout_timeout=30.0, metrics=None):
         """
         Args:
             - db_host:
+            - db_port:
             - db_user:
             - db_password:
             - db_name:
+            - max_connections: Maximum number of open connections (idle plus checked out).
+            - idle_timeout: Idle connections older than this number of seconds are closed.
+            - ping_interval: Idle connections older than this number of seconds are pinged before reuse.
+            - checkout_timeout: Default number of seconds to wait for a free connection, after which
+              PoolExhaustedError is raised (None waits forever).
+            - metrics: Optional lemmatization_lists.metrics.Metrics instance to record pool metrics.
         """
         self.db_host = db_host
         self.db_port = db_port
         self.db_user = db_user
         self.db_password = db_password
         self.db_name = db_name
-        self.db_connection = None
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.checkout_timeout = checkout_timeout
+        self.metrics = metrics
+        # Stack of (connection, release time)
+        self._idle = []
+        self._num_connections = 0
+        self._condition = threading.Condition()
+        # Connection returned by get_connection, and time of its last check
+        self._shared_connection = None
+        self._shared_checked_at = None
+        self._shared_lock = threading.Lock()
+        self._stats = {
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "pings": 0,
+            "failed_pings": 0
+        }
+
+    def _connect(self):
+        return MySQLdb.connect(host=self.db_host,
+                               port=self.db_port,
+                               user=self.db_user,
+                               password=self.db_password,
+                               db=self.db_name,
+                               charset="utf8")
+
+    def _count(self, stat, value=1):
+        """
+        Must be called holding self._condition.
+        """
+        self._stats[stat] += value
+        if self.metrics is not None:
+            self.metrics.inc("db_pool_{}_total".format(stat), value)
+
+    def _close(self, db_connection):
+        try:
+            db_connection.close()
+        except Exception:
+            pass
+
+    def _expire_idle(self, now):
+        """
+        Close the idle connections released more than idle_timeout seconds ago. Must be called holding
+        self._condition.
+        """
+        expired = 0
+        while expired < len(self._idle) and now - self._idle[expired][1] > self.idle_timeout:
+            self._close(self._idle[expired][0])
+            expired += 1
+        if expired > 0:
+            del self._idle[:expired]
+            self._num_connections -= expired
+            self._count("closed", expired)
+            self._condition.notify(expired)
 
     def get_connection(self):
-        if self.db_connection == None or self.db_connection.open == 0:
-            self.db_connection = MySQLdb.connect(host=self.db_host,
-                                                 port=self.db_port,
-                                                 user=self.db_user,
-                                                 password=self.db_password,
-                                                 db=self.db_name,
-                                                 charset="utf8")
-        elif not self._check_connection(self.db_connection):
-            self.db_connection = MySQLdb.connect(host=self.db_host,
-                                                 port=self.db_port,
-                                                 user=self.db_user,
-                                                 password=self.db_password,
-                                                 db=self.db_name,
-                                                 charset="utf8")
-        return self.db_connection
+        """
+        Get the shared connection of the manager, which is reopened if it was closed or does not answer a ping.
+        It is checked out from the pool once, and must not be released.
+        Returns:
+            An open MySQLdb connection.
+        """
+        with self._shared_lock:
+            db_connection = self._shared_connection
+            if db_connection is not None and (not db_connection.open or (
+                    time.monotonic() - self._shared_checked_at > self.ping_interval
+                    and not self._check_connection(db_connection))):
+                self._close(db_connection)
+                self.release_connection(db_connection)
+                db_connection = None
+            if db_connection is None:
+                db_connection = self.checkout_connection()
+                self._shared_connection = db_connection
+            self._shared_checked_at = time.monotonic()
+            return db_connection
+
+    def checkout_connection(self, timeout=None):
+        """
+        Check out a connection. It must be given back with release_connection.
+        Args:
+            - timeout: Number of seconds to wait for a free connection. If None, checkout_timeout.
+        Returns:
+            An open MySQLdb connection.
+        Raises:
+            PoolExhaustedError if max_connections are checked out during the whole timeout.
+        """
+        if timeout is None:
+            timeout = self.checkout_timeout
+        _start_time = time.monotonic()
+        _deadline = None if timeout is None else _start_time + timeout
+        _released_at = None
+        with self._condition:
+            _waited = False
+            while True:
+                _now = time.monotonic()
+                self._expire_idle(_now)
+                if len(self._idle) > 0:
+                    db_connection, _released_at = self._idle.pop()
+                    break
+                if self._num_connections < self.max_connections:
+                    # Reserve the slot, the connection is opened outside of the lock
+                    self._num_connections += 1
+                    db_connection = None
+                    break
+                if _deadline is not None and _now >= _deadline:
+                    self._count("timeouts")
+                    raise PoolExhaustedError("No free connection after {} seconds".format(timeout))
+                if not _waited:
+                    self._count("waits")
+                    _waited = True
+                self._condition.wait(None if _deadline is None else _deadline - _now)
+            self._count("checkouts")
 
+        if db_connection is not None and time.monotonic() - _released_at > self.ping_interval:
+            if not self._check_connection(db_connection):
+                self._close(db_connection)
+                with self._condition:
+                    self._count("closed")
+                db_connection = None
+        if db_connection is None:
+            try:
+                db_connection = self._connect()
+            except Exception:
+                with self._condition:
+                    self._num_connections -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._count("created")
+        if self.metrics is not None:
+            self.metrics.observe("db_pool_checkout_seconds", time.monotonic() - _start_time)
+        return db_connection
+
+    def release_connection(self, db_connection):
+        """
+        Give back a connection checked out with checkout_connection. Closed connections are discarded.
+        """
+        with self._condition:
+            if db_connection.open:
+                self._idle.append((db_connection, time.monotonic()))
+            else:
+                self._num_connections -= 1
+                self._count("closed")
+            self._condition.notify()
+
+    @contextmanager
+    def pooled_connection(self, timeout=None):
+        """
+        Context manager checking out a connection and releasing it at the end of the block.
+        """
+        db_connection = self.checkout_connection(timeout)
+        try:
+            yield db_connection
+        finally:
+            self.release_connection(db_connection)
 
     def _check_connection(self, db_connection):
+        """
+        Lightweight health check: a ping round trip, without touching any table.
+        """
         try:
-            db_connection.cursor().execute("SELECT * FROM TypesOfProduct")
-            return True
-        except:
-            return False
+            db_connection.ping()
+            _ok = True
+        except Exception:
+            _ok = False
+        with self._condition:
+            self._count("pings")
+            if not _ok:
+                self._count("failed_pings")
+        return _ok
+
+    def get_pool_stats(self):
+        """
+        Returns:
+            Dictionary with the current pool sizes ("open", "idle", "in_use", "max") and the cumulative counters
+            ("created", "closed", "checkouts", "waits", "timeouts", "pings", "failed_pings").
+        """
+        with self._condition:
+            _stats = dict(self._stats)
+            _stats["open"] = self._num_connections
+            _stats["idle"] = len(self._idle)
+            _stats["in_use"] = self._num_connections - len(self._idle)
+            _stats["max"] = self.max_connections
+        return _stats
+
+    def close_all(self):
+        """
+        Close the idle connections and the shared one. Checked out connections are closed when released.
+        """
+        with self._shared_lock:
+            if self._shared_connection is not None:
+                self._close(self._shared_connection)
+                self.release_connection(self._shared_connection)
+                self._shared_connection = None
+        with self._condition:
+            for db_connection, _ in self._idle:
+                self._close(db_connection)
+            self._num_connections -= len(self._idle)
+            self._count("closed", len(self._idle))
+            self._idle = []
+            self._condition.notify_all()
+
 
 class DBConnectionManagerInitializer(DBConnectionManager):
 
-    def __init__(self, config_parser):
+    def __init__(self, config_parser, metrics=None):
 
         db_host = config_parser.get("DATABASE", "host")
         db_port = config_parser.getint("DATABASE", "port")
         db_user = config_parser.get("DATABASE", "user")
         db_password = config_parser.get("DATABASE", "password")
         db_name = config_parser.get("DATABASE", "name")
+        max_connections = config_parser.getint("DATABASE", "max_connections", fallback=10)
+        idle_timeout = config_parser.getfloat("DATABASE", "idle_timeout", fallback=300.0)
+        ping_interval = config_parser.getfloat("DATABASE", "ping_interval", fallback=30.0)
+        checkout_timeout = config_parser.getfloat("DATABASE", "checkout_timeout", fallback=30.0)
 
-        super(DBConnectionManagerInitializer, self).__init__(db_host, db_port, db_user, db_password, db_name)
+        super(DBConnectionManagerInitializer, self).__init__(db_host, db_port, db_user, db_password, db_name,
+                                                             max_connections=max_connections,
+                                                             idle_timeout=idle_timeout,
+                                                             ping_interval=ping_interval,
+                                                             checkout_timeout=checkout_timeout,
+                                                             metrics=metrics)
 
 def get_sql_timestamp_format():
     return '%Y-%m-%d %H:%M:%S'
 
 def give_sql_timestamp_now():
     return time.strftime(get_sql_timestamp_format(), time.localtime())
-
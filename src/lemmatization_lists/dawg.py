@@ -0,0 +1,330 @@
+"""
+Compressed lemmatization dictionaries stored as a minimal acyclic finite-state automaton (DAWG).
+
+Every (word, lemma) entry is stored as a single key:
+
+    word + SEPARATOR + rank + strip + lemma suffix
+
+where `rank` is the position of the lemma in the word's list of lemmas, `strip` is the number of trailing characters
+to remove from the word and `lemma suffix` the characters to append to get the lemma. Since most inflected forms
+share both their prefixes (the stem) and their encoded lemma tails, the minimal automaton merges them, holding a
+whole language in a fraction of the memory of the equivalent Python dictionary.
+"""
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from typing import BinaryIO, Dict, Iterator, List, Optional, Text, Tuple
+import struct
+import sys
+
+
+SEPARATOR = "\t"
+
+# Rank and strip counts are encoded as single characters starting at this code point.
+_CODE_BASE = 0x21
+
+_MAGIC = b"LLDAWG\x01\n"
+_HEADER = struct.Struct("<IIII")
+
+
+def _common_prefix_length(a: Text, b: Text) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _encode_entry(word: Text, lemma: Text, rank: int) -> Text:
+    """
+    :param word:
+    :param lemma:
+    :param rank: Position of the lemma in the list of lemmas of the word.
+    :return: The automaton key for the (word, lemma) entry.
+    """
+    p = _common_prefix_length(word, lemma)
+    return word + SEPARATOR + chr(_CODE_BASE + rank) + chr(_CODE_BASE + len(word) - p) + lemma[p:]
+
+
+def _decode_lemma(word: Text, tail: Text) -> Text:
+    """
+    :param word:
+    :param tail: Encoded lemma (the part of the key after the separator).
+    :return: The lemma.
+    """
+    strip = ord(tail[1]) - _CODE_BASE
+    return word[:len(word) - strip] + tail[2:]
+
+
+class _BuildState(object):
+    """
+    Mutable automaton state, only used during construction.
+    """
+
+    __slots__ = ("final", "edges", "id")
+
+    def __init__(self):
+        self.final = False
+        self.edges = {}
+        self.id = -1
+
+    def signature(self) -> Tuple:
+        return self.final, tuple((label, state.id) for label, state in self.edges.items())
+
+
+class LemmaDawg(Mapping):
+    """
+    Read only mapping word -> list of lemmas backed by a minimal acyclic automaton.
+
+    It can be used wherever a lemma dictionary (`Dict[Text, List[Text]]`) is expected. Lookup cost only depends on
+    the length of the word and the number of its lemmas, never on the size of the dictionary.
+    """
+
+    def __init__(self, labels: Text, targets: array, offsets: array, finals: bytearray, root: int, size: int):
+        """
+        :param labels: Transition labels, grouped by source state and sorted within each state.
+        :param targets: Target state of every transition.
+        :param offsets: Transitions of state `s` are in range [offsets[s], offsets[s + 1]).
+        :param finals: 1 for accepting states, 0 otherwise.
+        :param root: Initial state.
+        :param size: Number of words.
+        """
+        self._labels = labels
+        self._targets = targets
+        self._offsets = offsets
+        self._finals = finals
+        self._root = root
+        self._size = size
+
+    @classmethod
+    def from_dict(cls, lemma_dict: Dict[Text, List[Text]]) -> "LemmaDawg":
+        """
+        Compile a dictionary of lemmas into a minimal automaton.
+        :param lemma_dict: Dictionary word -> list of lemmas.
+        :return: The compiled automaton.
+        """
+        keys = []
+        for word, lemmas in lemma_dict.items():
+            for rank, lemma in enumerate(lemmas):
+                keys.append(_encode_entry(word, lemma, rank))
+        keys.sort()
+        return cls._from_sorted_keys(keys, len(lemma_dict))
+
+    @classmethod
+    def _from_sorted_keys(cls, keys: List[Text], size: int) -> "LemmaDawg":
+        """
+        Incremental construction of a minimal automaton from sorted keys (Daciuk et al., 2000).
+        """
+        register = {}
+        states = []
+        root = _BuildState()
+        unchecked = []
+        previous = ""
+
+        def minimize(down_to):
+            while len(unchecked) > down_to:
+                parent, label, child = unchecked.pop()
+                signature = child.signature()
+                registered = register.get(signature)
+                if registered is not None:
+                    parent.edges[label] = registered
+                else:
+                    child.id = len(states)
+                    states.append(child)
+                    register[signature] = child
+
+        for key in keys:
+            if key == previous:
+                continue
+            prefix_length = _common_prefix_length(key, previous)
+            minimize(prefix_length)
+            state = unchecked[-1][2] if len(unchecked) > 0 else root
+            for label in key[prefix_length:]:
+                child = _BuildState()
+                state.edges[label] = child
+                unchecked.append((state, label, child))
+                state = child
+            state.final = True
+            previous = key
+        minimize(0)
+        root.id = len(states)
+        states.append(root)
+
+        labels = []
+        targets = array("I")
+        offsets = array("I", [0])
+        finals = bytearray(len(states))
+        for state in states:
+            for label in sorted(state.edges):
+                labels.append(label)
+                targets.append(state.edges[label].id)
+            offsets.append(len(targets))
+            finals[state.id] = 1 if state.final else 0
+        return cls("".join(labels), targets, offsets, finals, root.id, size)
+
+    def _transition(self, state: int, label: Text) -> int:
+        lo = self._offsets[state]
+        hi = self._offsets[state + 1]
+        i = bisect_left(self._labels, label, lo, hi)
+        if i < hi and self._labels[i] == label:
+            return self._targets[i]
+        return -1
+
+    def _walk(self, s: Text, state: Optional[int] = None) -> int:
+        if state is None:
+            state = self._root
+        for label in s:
+            state = self._transition(state, label)
+            if state < 0:
+                return -1
+        return state
+
+    def _completions(self, state: int) -> Iterator[Text]:
+        """
+        :return: Iterator over the suffixes accepted from `state`, in lexicographic order.
+        """
+        stack = [(state, "")]
+        while len(stack) > 0:
+            state, path = stack.pop()
+            if self._finals[state]:
+                yield path
+            for i in range(self._offsets[state + 1] - 1, self._offsets[state] - 1, -1):
+                stack.append((self._targets[i], path + self._labels[i]))
+
+    def _words(self, state: int, prefix: Text) -> Iterator[Text]:
+        """
+        :return: Iterator over the words reachable from `state`, in lexicographic order.
+        """
+        stack = [(state, prefix, False)]
+        while len(stack) > 0:
+            state, path, is_word = stack.pop()
+            if is_word:
+                yield path
+                continue
+            for i in range(self._offsets[state + 1] - 1, self._offsets[state] - 1, -1):
+                if self._labels[i] == SEPARATOR:
+                    stack.append((state, path, True))
+                else:
+                    stack.append((self._targets[i], path + self._labels[i], False))
+
+    def get(self, word: Text, default=None):
+        state = self._walk(word + SEPARATOR)
+        if state < 0:
+            return default
+        return [_decode_lemma(word, tail) for tail in self._completions(state)]
+
+    def __getitem__(self, word: Text) -> List[Text]:
+        res = self.get(word)
+        if res is None:
+            raise KeyError(word)
+        return res
+
+    def __contains__(self, word) -> bool:
+        return isinstance(word, str) and self._walk(word + SEPARATOR) >= 0
+
+    def __iter__(self) -> Iterator[Text]:
+        return self._words(self._root, "")
+
+    def __len__(self) -> int:
+        return self._size
+
+    def keys_with_prefix(self, prefix: Text) -> Iterator[Text]:
+        """
+        :param prefix:
+        :return: Iterator over the words starting with `prefix`, in lexicographic order.
+        """
+        state = self._walk(prefix)
+        if state < 0:
+            return iter(())
+        return self._words(state, prefix)
+
+    def items_with_prefix(self, prefix: Text) -> Iterator[Tuple[Text, List[Text]]]:
+        """
+        :param prefix:
+        :return: Iterator over the (word, lemmas) pairs of the words starting with `prefix`.
+        """
+        for word in self.keys_with_prefix(prefix):
+            yield word, self.get(word)
+
+    def num_states(self) -> int:
+        return len(self._finals)
+
+    def num_transitions(self) -> int:
+        return len(self._targets)
+
+    def memory_size(self) -> int:
+        """
+        :return: Approximate size in bytes of the automaton.
+        """
+        return sys.getsizeof(self._labels) + sys.getsizeof(self._targets) + sys.getsizeof(self._offsets) \
+            + sys.getsizeof(self._finals)
+
+    def write(self, f: BinaryIO):
+        """
+        Serialize the automaton.
+        :param f: Binary file object.
+        """
+        f.write(_MAGIC)
+        f.write(_HEADER.pack(len(self._finals), len(self._targets), self._root, self._size))
+        f.write(self._labels.encode("utf-32-le"))
+        for a in (self._offsets, self._targets):
+            if sys.byteorder == "big":
+                a = array("I", a)
+                a.byteswap()
+            f.write(a.tobytes())
+        f.write(bytes(self._finals))
+
+    @classmethod
+    def read(cls, f: BinaryIO) -> "LemmaDawg":
+        """
+        Deserialize an automaton written with `write`.
+        :param f: Binary file object.
+        :return: The automaton.
+        """
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("Not a lemmatization DAWG file")
+        num_states, num_transitions, root, size = _HEADER.unpack(f.read(_HEADER.size))
+        labels = f.read(4 * num_transitions).decode("utf-32-le")
+        offsets = array("I")
+        offsets.frombytes(f.read(offsets.itemsize * (num_states + 1)))
+        targets = array("I")
+        targets.frombytes(f.read(targets.itemsize * num_transitions))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+            targets.byteswap()
+        finals = bytearray(f.read(num_states))
+        return cls(labels, targets, offsets, finals, root, size)
+
+    def save(self, path: Text):
+        with open(path, "wb") as f:
+            self.write(f)
+
+    @classmethod
+    def load(cls, path: Text) -> "LemmaDawg":
+        with open(path, "rb") as f:
+            return cls.read(f)
+
+
+def compile_language(lang: Text, dest_dir: Text):
+    """
+    Compile the lemmatization list of a language into `lemmatization-<lang>.dawg` and
+    `lemmatization-norm-<lang>.dawg` files, as expected by DictionaryLemmatizer(lang, lexicon_format="dawg").
+    :param lang: Language.
+    :param dest_dir: Destination directory (typically the `data` directory of the package).
+    """
+    import os
+    from lemmatization_lists.lemmatizers import DictionaryLemmatizer
+    lemmatizer = DictionaryLemmatizer(lang)
+    LemmaDawg.from_dict(lemmatizer.lemma_dict).save(os.path.join(dest_dir, "lemmatization-{}.dawg".format(lang)))
+    LemmaDawg.from_dict(lemmatizer.lemma_dict_norm).save(
+        os.path.join(dest_dir, "lemmatization-norm-{}.dawg".format(lang)))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compile lemmatization lists into DAWG files.")
+    parser.add_argument("dest_dir")
+    parser.add_argument("langs", nargs="+")
+    args = parser.parse_args()
+    for _lang in args.langs:
+        compile_language(_lang, args.dest_dir)
@@ -0,0 +1,225 @@
+"""
+External memory lemmatization of vocabularies too large for DictionaryLemmatizer, with bounded memory.
+
+Both the vocabulary and the lemmatization list are sorted on disk (sorted runs of at most buffer_size bytes, merged
+at most fan_in at a time), and then joined in a single streaming merge. Results are those of
+DictionaryLemmatizer.get_lemma: tokens are looked up in lower case, lemmas keep the order of the list, and unknown
+tokens are their own lemma.
+
+    python -m lemmatization_lists.external_sort en vocabulary.txt lemmas.tsv --buffer-size 64
+
+The vocabulary file has one token per line; the output has one line per distinct token, with the token and its lemmas
+separated by tabs, sorted by lower cased token.
+"""
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Text, Tuple
+import heapq
+import logging
+import os
+import tempfile
+
+from .lemmatizers import read_lemmatization_pairs
+
+
+DEFAULT_BUFFER_SIZE = 64 * 1024 * 1024
+DEFAULT_FAN_IN = 64
+
+# Approximate size of the Python objects of a buffered record, besides its characters
+_RECORD_OVERHEAD = 160
+
+Record = Tuple[Text, ...]
+
+
+def _write_run(records: List[Record], dir_name: Text) -> Text:
+    """
+    :param records: Records to sort and write. The list is sorted in place.
+    :param dir_name: Directory of the run files.
+    :return: Path of the run file.
+    """
+    records.sort()
+    fd, path = tempfile.mkstemp(suffix=".run", dir=dir_name)
+    with open(fd, "w", encoding="utf-8", newline="\n", buffering=1 << 16) as f:
+        f.writelines("\t".join(r) + "\n" for r in records)
+    return path
+
+
+def _read_run(path: Text) -> Iterator[Record]:
+    # Only "\n" ends records: other line breaks, such as "\r", may be part of a field
+    with open(path, "r", encoding="utf-8", newline="\n", buffering=1 << 16) as f:
+        for line in f:
+            yield tuple(line[:-1].split("\t"))
+
+
+def _sorted_runs(records: Iterable[Record], dir_name: Text, buffer_size: int) -> List[Text]:
+    """
+    :param records: Records, as tuples of strings without tabs nor "\n".
+    :param dir_name: Directory of the run files.
+    :param buffer_size: Approximate maximum size, in bytes, of the records held in memory.
+    :return: Paths of the sorted runs.
+    """
+    runs = []
+    buffer = []
+    size = 0
+    for r in records:
+        buffer.append(r)
+        size += _RECORD_OVERHEAD + sum(len(s) for s in r)
+        if size >= buffer_size:
+            runs.append(_write_run(buffer, dir_name))
+            buffer = []
+            size = 0
+    if len(buffer) > 0 or len(runs) == 0:
+        runs.append(_write_run(buffer, dir_name))
+    return runs
+
+
+def _merge_runs(runs: List[Text], dir_name: Text, fan_in: int) -> Iterator[Record]:
+    """
+    Merge sorted runs, in several passes if there are more than fan_in of them. Run files are deleted once merged.
+    :param runs: Paths of the sorted runs.
+    :param dir_name: Directory of the run files.
+    :param fan_in: Maximum number of runs merged (open) at once.
+    :return: Iterator over the sorted records.
+    """
+    while len(runs) > fan_in:
+        merged_runs = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i:i + fan_in]
+            fd, path = tempfile.mkstemp(suffix=".run", dir=dir_name)
+            with open(fd, "w", encoding="utf-8", newline="\n", buffering=1 << 16) as f:
+                f.writelines("\t".join(r) + "\n" for r in heapq.merge(*[_read_run(p) for p in group]))
+            for p in group:
+                os.remove(p)
+            merged_runs.append(path)
+        runs = merged_runs
+    try:
+        yield from heapq.merge(*[_read_run(p) for p in runs])
+    finally:
+        for p in runs:
+            os.remove(p)
+
+
+def external_sort(records: Iterable[Record], dir_name: Text, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                  fan_in: int = DEFAULT_FAN_IN) -> Iterator[Record]:
+    """
+    Sort records with bounded memory.
+    :param records: Records, as tuples of strings without tabs nor "\n".
+    :param dir_name: Directory for the temporary run files.
+    :param buffer_size: Approximate maximum size, in bytes, of the records held in memory.
+    :param fan_in: Maximum number of runs merged at once.
+    :return: Iterator over the sorted records.
+    """
+    return _merge_runs(_sorted_runs(records, dir_name, buffer_size), dir_name, fan_in)
+
+
+def _lexicon_records(lang: Text) -> Iterator[Record]:
+    """
+    :param lang: Language.
+    :return: (word, position, lemma) records of the lemmatization list. As in DictionaryLemmatizer, every lemma is
+      also a word with itself as lemma. Positions are zero padded, so that sorting keeps the order of the list.
+    """
+    for i, (lemma, word) in enumerate(read_lemmatization_pairs(lang)):
+        yield word, "{:012d}".format(2 * i), lemma
+        yield lemma, "{:012d}".format(2 * i + 1), lemma
+
+
+def _vocabulary_records(tokens: Iterable[Text]) -> Iterator[Record]:
+    """
+    :param tokens:
+    :return: (lookup key, token) records.
+    """
+    for token in tokens:
+        if len(token) == 0:
+            continue
+        if "\t" in token or "\n" in token:
+            logging.warning("Skipping token with tabs or newlines: {!r}".format(token))
+            continue
+        yield token.lower(), token
+
+
+def _lexicon_entries(records: Iterator[Record]) -> Iterator[Tuple[Text, List[Text]]]:
+    """
+    :param records: Sorted lexicon records.
+    :return: Iterator over (word, lemmas), sorted by word.
+    """
+    for word, group in groupby(records, key=itemgetter(0)):
+        lemmas = []
+        for _, _, lemma in group:
+            if lemma not in lemmas:
+                lemmas.append(lemma)
+        yield word, lemmas
+
+
+def lemmatize_vocabulary(lang: Text, tokens: Iterable[Text], tmp_dir: Optional[Text] = None,
+                         buffer_size: int = DEFAULT_BUFFER_SIZE,
+                         fan_in: int = DEFAULT_FAN_IN) -> Iterator[Tuple[Text, List[Text]]]:
+    """
+    Lemmatize a vocabulary with a sort-merge join against the lemmatization list, without loading either of them
+    in memory.
+    :param lang: Language.
+    :param tokens: Tokens to lemmatize (duplicates are returned once).
+    :param tmp_dir: Directory for the temporary files (default: the system one).
+    :param buffer_size: Approximate maximum size, in bytes, of the records held in memory by each sort.
+    :param fan_in: Maximum number of sorted runs merged at once.
+    :return: Iterator over (token, lemmas), sorted by lower cased token.
+    """
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as dir_name:
+        vocabulary = external_sort(_vocabulary_records(tokens), dir_name, buffer_size, fan_in)
+        lexicon_records = external_sort(_lexicon_records(lang), dir_name, buffer_size, fan_in)
+        try:
+            lexicon = _lexicon_entries(lexicon_records)
+            entry = next(lexicon, None)
+            for key, group in groupby(vocabulary, key=itemgetter(0)):
+                while entry is not None and entry[0] < key:
+                    entry = next(lexicon, None)
+                lemmas = entry[1] if entry is not None and entry[0] == key else [key]
+                previous = None
+                for _, token in group:
+                    if token != previous:
+                        yield token, lemmas
+                        previous = token
+        finally:
+            # Remove the remaining runs before the directory
+            vocabulary.close()
+            lexicon_records.close()
+
+
+def lemmatize_vocabulary_file(lang: Text, src_file: Text, dest_file: Text, tmp_dir: Optional[Text] = None,
+                              buffer_size: int = DEFAULT_BUFFER_SIZE, fan_in: int = DEFAULT_FAN_IN) -> int:
+    """
+    Lemmatize a vocabulary file (one token per line) into a table (token and lemmas separated by tabs).
+    :param lang: Language.
+    :param src_file: Vocabulary file.
+    :param dest_file: Output table.
+    :param tmp_dir: See lemmatize_vocabulary.
+    :param buffer_size: See lemmatize_vocabulary.
+    :param fan_in: See lemmatize_vocabulary.
+    :return: Number of distinct tokens.
+    """
+    res = 0
+    with open(src_file, "r", encoding="utf-8-sig") as src, \
+            open(dest_file, "w", encoding="utf-8", buffering=1 << 20) as dest:
+        tokens = (line.rstrip("\r\n") for line in src)
+        for token, lemmas in lemmatize_vocabulary(lang, tokens, tmp_dir, buffer_size, fan_in):
+            dest.write("\t".join([token] + lemmas) + "\n")
+            res += 1
+    return res
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Lemmatize a huge vocabulary with bounded memory.")
+    parser.add_argument("lang")
+    parser.add_argument("src_file", help="Vocabulary, one token per line")
+    parser.add_argument("dest_file", help="Output table: token and lemmas, separated by tabs")
+    parser.add_argument("--buffer-size", type=float, default=DEFAULT_BUFFER_SIZE / (1024 * 1024),
+                        help="Sort buffer size, in MB")
+    parser.add_argument("--fan-in", type=int, default=DEFAULT_FAN_IN)
+    parser.add_argument("--tmp-dir", help="Directory for the temporary files")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    _start_time = time.perf_counter()
+    _count = lemmatize_vocabulary_file(args.lang, args.src_file, args.dest_file, args.tmp_dir,
+                                       int(args.buffer_size * 1024 * 1024), args.fan_in)
+    logging.info("{} tokens in {:.1f} s".format(_count, time.perf_counter() - _start_time))
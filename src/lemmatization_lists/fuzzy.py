@@ -0,0 +1,223 @@
+"""
+Typo tolerant word lookup based on a precomputed deletion index (SymSpell algorithm).
+
+Every indexed word is registered under all the strings obtained by deleting up to `max_distance` characters from
+its prefix. At query time the same deletions are generated for the query, so the candidates within the maximum edit
+distance are retrieved with a handful of index probes instead of scanning the whole vocabulary.
+"""
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Set, Text, Tuple
+import sys
+
+
+def _deletes(word: Text, max_distance: int) -> Set[Text]:
+    """
+    :param word:
+    :param max_distance:
+    :return: All the strings obtained by deleting up to max_distance characters from word (word included).
+    """
+    res = {word}
+    level = [word]
+    for _ in range(max_distance):
+        next_level = []
+        for w in level:
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in res:
+                    res.add(d)
+                    next_level.append(d)
+        level = next_level
+    return res
+
+
+def edit_distance(a: Text, b: Text, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein distance plus transpositions of adjacent characters).
+    :param a:
+    :param b:
+    :param max_distance: Computation stops as soon as the distance is known to exceed this value.
+    :return: The distance, or max_distance + 1 if it is greater than max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # Common prefixes and suffixes do not change the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    if start > 0 or end > 0:
+        a = a[start:len(a) - end]
+        b = b[start:len(b) - end]
+    if len(a) == 0 or len(b) == 0:
+        return min(max(len(a), len(b)), max_distance + 1)
+    # Only the cells within max_distance of the diagonal can lead to a distance lower or equal to max_distance
+    n = len(a)
+    m = len(b)
+    too_far = max_distance + 1
+    previous_previous = None
+    previous = [j if j <= max_distance else too_far for j in range(m + 1)]
+    for i in range(1, n + 1):
+        current = [too_far] * (m + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = too_far
+        for j in range(max(1, i - max_distance), min(m, i + max_distance) + 1):
+            if a[i - 1] == b[j - 1]:
+                d = previous[j - 1]
+            else:
+                d = min(previous[j], current[j - 1], previous[j - 1]) + 1
+                if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1] \
+                        and previous_previous[j - 2] + 1 < d:
+                    d = previous_previous[j - 2] + 1
+            if d > too_far:
+                d = too_far
+            current[j] = d
+            if d < row_min:
+                row_min = d
+        if row_min > max_distance:
+            return too_far
+        previous_previous = previous
+        previous = current
+    return previous[m]
+
+
+class DeletionIndex(object):
+    """
+    SymSpell style deletion index over a vocabulary.
+
+    Deletions are stored by hash in two parallel sorted arrays, so the index costs 12 bytes per deletion. Hash
+    collisions only add candidates, which are discarded by the final edit distance check.
+    """
+
+    def __init__(self, words: Iterable[Text], max_distance: int = 2, prefix_length: int = 7):
+        """
+        :param words: Vocabulary to index.
+        :param max_distance: Maximum edit distance supported by lookups.
+        :param prefix_length: Only the first prefix_length characters of every word are used to build the
+          deletions, which bounds the size of the index for long words.
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = list(words)
+        entries = []
+        for word_id, word in enumerate(self.words):
+            for d in _deletes(word[:prefix_length], max_distance):
+                entries.append((hash(d), word_id))
+        entries.sort()
+        self._hashes = array("q", [h for h, _ in entries])
+        self._word_ids = array("I", [word_id for _, word_id in entries])
+
+    def lookup(self, word: Text, max_distance: int = None) -> List[Tuple[Text, int]]:
+        """
+        :param word: Query.
+        :param max_distance: Maximum edit distance (at most the one of the index). If None, the one of the index.
+        :return: List of (word, distance) pairs within max_distance of the query, sorted by distance.
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        candidate_ids = set()
+        n = len(self._hashes)
+        for d in _deletes(word[:self.prefix_length], max_distance):
+            h = hash(d)
+            i = bisect_left(self._hashes, h)
+            while i < n and self._hashes[i] == h:
+                candidate_ids.add(self._word_ids[i])
+                i += 1
+        res = []
+        for word_id in candidate_ids:
+            candidate = self.words[word_id]
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                res.append((candidate, distance))
+        res.sort(key=lambda x: (x[1], x[0]))
+        return res
+
+    def lookup_closest(self, word: Text) -> List[Tuple[Text, int]]:
+        """
+        Search with increasing distances, which avoids verifying the many candidates of the larger distances when
+        a closer word exists.
+        :param word: Query.
+        :return: List of (word, distance) pairs at the minimum distance found (at most the one of the index).
+        """
+        for max_distance in range(self.max_distance + 1):
+            res = self.lookup(word, max_distance)
+            if len(res) > 0:
+                return [r for r in res if r[1] == res[0][1]]
+        return []
+
+    def memory_size(self) -> int:
+        """
+        :return: Approximate size in bytes of the index (the indexed words themselves are not accounted).
+        """
+        return sys.getsizeof(self.words) + sys.getsizeof(self._hashes) + sys.getsizeof(self._word_ids)
+
+
+def fuzzy_report(langs: List[Text], max_distance: int = 2, num_queries: int = 1000, seed: int = 0) -> List[dict]:
+    """
+    Measure the memory and lookup latency of the deletion index for several languages. Queries are words of the
+    dictionary with max_distance random edits.
+    :param langs: Languages.
+    :param max_distance:
+    :param num_queries: Number of queries per language.
+    :param seed: Random seed.
+    :return: One dictionary of measures per language.
+    """
+    import random
+    import time
+    from lemmatization_lists.lemmatizers import DictionaryLemmatizer
+    rnd = random.Random(seed)
+    res = []
+    for lang in langs:
+        lemmatizer = DictionaryLemmatizer(lang)
+        start_time = time.perf_counter()
+        index = DeletionIndex(lemmatizer.lemma_dict.keys(), max_distance)
+        build_time = time.perf_counter() - start_time
+        words = rnd.sample(index.words, min(num_queries, len(index.words)))
+        queries = []
+        for w in words:
+            for _ in range(max_distance):
+                i = rnd.randrange(len(w) + 1)
+                op = rnd.randrange(3)
+                if op == 0:
+                    w = w[:i] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + w[i:]
+                elif op == 1 and len(w) > 1:
+                    w = w[:i] + w[i + 1:]
+                else:
+                    w = w[:i] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + w[i + 1:]
+            queries.append(w)
+        start_time = time.perf_counter()
+        num_candidates = 0
+        for q in queries:
+            num_candidates += len(index.lookup(q))
+        lookup_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for q in queries:
+            index.lookup_closest(q)
+        lookup_closest_time = time.perf_counter() - start_time
+        res.append({
+            "lang": lang,
+            "words": len(index.words),
+            "deletions": len(index._hashes),
+            "index_bytes": index.memory_size(),
+            "build_s": build_time,
+            "lookup_ms": lookup_time * 1000 / len(queries),
+            "lookup_closest_ms": lookup_closest_time * 1000 / len(queries),
+            "candidates_per_query": num_candidates / len(queries)
+        })
+    return res
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from lemmatization_lists.lemmatizers import get_available_languages
+    parser = argparse.ArgumentParser(description="Memory and latency report of the fuzzy lookup index.")
+    parser.add_argument("langs", nargs="*", help="Languages (default: all the available ones)")
+    parser.add_argument("--max-distance", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    for _r in fuzzy_report(args.langs or get_available_languages(), args.max_distance, args.queries):
+        print(json.dumps(_r))
@@ -2,10 +2,16 @@
 
 import os.path
 import configparser
+import functools
+import itertools
 import sqlite3
 import logging
 from nltk.stem import SnowballStemmer
 import threading
+import time
+
+from lemmatization_lists.cache import LRUCache
+from lemmatization_lists.lemmatizers import _normalize_word
 
 
 
@@ -14,23 +20,159 @@ _VERB_DB_DIR = os.path.join(os.path.dirname(__file__), "verb_db")
 _SPANISH_VERB_DB_PATH = os.path.join(_VERB_DB_DIR, "spanish_verbs.db")
 _DETAILED_INFO_MAPPING_PATH = os.path.join(_BASE_RESOURCES_DIR, "detailed_info_mapping.conf")
 _VERB_LIST_PATH = os.path.join(_BASE_RESOURCES_DIR, "verbs_list_final")
+_REFLEX_VERB_LIST_PATH = os.path.join(_BASE_RESOURCES_DIR, "verbs_list_reflex")
 _MODELS_PATH = os.path.join(_BASE_RESOURCES_DIR, "models")
 _MODEL_REGULAR_AR = "regular_ar"
 _MODEL_REGULAR_ER = "regular_er"
 _MODEL_REGULAR_IR = "regular_ir"
 
+# Enclitic pronouns, in the order they are attached to the verb ("dáselo", "vete", "dámelo", "ponlas")
+_CLITIC_SLOTS = [["se"], ["te", "os"], ["me", "nos"], ["lo", "la", "los", "las", "le", "les"]]
+
+# Reflexive pronoun of every (person, singular) of personal forms
+_REFLEXIVE_PRONOUNS = {
+    (1, True): "me",
+    (2, True): "te",
+    (3, True): "se",
+    (1, False): "nos",
+    (2, False): "os",
+    (3, False): "se"
+}
+
+_ACCENT_TRANSLATION = str.maketrans("áéíóú", "aeiou")
+
+_END = None
+
+
+def _build_clitic_automaton():
+    """
+    Build an automaton which reads words backwards and accepts their enclitic sequences.
+
+    Returns:
+        A trie over the reversed clitic sequences: nested dictionaries char -> node, where accepting nodes map `_END`
+        to the tuple of clitics read so far.
+    """
+    _root = {}
+    for _slots in itertools.product(*[_slot + [""] for _slot in _CLITIC_SLOTS]):
+        _clitics = tuple(_c for _c in _slots if len(_c) > 0)
+        if len(_clitics) == 0:
+            continue
+        _node = _root
+        for _char in reversed("".join(_clitics)):
+            _node = _node.setdefault(_char, {})
+        _node.setdefault(_END, _clitics)
+    return _root
+
+
+_CLITIC_AUTOMATON = _build_clitic_automaton()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_detailed_info_mapping():
+    """
+    Read detailed_info_mapping.conf, which describes the simple forms produced by the conjugation models, in order.
+
+    Returns:
+        A tuple with the fields of every form: (person, singular, time, mode, simple) for personal forms and
+        (type, simple) for non personal ones, as strings.
+    """
+    _mapping = []
+    with open(_DETAILED_INFO_MAPPING_PATH, "r") as _f:
+        for _l in _f.readlines():
+            _l = _l.strip()
+            if len(_l) > 0:
+                if _l.startswith("#"):
+                    continue
+                _mapping.append(tuple(_s.strip() for _s in _l.split(",")))
+    return tuple(_mapping)
+
+
+class SpanishParadigm():
+    """
+    All the simple forms of a verb, indexed by their grammatical features.
+
+    Personal forms are keyed by (person, singular, time, mode) and non personal ones by their type (1: infinitive,
+    2: gerund, 3: participle), with the codes of detailed_info_mapping.conf. Some keys have several forms (the "-ra"
+    and "-se" subjunctive imperfects).
+    """
+
+    def __init__(self, infinitive, forms, index):
+        """
+        Args:
+            - infinitive:
+            - forms: Tuple with the forms of the verb, in the order of detailed_info_mapping.conf.
+            - index: Dictionary key -> tuple of positions in forms, shared by all the paradigms.
+        """
+        self.infinitive = infinitive
+        self.forms = forms
+        self.index = index
+
+    def get_forms(self, person, singular, time, mode):
+        """
+        Returns:
+            A tuple with the personal forms with the given features (empty if there are none).
+        """
+        return tuple(self.forms[_i] for _i in self.index.get((person, singular, time, mode), ()))
+
+    def get_form(self, person, singular, time, mode):
+        """
+        Args:
+            - person: 1, 2 or 3.
+            - singular: True or False.
+            - time: Time code (1: present, 2: imperfect, 3: perfect, 4: conditional, 5: future).
+            - mode: Mode code (1: indicative, 2: subjunctive, 3: imperative).
+
+        Returns:
+            The (first) personal form with the given features, or None.
+        """
+        _positions = self.index.get((person, singular, time, mode))
+        if _positions is None:
+            return None
+        return self.forms[_positions[0]]
+
+    def get_non_personal_form(self, type):
+        """
+        Args:
+            - type: 1: infinitive, 2: gerund, 3: participle.
+
+        Returns:
+            The non personal form, or None.
+        """
+        _positions = self.index.get(type)
+        if _positions is None:
+            return None
+        return self.forms[_positions[0]]
+
 
 class SpanishVerbFlexioner:
     """
     Spanish verbs flexioner.
     """
 
-    def __init__(self):
+    # Structured array fields of export_paradigms. Codes which do not apply to a form are 0.
+    PARADIGM_DTYPE_FIELDS = [("person", "i1"), ("singular", "i1"), ("time", "i1"), ("mode", "i1"), ("type", "i1")]
+
+    def __init__(self, cache_size=10000):
+        """
+        Args:
+            - cache_size: Maximum number of paradigms kept in memory.
+        """
         self.irregular_verbs_models = {}
         self.regular_model_ar = None
         self.regular_model_er = None
         self.regular_model_ir = None
         self._load_models()
+        self._paradigm_cache = LRUCache(cache_size)
+        self._features = []
+        self._paradigm_index = {}
+        for _i, _fields in enumerate(_load_detailed_info_mapping()):
+            if len(_fields) == 5:
+                _key = (int(_fields[0]), _fields[1].lower() == "true", int(_fields[2]), int(_fields[3]))
+                self._features.append(_key + (0,))
+            else:
+                _key = int(_fields[0])
+                self._features.append((0, False, 0, 0, _key))
+            self._paradigm_index[_key] = self._paradigm_index.get(_key, ()) + (_i,)
 
     def _load_models(self):
         """
@@ -43,6 +185,12 @@ class SpanishVerbFlexioner:
                     _model = ConjugationModel.load(_s)
                     for _irregular_verb in _model.verbs:
                         self.irregular_verbs_models[_irregular_verb] = _model
+                    # Models are named after their paradigm verb, which some of them do not list ("34_poner").
+                    # Without this, that verb would fall back to the regular model and the paradigm tables would
+                    # map its forms to the wrong paradigm.
+                    _model_verb = _s.split("_", 1)[-1]
+                    if _model.get_root(_model_verb) is not None:
+                        self.irregular_verbs_models.setdefault(_model_verb, _model)
 
         self.regular_model_ar = ConjugationModel.load(_MODEL_REGULAR_AR)
         self.regular_model_er = ConjugationModel.load(_MODEL_REGULAR_ER)
@@ -71,6 +219,65 @@ class SpanishVerbFlexioner:
         else:
             return None
 
+    def get_paradigm(self, infinitive):
+        """
+        Get the paradigm of a verb. Paradigms are generated once and cached.
+
+        Args:
+            - infinitive
+
+        Returns:
+            A SpanishParadigm, or None if there is no conjugation model for the infinitive.
+        """
+        _paradigm = self._paradigm_cache.get(infinitive)
+        if _paradigm is None:
+            _forms = self.get_all_simple_forms(infinitive)
+            if _forms is None or len(_forms) != len(self._features):
+                return None
+            _paradigm = SpanishParadigm(infinitive, tuple(_forms), self._paradigm_index)
+            self._paradigm_cache.put(infinitive, _paradigm)
+        return _paradigm
+
+    def get_form(self, infinitive, person, singular, time, mode):
+        """
+        Get one personal form of a verb (see SpanishParadigm.get_form).
+
+        Returns:
+            The form, or None.
+        """
+        _paradigm = self.get_paradigm(infinitive)
+        if _paradigm is None:
+            return None
+        return _paradigm.get_form(person, singular, time, mode)
+
+    def export_paradigms(self, infinitives):
+        """
+        Export the paradigms of several verbs as a table.
+
+        Args:
+            - infinitives: Verbs to export. Verbs without conjugation model are skipped.
+
+        Returns:
+            A NumPy structured array with one row per form and the fields "infinitive", "form" and
+            PARADIGM_DTYPE_FIELDS.
+        """
+        # NumPy is only needed by the export
+        import numpy as np
+        _paradigms = [_p for _p in (self.get_paradigm(_v) for _v in infinitives) if _p is not None]
+        _max_infinitive = max([len(_p.infinitive) for _p in _paradigms], default=1)
+        _max_form = max([len(_f) for _p in _paradigms for _f in _p.forms], default=1)
+        _dtype = [("infinitive", "U{}".format(_max_infinitive)), ("form", "U{}".format(_max_form))] + \
+            self.PARADIGM_DTYPE_FIELDS
+        _res = np.empty(len(_paradigms) * len(self._features), dtype=_dtype)
+        _features = np.array(self._features, dtype=self.PARADIGM_DTYPE_FIELDS)
+        for _i, _p in enumerate(_paradigms):
+            _rows = _res[_i * len(self._features):(_i + 1) * len(self._features)]
+            _rows["infinitive"] = _p.infinitive
+            _rows["form"] = _p.forms
+            for _name, _ in self.PARADIGM_DTYPE_FIELDS:
+                _rows[_name] = _features[_name]
+        return _res
+
 
 class ConjugationModel:
     """
@@ -105,10 +312,12 @@ class ConjugationModel:
             - infinitive
 
         Returns:
-            A list with all possible simple forms (stringS).
+            A list with all possible simple forms (stringS), or None if the infinitive does not match the model.
         """
         _res = []
         _root = self.get_root(infinitive)
+        if _root is None:
+            return None
         for _suffix in self.flexing_suffixes:
             _res.append(_root + _suffix)
         return _res
@@ -172,8 +381,17 @@ class SpanishVerbDatabaseBuilder:
   PRIMARY KEY (`ID`)
 );"""
 
+    # Covering indexes: lookups by normalized form are answered from the index alone.
+    _CREATE_PERSONAL_VERBS_INDEX = """CREATE INDEX `index_normalized_verb_personal_verbs` on `personal_verbs`
+  (normalized_verb, verb, infinitive, person, singular, time, mode, simple)"""
+
+    _CREATE_NON_PERSONAL_VERBS_INDEX = """CREATE INDEX `index_normalized_verb_non_personal_verbs` on `non_personal_verbs`
+  (normalized_verb, verb, infinitive, type, simple)"""
+
     def __init__(self, db_file_path=_SPANISH_VERB_DB_PATH):
         self.db_file_path = db_file_path
+        if len(os.path.dirname(db_file_path)) > 0:
+            os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
         _conn = sqlite3.connect(db_file_path)
         _cursor = _conn.cursor()
         # Create tables
@@ -182,41 +400,44 @@ class SpanishVerbDatabaseBuilder:
         _cursor.execute(self._CREATE_NON_PERSONAL_VERBS_TABLE)
         # Create indexes
         logging.info("Creating indexes...")
-        _cursor.execute("CREATE INDEX `index_normalized_verb_personal_verbs` on `personal_verbs` (normalized_verb)")
-        _cursor.execute("CREATE INDEX `index_normalized_verb_non_personal_verbs` on `non_personal_verbs` (normalized_verb)")
+        _cursor.execute(self._CREATE_PERSONAL_VERBS_INDEX)
+        _cursor.execute(self._CREATE_NON_PERSONAL_VERBS_INDEX)
         _conn.commit()
         _conn.close()
 
 
-    def insert_data(self):
+    def insert_data(self, verb_list=None):
+        """
+        Generate the verbal forms of every verb and insert them into the database.
+
+        Args:
+            - verb_list: Infinitives to insert. If None, all the verbs in verbs_list_final are inserted.
+        """
         _conn = sqlite3.connect(self.db_file_path)
 
         # Insert Spanish verbs data
 
-        # Read mapping
-        _mapping = []
-        with open(_DETAILED_INFO_MAPPING_PATH, "r") as _f:
-            for _l in _f.readlines():
-                _l = _l.strip()
-                if len(_l) > 0:
-                    if _l.startswith("#"):
-                        continue
-                    _mapping.append([_s.strip() for _s in _l.split(",")])
+        _mapping = _load_detailed_info_mapping()
 
         # Read list of verbs
-        _verb_list = []
-        with open(_VERB_LIST_PATH, "r") as _f:
-            for _l in _f.readlines():
-                _l = _l.strip()
-                if len(_l) > 0:
-                    if _l.startswith("#"):
-                        continue
-                    _verb_list.append(_l)
+        _verb_list = verb_list
+        if _verb_list is None:
+            _verb_list = []
+            with open(_VERB_LIST_PATH, "r") as _f:
+                for _l in _f.readlines():
+                    _l = _l.strip()
+                    if len(_l) > 0:
+                        if _l.startswith("#"):
+                            continue
+                        _verb_list.append(_l)
 
         # Generate verbal forms and insert into database
         _flexioner = SpanishVerbFlexioner()
         for _v in _verb_list:
-            _vf_list = flexioner.get_all_simple_forms(_v)
+            _vf_list = _flexioner.get_all_simple_forms(_v)
+            if _vf_list is None:
+                logging.warning("No conjugation model for " + _v)
+                continue
             self._insert_into_db(_conn, _vf_list, _mapping, _v)
 
         _conn.commit()
@@ -224,35 +445,36 @@ class SpanishVerbDatabaseBuilder:
 
 
     def _insert_into_db(self, conn, vf_list, mapping, infinitive):
+        """
+        Insert the forms of one verb. The `normalized_verb` column stores the lower cased, accent stripped form
+        (see `_normalize_word`), which is the key used by SpanishVerbAnalyzer lookups.
+        """
         logging.info("Inserting " + infinitive)
-        _cursor = conn.cursor()
+        _personal_rows = []
+        _non_personal_rows = []
         for i in range(len(vf_list)):
+            _id = infinitive + "_" + str(i)
+            _verb = vf_list[i]
+            _normalized_verb = _normalize_word(vf_list[i])
             if len(mapping[i]) == 5:
                 # Personal form
-                _id = infinitive + "_" + str(i)
-                _verb = vf_list[i]
-                _normalized_verb = vf_list[i]
-                _s_person = mapping[i][0]
+                _person = int(mapping[i][0])
                 _singular = 1 if mapping[i][1].lower() == "true" else 0
-                _s_time = mapping[i][2]
-                _s_mode = mapping[i][3]
+                _time = int(mapping[i][2])
+                _mode = int(mapping[i][3])
                 _simple = 1 if mapping[i][4].lower() == "true" else 0
-                _sql_stat = "insert into personal_verbs values('" + _id + "', '" + _normalized_verb + "', '" + _verb + "', '" \
-                            + infinitive + "', " + _s_person + ", " + str(_singular) + ", " + _s_time + ", " \
-                            + _s_mode + ", " + str(_simple) + ")"
-                logging.debug("Inserting personal form: " + _sql_stat)
-                _cursor.execute(_sql_stat)
+                _personal_rows.append((_id, _normalized_verb, _verb, infinitive, _person, _singular, _time, _mode,
+                                       _simple))
             elif len(mapping[i]) == 2:
                 # Non personal form
-                _id = infinitive + "_" + str(i)
-                _verb = vf_list[i]
-                _normalized_verb = vf_list[i]
-                _s_type = mapping[i][0]
+                _type = int(mapping[i][0])
                 _simple = 1 if mapping[i][1].lower() == "true" else 0
-                _sql_stat = "insert into non_personal_verbs values('" + _id + "', '" + _normalized_verb + "', '" + _verb + "', '" \
-                            + infinitive + "', " + _s_type + ", " + str(_simple) + ")"
-                logging.debug("Inserting non personal form: " + _sql_stat)
-                _cursor.execute(_sql_stat)
+                _non_personal_rows.append((_id, _normalized_verb, _verb, infinitive, _type, _simple))
+        _cursor = conn.cursor()
+        logging.debug("Inserting {} personal forms".format(len(_personal_rows)))
+        _cursor.executemany("insert into personal_verbs values(?, ?, ?, ?, ?, ?, ?, ?, ?)", _personal_rows)
+        logging.debug("Inserting {} non personal forms".format(len(_non_personal_rows)))
+        _cursor.executemany("insert into non_personal_verbs values(?, ?, ?, ?, ?, ?)", _non_personal_rows)
         conn.commit()
 
 
@@ -260,81 +482,318 @@ class SpanishVerbDatabaseBuilder:
 class SpanishVerbAnalyzer():
     """
     This class gets the lemma (infinitive form) of any Spanish simple verbal form.
+
+    Lookups are answered with a single query over the covering `normalized_verb` indexes of both tables. In
+    accent insensitive mode, every form whose normalized key matches the normalized word is returned
+    (e.g. "cantara" finds both "cantara" and "cantará"); otherwise only exact matches of the word are returned.
+    The database must have been built with normalized keys (see SpanishVerbDatabaseBuilder).
     """
 
-    def __init__(self, db_file_path=_SPANISH_VERB_DB_PATH):
+    _SELECT_FORMS = """SELECT 1, verb, infinitive, person, singular, time, mode, simple
+  FROM personal_verbs WHERE normalized_verb = ?{verb_filter}
+UNION ALL
+SELECT 0, verb, infinitive, type, NULL, NULL, NULL, simple
+  FROM non_personal_verbs WHERE normalized_verb = ?{verb_filter}"""
+
+    _SELECT_FORMS_EXACT = _SELECT_FORMS.format(verb_filter=" AND verb = ?")
+    _SELECT_FORMS_ACCENT_INSENSITIVE = _SELECT_FORMS.format(verb_filter="")
+
+    def __init__(self, db_file_path=_SPANISH_VERB_DB_PATH, accent_insensitive=False, metrics=None):
+        """
+        Args:
+            - db_file_path: Path to the database built by SpanishVerbDatabaseBuilder.
+            - accent_insensitive: Default lookup mode for get_verb_info.
+            - metrics: Optional lemmatization_lists.metrics.Metrics to record lookup times and counters into.
+        """
         self.db_file_path = db_file_path
+        self.accent_insensitive = accent_insensitive
+        self.metrics = metrics
         self.connections = {}
 #        self.conn = sqlite3.connect(db_file_path)
 #        self.lock = threading.Lock()
 
     def _get_connection(self):
-        _thread_id = threading.currentThread()
+        _thread_id = threading.current_thread()
         if not _thread_id in self.connections:
             self.connections[_thread_id] = sqlite3.connect(self.db_file_path)
         return self.connections[_thread_id]
 
 
-    def is_verb(self, word):
+    def is_verb(self, word, accent_insensitive=None):
         """
         :param word:
+        :param accent_insensitive: Lookup mode. If None, the analyzer default is used.
         :return:
         """
-        _v_info = self.get_verb_info(word)
+        _v_info = self.get_verb_info(word, accent_insensitive=accent_insensitive)
         return _v_info != None and len(_v_info) > 0
 
-    def get_verb_info(self, word):
-#        self.lock.acquire()
+    def get_verb_info(self, word, accent_insensitive=None):
+        """
+        Get the verbal forms matching a word. Personal forms take precedence over non personal ones.
+
+        Args:
+            - word: Verbal form to look up.
+            - accent_insensitive: Lookup mode. If None, the analyzer default is used.
 
-        _conn = self._get_connection()
-        _cur = _conn.cursor()
-        _cur.execute("SELECT * FROM personal_verbs where normalized_verb='" + word + "'")
-        _res = []
+        Returns:
+            A list of SpanishVerbalForm.
+        """
+        if accent_insensitive is None:
+            accent_insensitive = self.accent_insensitive
+        if self.metrics is not None:
+            _start_time = time.perf_counter()
+        _key = _normalize_word(word)
+        _cur = self._get_connection().cursor()
+        if accent_insensitive:
+            _cur.execute(self._SELECT_FORMS_ACCENT_INSENSITIVE, (_key, _key))
+        else:
+            _cur.execute(self._SELECT_FORMS_EXACT, (_key, word, _key, word))
+        _personal = []
+        _non_personal = []
         for _r in _cur.fetchall():
-            _verb = _r[2]
-            _person = int(_r[4])
-            _is_singular = int(_r[5]) == 1
-            _time = int(_r[6])
-            _verbal_mode = int(_r[7])
-            _is_simple = int(_r[8]) == 1
-            _is_personal = True
-            _is_perfect = None
-            _is_continuous = None
-            _is_participle = False
-            _is_geround = False
-            _infinitive = _r[3]
-            _res.append(SpanishVerbalForm(_verb, _time, _is_perfect, _is_continuous, _verbal_mode,
-                                          _is_personal, _person, _is_singular, _is_participle, _is_geround, _infinitive,
-                                          _is_simple))
-        if len(_res) == 0:
-            # Not found in personal verbs. Look into non personal verbs table.
-            _cur.execute("SELECT * FROM non_personal_verbs where normalized_verb='" + word + "'")
-            for _r in _cur.fetchall():
-                _verb = _r[2]
-                _person = None
-                _is_singular = None
-                _time = None
-                _verbal_mode = None
-                _is_simple = int(_r[5]) == 1
-                _is_personal = False
-                _is_perfect = None
-                _is_continuous = None
-                _is_participle = _r[4] == 3
-                _is_geround = _r[4] == 2
-                _infinitive = _r[3]
-                _res.append(SpanishVerbalForm(_verb, _time, _is_perfect, _is_continuous, _verbal_mode,
-                                              _is_personal, _person, _is_singular, _is_participle, _is_geround, _infinitive,
-                                              _is_simple))
-#        self.lock.release()
-        return _res
+            if _r[0] == 1:
+                _personal.append(self._personal_form(_r))
+            else:
+                _non_personal.append(self._non_personal_form(_r))
+        if self.metrics is not None:
+            self.metrics.observe("verb_lookup_seconds", time.perf_counter() - _start_time)
+            self.metrics.inc("verb_lookups_total")
+            if len(_personal) == 0 and len(_non_personal) == 0:
+                self.metrics.inc("verb_lookups_not_found_total")
+        if len(_personal) > 0:
+            return _personal
+        return _non_personal
+
+    @staticmethod
+    def _personal_form(row):
+        _verb = row[1]
+        _infinitive = row[2]
+        _person = int(row[3])
+        _is_singular = int(row[4]) == 1
+        _time = int(row[5])
+        _verbal_mode = int(row[6])
+        _is_simple = int(row[7]) == 1
+        return SpanishVerbalForm(_verb, _time, None, None, _verbal_mode, True, _person, _is_singular, False, False,
+                                 _infinitive, _is_simple)
+
+    @staticmethod
+    def _non_personal_form(row):
+        _verb = row[1]
+        _infinitive = row[2]
+        _type = int(row[3])
+        _is_simple = int(row[7]) == 1
+        _is_participle = _type == 3
+        _is_geround = _type == 2
+        return SpanishVerbalForm(_verb, None, None, None, None, False, None, None, _is_participle, _is_geround,
+                                 _infinitive, _is_simple)
 
     def close(self):
 #        self.conn.close()
-        _thread_id = threading.currentThread()
+        _thread_id = threading.current_thread()
         if _thread_id in self.connections:
             self.connections[_thread_id].close()
 
 
+class SpanishCliticForm():
+    """
+    A verbal form with its enclitic pronouns ("dámelo" -> "da" + ["me", "lo"]).
+    """
+
+    def __init__(self, word, verbal_form, clitics, is_pronominal):
+        self.word = word
+        self.verbal_form = verbal_form
+        self.clitics = clitics
+        self.is_pronominal = is_pronominal
+
+    @property
+    def infinitive(self):
+        return self.verbal_form.infinitive
+
+    @property
+    def lemma(self):
+        """
+        The pronominal infinitive ("lavarse") for pronominal uses, the infinitive otherwise.
+        """
+        if self.is_pronominal:
+            return self.verbal_form.infinitive + "se"
+        return self.verbal_form.infinitive
+
+    def __str__(self):
+        return "SpanishCliticForm:[word: {}, verb: {}, clitics: {}, infinitive: {}, is_pronominal: {}]".format(
+            self.word, self.verbal_form.verb, self.clitics, self.infinitive, self.is_pronominal)
+
+
+class SpanishCliticAnalyzer():
+    """
+    Analyze Spanish verbal forms with enclitic pronouns ("dámelo", "ponme", "diciéndoselo", "lavarse").
+
+    Every enclitic sequence ending the word is read by a precompiled automaton, and the written accent the clitics
+    forced on the stem is removed ("dá" -> "da"). All the candidate stems, and the word itself, are then resolved with
+    a single query over the covering `normalized_verb` indexes of the SpanishVerbAnalyzer database. Only infinitives,
+    gerunds and imperatives take enclitics; imperatives drop their last letter before "nos" and "os" ("sentémonos",
+    "sentaos").
+
+    Verbs of verbs_list_reflex used with their reflexive pronoun ("lávate", "sentarse") are pronominal: their lemma is
+    the pronominal infinitive ("lavarse"). A reflexive pronoun followed by a direct object is taken as an indirect
+    object ("diciéndoselo" -> "decir").
+    """
+
+    _SELECT_FORMS = """SELECT 1, verb, infinitive, person, singular, time, mode, simple, normalized_verb
+  FROM personal_verbs WHERE normalized_verb IN ({keys})
+UNION ALL
+SELECT 0, verb, infinitive, type, NULL, NULL, NULL, simple, normalized_verb
+  FROM non_personal_verbs WHERE normalized_verb IN ({keys})"""
+
+    def __init__(self, db_file_path=_SPANISH_VERB_DB_PATH, verb_analyzer=None, metrics=None):
+        """
+        Args:
+            - db_file_path: Path to the database built by SpanishVerbDatabaseBuilder.
+            - verb_analyzer: SpanishVerbAnalyzer whose connections are shared. If None, a new one is created.
+            - metrics: Optional lemmatization_lists.metrics.Metrics to record lookup times and counters into.
+        """
+        if verb_analyzer is None:
+            verb_analyzer = SpanishVerbAnalyzer(db_file_path, metrics=metrics)
+        self.verb_analyzer = verb_analyzer
+        self.metrics = metrics
+        self.reflex_verbs = self._load_reflex_verbs()
+
+    @staticmethod
+    def _load_reflex_verbs():
+        """
+        Returns:
+            The set of (single word) verbs of verbs_list_reflex. Phrases ("abrir camino") are skipped.
+        """
+        _res = set()
+        with open(_REFLEX_VERB_LIST_PATH, "r") as _f:
+            for _l in _f:
+                _l = _l.strip()
+                if len(_l) > 0 and not _l.startswith("#") and " " not in _l:
+                    _res.add(_l)
+        return _res
+
+    @staticmethod
+    def _split_clitics(word):
+        """
+        Args:
+            - word: Lower cased word.
+
+        Returns:
+            A list of (stem, clitics) with every enclitic sequence ending the word, longest first.
+        """
+        _res = []
+        _node = _CLITIC_AUTOMATON
+        # Stems have at least two letters ("da", "id")
+        for _i in range(len(word) - 1, 1, -1):
+            _node = _node.get(word[_i])
+            if _node is None:
+                break
+            if _END in _node:
+                _res.append((word[:_i], _node[_END]))
+        _res.reverse()
+        return _res
+
+    @staticmethod
+    def has_clitics(word):
+        """
+        Cheap check, without any query, of whether a word may be a verbal form with enclitic pronouns.
+        Args:
+            - word: Lower cased word.
+
+        Returns:
+            Whether an enclitic sequence ends the word.
+        """
+        return len(SpanishCliticAnalyzer._split_clitics(word)) > 0
+
+    def _candidates(self, word):
+        """
+        Args:
+            - word: Lower cased word.
+
+        Returns:
+            A list of (spelling, clitics, is_shortened) with the possible verbal forms of the word: the word itself
+            first, then the stems of its enclitic sequences, longest sequence first.
+        """
+        _res = [(word, (), False)]
+        for _stem, _clitics in self._split_clitics(word):
+            _stem = _stem.translate(_ACCENT_TRANSLATION)
+            _res.append((_stem, _clitics, False))
+            if _clitics[0] == "nos" and _stem.endswith("mo"):
+                _res.append((_stem + "s", _clitics, True))
+            elif _clitics[0] == "os":
+                _res.append((_stem + "d", _clitics, True))
+        return _res
+
+    def _is_pronominal(self, verbal_form, clitics):
+        if len(clitics) == 0 or verbal_form.infinitive not in self.reflex_verbs:
+            return False
+        # Followed by a direct object, the pronoun is taken as an indirect one ("díselo", "dámelo")
+        if len(clitics) > 1 and clitics[1] in ("lo", "la", "los", "las"):
+            return False
+        if verbal_form.is_personal:
+            return clitics[0] == _REFLEXIVE_PRONOUNS[(verbal_form.person, verbal_form.is_singular)]
+        # The person of infinitives and gerunds is the one of the subject ("quiero lavarme")
+        return clitics[0] in ("me", "te", "se", "nos", "os")
+
+    def analyze(self, word):
+        """
+        Get the verbal forms of a word, with or without enclitic pronouns.
+
+        Args:
+            - word: Word to analyze.
+
+        Returns:
+            A list of SpanishCliticForm. Readings of the whole word as a verbal form (no clitics) come first, then
+            readings with enclitics, longest enclitic sequence first.
+        """
+        if self.metrics is not None:
+            _start_time = time.perf_counter()
+        _word = word.lower()
+        _candidates = self._candidates(_word)
+        _candidates_by_key = {}
+        for _candidate in _candidates:
+            _candidates_by_key.setdefault(_normalize_word(_candidate[0]), []).append(_candidate)
+        _keys = list(_candidates_by_key)
+        _cur = self.verb_analyzer._get_connection().cursor()
+        _cur.execute(self._SELECT_FORMS.format(keys=", ".join(["?"] * len(_keys))), _keys + _keys)
+        _matches = {}
+        for _r in _cur.fetchall():
+            _verb = _r[1]
+            if _r[0] == 1:
+                _verbal_form = SpanishVerbAnalyzer._personal_form(_r)
+            else:
+                _verbal_form = SpanishVerbAnalyzer._non_personal_form(_r)
+            for _candidate in _candidates_by_key[_r[8]]:
+                _spelling, _clitics, _is_shortened = _candidate
+                if len(_clitics) == 0:
+                    if _verb != _spelling:
+                        continue
+                elif _verb.translate(_ACCENT_TRANSLATION) != _spelling:
+                    continue
+                elif _verbal_form.is_personal:
+                    # Only imperatives, and only 1st and 2nd person plural ones shorten ("sentémonos", "sentaos")
+                    if _verbal_form.verbal_mode != 3:
+                        continue
+                    if _is_shortened and (_verbal_form.is_singular or _verbal_form.person == 3):
+                        continue
+                elif _is_shortened or _verbal_form.is_participle:
+                    continue
+                _matches.setdefault(_candidate, []).append(
+                    SpanishCliticForm(word, _verbal_form, list(_clitics),
+                                      self._is_pronominal(_verbal_form, _clitics)))
+        _res = []
+        for _candidate in _candidates:
+            # Personal forms take precedence over non personal ones, as in SpanishVerbAnalyzer.get_verb_info
+            _res.extend(sorted(_matches.get(_candidate, []), key=lambda f: not f.verbal_form.is_personal))
+        if self.metrics is not None:
+            self.metrics.observe("clitic_lookup_seconds", time.perf_counter() - _start_time)
+            self.metrics.inc("clitic_lookups_total")
+        return _res
+
+    def close(self):
+        self.verb_analyzer.close()
+
+
 
 class SpanishVerbalForm():
 
@@ -393,9 +852,21 @@ class SpanishVerbalForm():
 
 class SpanishLemmatizer():
 
-    def __init__(self):
+    def __init__(self, metrics=None, db_file_path=_SPANISH_VERB_DB_PATH, clitics=True):
+        """
+        Args:
+            - metrics: Optional lemmatization_lists.metrics.Metrics to record stemming and verb lookup times into.
+            - db_file_path: Spanish verbs database (see SpanishVerbDatabaseBuilder).
+            - clitics: Whether words which are not verbal forms are analyzed as verbal forms with enclitic pronouns
+              ("dámelo"). Only words ending with an enclitic sequence cost an extra query.
+        """
+        self.metrics = metrics
         self.snowball_stemmer = SnowballStemmer("spanish")
-        self.spanish_verb_analyzer = SpanishVerbAnalyzer()
+        self.spanish_verb_analyzer = SpanishVerbAnalyzer(db_file_path, metrics=metrics)
+        self.spanish_clitic_analyzer = None
+        if clitics:
+            self.spanish_clitic_analyzer = SpanishCliticAnalyzer(verb_analyzer=self.spanish_verb_analyzer,
+                                                                 metrics=metrics)
 
     def get_lemmas(self, word, strategy="ALL"):
         """
@@ -416,11 +887,20 @@ class SpanishLemmatizer():
         """
         _res = []
         if strategy == "ALL" or strategy == "VERB":
+            if self.metrics is not None:
+                _start_time = time.perf_counter()
             _snowball_lemma = self.snowball_stemmer.stem(word)
+            if self.metrics is not None:
+                self.metrics.observe("stemming_seconds", time.perf_counter() - _start_time)
             _verb_lemma = None
             _verbal_form_list = self.spanish_verb_analyzer.get_verb_info(word)
             if _verbal_form_list != None and len(_verbal_form_list) > 0:
                 _verb_lemma = _verbal_form_list[0].infinitive
+            elif self.spanish_clitic_analyzer is not None and SpanishCliticAnalyzer.has_clitics(word.lower()):
+                # Verbal forms with enclitic pronouns ("dámelo")
+                _clitic_form_list = self.spanish_clitic_analyzer.analyze(word)
+                if len(_clitic_form_list) > 0:
+                    _verb_lemma = _clitic_form_list[0].infinitive
             if strategy == "ALL":
                 if _snowball_lemma != None:
                     _res.append(_snowball_lemma)
@@ -455,10 +935,15 @@ class SpanishLemmatizer():
         Returns:
             A list of strings, containing the lemmas.
         """
+        if self.metrics is not None:
+            _start_time = time.perf_counter()
         _res = []
         for _w in text:
             for _l in self.get_lemmas(_w, strategy=strategy):
                 _res.append(_l)
+        if self.metrics is not None:
+            self.metrics.observe("text_seconds", time.perf_counter() - _start_time)
+            self.metrics.inc("text_tokens_total", len(text))
         return _res
 
 
@@ -0,0 +1,252 @@
+"""
+Lexicon based language identification, without loading the lemmatization dictionaries.
+
+The word forms of every lemmatization list are stored in one Bloom filter per language (about 8 bits per form with
+the default 2% false positive rate). A text is identified by hashing each of its distinct words once (BLAKE2b,
+with double hashing to derive the bit positions) and checking the positions against the filters of all languages
+at once with NumPy. Words known to several languages weigh less than words specific to one of them.
+
+    python -m lemmatization_lists.language_id build language_id.bin
+    python -m lemmatization_lists.language_id identify language_id.bin "The children walked home"
+"""
+from hashlib import blake2b
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Text, Tuple
+import math
+import struct
+import numpy as np
+
+from .lemmatizers import DictionaryLemmatizer, LemmatizedToken, get_available_languages, read_lemmatization_pairs
+from .tokenizer import Tokenizer
+
+
+_MAGIC = b"LLBLOOM\x01"
+_HEADER = struct.Struct("<II")
+_FILTER_HEADER = struct.Struct("<QQ")
+
+
+def _hashes(words: Iterable[Text]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param words:
+    :return: Two independent 64 bit hashes of every word, as uint64 arrays.
+    """
+    digests = b"".join(blake2b(w.encode("utf-8"), digest_size=16).digest() for w in words)
+    h = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+    # Odd second hashes never cycle on power of two sizes, and are harmless otherwise
+    return h[:, 0].copy(), h[:, 1] | np.uint64(1)
+
+
+class BloomFilter(object):
+    """
+    Bloom filter over strings with k positions derived by double hashing: (h1 + i * h2) mod m.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[np.ndarray] = None):
+        """
+        :param num_bits: Size of the filter (m).
+        :param num_hashes: Number of positions per element (k).
+        :param bits: Bit array packed in uint8 (a new empty one if None).
+        """
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else np.zeros((num_bits + 7) // 8, dtype=np.uint8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float = 0.02) -> "BloomFilter":
+        """
+        :param capacity: Expected number of elements.
+        :param false_positive_rate: Target false positive rate.
+        :return: An empty filter of optimal size.
+        """
+        num_bits = max(64, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        num_hashes = max(1, int(round(num_bits / max(1, capacity) * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """
+        :return: Array of shape (len(h1), num_hashes) with the bit positions of every element.
+        """
+        m = np.uint64(self.num_bits)
+        i = np.arange(self.num_hashes, dtype=np.uint64)
+        # Reduce before multiplying so that nothing wraps around
+        return ((h1 % m)[:, None] + ((h2 % m)[:, None] * i) % m) % m
+
+    def add_hashes(self, h1: np.ndarray, h2: np.ndarray):
+        positions = self._positions(h1, h2).ravel()
+        np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.intp),
+                         np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+
+    def contains_hashes(self, h1: np.ndarray, h2: np.ndarray) -> np.ndarray:
+        """
+        :return: Boolean array telling whether every element may be in the filter.
+        """
+        positions = self._positions(h1, h2)
+        bytes_ = self.bits[(positions >> np.uint64(3)).astype(np.intp)]
+        return np.all((bytes_ >> (positions & np.uint64(7)).astype(np.uint8)) & 1, axis=1)
+
+    def add(self, words: Iterable[Text]):
+        self.add_hashes(*_hashes(words))
+
+    def __contains__(self, word: Text) -> bool:
+        return bool(self.contains_hashes(*_hashes([word]))[0])
+
+    def memory_size(self) -> int:
+        return self.bits.nbytes
+
+
+class LanguageIdentifier(object):
+    """
+    Scores texts against the lexicons of several languages, stored as Bloom filters.
+    """
+
+    def __init__(self, filters: Dict[Text, BloomFilter]):
+        """
+        :param filters: Dictionary language -> filter of its (lower cased) word forms.
+        """
+        self.filters = filters
+        self.langs = sorted(filters)
+        self._tokenizer = Tokenizer(punctuation=False)
+
+    @classmethod
+    def build(cls, langs: Optional[List[Text]] = None, false_positive_rate: float = 0.02) -> "LanguageIdentifier":
+        """
+        Build the filters from the lemmatization lists.
+        :param langs: Languages (default: all the available ones).
+        :param false_positive_rate: Target false positive rate of every filter.
+        :return: The identifier.
+        """
+        filters = {}
+        for lang in langs or get_available_languages():
+            forms = set()
+            for lemma, word in read_lemmatization_pairs(lang):
+                forms.add(word.lower())
+                forms.add(lemma.lower())
+            bloom_filter = BloomFilter.for_capacity(len(forms), false_positive_rate)
+            bloom_filter.add(forms)
+            filters[lang] = bloom_filter
+        return cls(filters)
+
+    def scores(self, words: Iterable[Text]) -> List[Tuple[Text, float]]:
+        """
+        :param words: Words of a text.
+        :return: List of (language, score) sorted by decreasing score. Every word known to n languages adds 1 / n to
+          the score of each of them; scores are divided by the number of words, so they range from 0 to 1.
+        """
+        counts = {}
+        for w in words:
+            w = w.lower()
+            counts[w] = counts.get(w, 0) + 1
+        if len(counts) == 0:
+            return [(lang, 0.0) for lang in self.langs]
+        h1, h2 = _hashes(counts)
+        found = np.array([self.filters[lang].contains_hashes(h1, h2) for lang in self.langs])
+        num_langs = found.sum(axis=0)
+        weights = np.array(list(counts.values()), dtype=np.float64) / np.maximum(num_langs, 1)
+        total = sum(counts.values())
+        res = [(lang, float(found[i].dot(weights)) / total) for i, lang in enumerate(self.langs)]
+        res.sort(key=lambda x: (-x[1], x[0]))
+        return res
+
+    def identify(self, text: Text, min_score: float = 0.0) -> Optional[Text]:
+        """
+        :param text:
+        :param min_score: Minimum score of the best language.
+        :return: The most likely language of the text, or None if no language reaches min_score.
+        """
+        lang, score = self.scores(self._tokenizer.words(text))[0]
+        return lang if score > min_score else None
+
+    def memory_size(self) -> int:
+        return sum(f.memory_size() for f in self.filters.values())
+
+    def write(self, f: BinaryIO):
+        f.write(_MAGIC)
+        f.write(_HEADER.pack(len(self.langs), 0))
+        for lang in self.langs:
+            bloom_filter = self.filters[lang]
+            name = lang.encode("utf-8")
+            f.write(struct.pack("<B", len(name)))
+            f.write(name)
+            f.write(_FILTER_HEADER.pack(bloom_filter.num_bits, bloom_filter.num_hashes))
+            f.write(bloom_filter.bits.tobytes())
+
+    @classmethod
+    def read(cls, f: BinaryIO) -> "LanguageIdentifier":
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("Not a language identification file")
+        num_langs, _ = _HEADER.unpack(f.read(_HEADER.size))
+        filters = {}
+        for _ in range(num_langs):
+            name_length = struct.unpack("<B", f.read(1))[0]
+            lang = f.read(name_length).decode("utf-8")
+            num_bits, num_hashes = _FILTER_HEADER.unpack(f.read(_FILTER_HEADER.size))
+            bits = np.frombuffer(f.read((num_bits + 7) // 8), dtype=np.uint8).copy()
+            filters[lang] = BloomFilter(num_bits, num_hashes, bits)
+        return cls(filters)
+
+    def save(self, path: Text):
+        with open(path, "wb") as f:
+            self.write(f)
+
+    @classmethod
+    def load(cls, path: Text) -> "LanguageIdentifier":
+        with open(path, "rb") as f:
+            return cls.read(f)
+
+
+class LanguageRouter(object):
+    """
+    Lemmatize texts of unknown language: identify the language and use its lemmatizer, loaded on first use.
+    """
+
+    def __init__(self, identifier: LanguageIdentifier, min_score: float = 0.0,
+                 lemmatizer_factory: Callable[[Text], DictionaryLemmatizer] = DictionaryLemmatizer):
+        """
+        :param identifier:
+        :param min_score: See LanguageIdentifier.identify.
+        :param lemmatizer_factory: Function from a language to its lemmatizer.
+        """
+        self.identifier = identifier
+        self.min_score = min_score
+        self.lemmatizer_factory = lemmatizer_factory
+        self.lemmatizers = {}
+
+    def get_lemmatizer(self, lang: Text) -> DictionaryLemmatizer:
+        lemmatizer = self.lemmatizers.get(lang)
+        if lemmatizer is None:
+            lemmatizer = self.lemmatizer_factory(lang)
+            self.lemmatizers[lang] = lemmatizer
+        return lemmatizer
+
+    def lemmatize_text(self, text: Text, **kwargs) -> Tuple[Optional[Text], List[LemmatizedToken]]:
+        """
+        :param text:
+        :param kwargs: Arguments of DictionaryLemmatizer.lemmatize_text.
+        :return: The identified language and the lemmatized tokens (no tokens if the language is not identified).
+        """
+        lang = self.identifier.identify(text, self.min_score)
+        if lang is None:
+            return None, []
+        return lang, self.get_lemmatizer(lang).lemmatize_text(text, **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Lexicon based language identification.")
+    subparsers = parser.add_subparsers(dest="command")
+    build_parser = subparsers.add_parser("build", help="Build the Bloom filters of the lemmatization lists")
+    build_parser.add_argument("path")
+    build_parser.add_argument("langs", nargs="*", help="Languages (default: all the available ones)")
+    build_parser.add_argument("--false-positive-rate", type=float, default=0.02)
+    identify_parser = subparsers.add_parser("identify", help="Score a text against every language")
+    identify_parser.add_argument("path")
+    identify_parser.add_argument("text")
+    args = parser.parse_args()
+    if args.command == "build":
+        _identifier = LanguageIdentifier.build(args.langs or None, args.false_positive_rate)
+        _identifier.save(args.path)
+        print("{} languages, {:.1f} MB".format(len(_identifier.langs), _identifier.memory_size() / (1024 * 1024)))
+    elif args.command == "identify":
+        for _lang, _score in LanguageIdentifier.load(args.path).scores(Tokenizer().words(args.text)):
+            print("{}\t{:.3f}".format(_lang, _score))
+    else:
+        parser.print_help()
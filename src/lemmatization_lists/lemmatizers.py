@@ -1,8 +1,48 @@
-from typing import Dict, List, Set, Text
-from pkg_resources import resource_stream
+from collections.abc import Mapping
+from contextlib import contextmanager
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Text, Tuple, TYPE_CHECKING
+import gzip
+import importlib.resources
+import io
+import logging
+import lzma
+import os
+import threading
+import time
 import unidecode
-from spacy.language import Language
-from spacy.tokens import Doc
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+if TYPE_CHECKING:
+    # Spacy takes seconds to import: it is only needed by SpanishPosLemmatizer, which receives a loaded model
+    from spacy.language import Language
+    from spacy.tokens import Doc
+
+from .cache import LRUCache
+from .dawg import LemmaDawg
+from .fuzzy import DeletionIndex
+from .metrics import Labels, Metrics
+from .suffix_rules import SuffixRuleGuesser
+from .tiered import TieredLexicon
+from .tokenizer import Tokenizer
+
+
+class _TransliterationTable(dict):
+    """
+    Translation table (see str.translate) from code points to their unidecode transliteration, filled on demand.
+    Unidecode transliterates every character on its own, so translating a word gives the same result as
+    unidecode, without its per character overhead.
+    """
+
+    def __missing__(self, code_point: int) -> Text:
+        res = unidecode.unidecode(chr(code_point))
+        self[code_point] = res
+        return res
+
+
+_TRANSLITERATION_TABLE = _TransliterationTable()
 
 
 def _normalize_word(word: Text) -> Text:
@@ -13,7 +53,121 @@ def _normalize_word(word: Text) -> Text:
     :param word:
     :return: The normalized word
     """
-    return unidecode.unidecode(word.lower())
+    if word.isascii():
+        return word.lower()
+    return word.lower().translate(_TRANSLITERATION_TABLE)
+
+
+def _resource(name: Text):
+    """
+    :param name: Resource name, relative to the package, with "/" separators.
+    :return: The resource, as a Traversable.
+    """
+    res = importlib.resources.files(__package__)
+    for part in name.split("/"):
+        res = res.joinpath(part)
+    return res
+
+
+def _resource_exists(name: Text) -> bool:
+    return _resource(name).is_file()
+
+
+def _open_resource(name: Text) -> BinaryIO:
+    return _resource(name).open("rb")
+
+
+class LemmatizedToken(NamedTuple):
+    text: Text
+    start: int
+    end: int
+    lemmas: List[Text]
+
+
+_NOT_OVERLAID = object()
+
+_INVERSE_DELTA_OPERATIONS = {"+": "-", "-": "+"}
+
+# Overlays are folded into their base dictionary once they are larger than 1 / _OVERLAY_COMPACTION_RATIO of it
+_OVERLAY_COMPACTION_RATIO = 8
+
+
+class _OverlayDict(Mapping):
+    """
+    Read only view of a dictionary with some entries replaced, or removed (None), by a small overlay dictionary.
+    """
+
+    __slots__ = ("base", "overlay", "_len")
+
+    def __init__(self, base: Mapping, overlay: Dict[Text, Optional[List[Text]]]):
+        self.base = base
+        self.overlay = overlay
+        size = len(base)
+        for word, lemmas in overlay.items():
+            if lemmas is None and word in base:
+                size -= 1
+            elif lemmas is not None and word not in base:
+                size += 1
+        self._len = size
+
+    def get(self, word: Text, default=None):
+        lemmas = self.overlay.get(word, _NOT_OVERLAID)
+        if lemmas is _NOT_OVERLAID:
+            return self.base.get(word, default)
+        return default if lemmas is None else lemmas
+
+    def __getitem__(self, word: Text) -> List[Text]:
+        lemmas = self.get(word)
+        if lemmas is None:
+            raise KeyError(word)
+        return lemmas
+
+    def __contains__(self, word) -> bool:
+        return self.get(word) is not None
+
+    def __iter__(self) -> Iterator[Text]:
+        for word in self.base:
+            if word not in self.overlay:
+                yield word
+        for word, lemmas in self.overlay.items():
+            if lemmas is not None:
+                yield word
+
+    def __len__(self) -> int:
+        return self._len
+
+
+def _with_changes(lemma_dict: Mapping, changes: Dict[Text, Optional[List[Text]]]) -> Mapping:
+    """
+    :param lemma_dict: A dictionary, or an _OverlayDict.
+    :param changes: New lemmas of some words (None to remove them).
+    :return: View of lemma_dict with the changes, which is not modified. Only the overlay is copied, unless it has
+      grown enough to be folded into a new base dictionary.
+    """
+    if isinstance(lemma_dict, _OverlayDict):
+        base = lemma_dict.base
+        overlay = dict(lemma_dict.overlay)
+    else:
+        base = lemma_dict
+        overlay = {}
+    overlay.update(changes)
+    if len(overlay) * _OVERLAY_COMPACTION_RATIO > len(base):
+        base = dict(base)
+        for word, lemmas in overlay.items():
+            if lemmas is None:
+                base.pop(word, None)
+            else:
+                base[word] = lemmas
+        return base
+    return _OverlayDict(base, overlay)
+
+
+class _Lexicon(NamedTuple):
+    """
+    Dictionaries of a DictionaryLemmatizer, replaced together by deltas.
+    """
+    lemma_dict: Mapping
+    lemma_dict_norm: Mapping
 
 
 class UnsupportedLanguageException(Exception):
@@ -23,6 +177,94 @@ class UnsupportedLanguageException(Exception):
     pass
 
 
+def _parse_lemmatization_line(s: bytes) -> Optional[Tuple[Text, Text]]:
+    """
+    :param s: Line of a lemmatization list.
+    :return: The (lemma, word) pair of the line, or None if the line is not valid.
+    """
+    l = s.decode('utf-8-sig').strip().split()
+    if len(l) < 2:
+        return None
+    return l[0], l[1]
+
+
+# Supported lemmatization list files, by order of preference
+LEMMATIZATION_LIST_EXTENSIONS = [
+    ".txt",
+    ".txt.gz",
+    ".txt.zst",
+    ".txt.xz"
+]
+
+
+def _decompressing_stream(raw: BinaryIO, extension: Text) -> BinaryIO:
+    """
+    :param raw: Binary stream over a (possibly compressed) lemmatization list.
+    :param extension: One of LEMMATIZATION_LIST_EXTENSIONS.
+    :return: Binary stream over the decompressed content. Decompression is done on the fly, as it is read.
+    """
+    if extension.endswith(".gz"):
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if extension.endswith(".xz"):
+        return lzma.LZMAFile(raw, mode="rb")
+    if extension.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("The zstandard package is required to read .zst lemmatization lists")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw), buffer_size=1 << 16)
+    return raw
+
+
+def _find_lemmatization_list(lang: Text) -> Optional[Text]:
+    """
+    :param lang: Language.
+    :return: The resource name of the lemmatization list of the language, or None if it is not available.
+    """
+    for extension in LEMMATIZATION_LIST_EXTENSIONS:
+        if extension.endswith(".zst") and zstandard is None:
+            continue
+        name = "data/lemmatization-{}{}".format(lang, extension)
+        if _resource_exists(name):
+            return name
+    return None
+
+
+@contextmanager
+def open_lemmatization_list(lang: Text) -> Iterator[BinaryIO]:
+    """
+    Open the lemmatization list of a language. Lists may be stored either as plain text or compressed with gzip,
+    zstd or xz (`lemmatization-<lang>.txt[.gz|.zst|.xz]`).
+    :param lang: Language.
+    :return: Context manager yielding a binary stream over the lines of the lemmatization list.
+    """
+    name = _find_lemmatization_list(lang)
+    if name is None:
+        raise FileNotFoundError("No lemmatization list found for language '{}'".format(lang))
+    with _open_resource(name) as raw:
+        with _decompressing_stream(raw, name[name.index(".txt"):]) as f:
+            yield f
+
+
+def read_lemmatization_pairs(lang: Text) -> Iterator[Tuple[Text, Text]]:
+    """
+    Stream the pairs of the lemmatization list of a language.
+    :param lang: Language.
+    :return: Iterator over (lemma, word) pairs.
+    """
+    with open_lemmatization_list(lang) as f:
+        # Decoding the whole stream is much faster than decoding every line
+        for s in io.TextIOWrapper(f, encoding="utf-8-sig"):
+            l = s.split()
+            if len(l) >= 2:
+                yield l[0], l[1]
+
+
+def get_available_languages() -> List[Text]:
+    """
+    :return: The supported languages whose lemmatization list is available in the package resources.
+    """
+    return [lang for lang in Lemmatizer.SUPPORTED_LANGUAGES if _find_lemmatization_list(lang) is not None]
+
+
 class Lemmatizer(object):
     """
     Abstract class for lemmatizers.
@@ -46,6 +288,7 @@ class Lemmatizer(object):
         "gv",
         "hu",
         "it",
+        "pl",
         "pt",
         "ro",
         "sk",
@@ -78,15 +321,85 @@ class DictionaryLemmatizer(Lemmatizer):
     Lemmatizer based on an in memory dictionary.
     """
 
-    def __init__(self, lang: Text):
+    LEXICON_FORMATS = [
+        "dict",
+        "dawg",
+        "tiered"
+    ]
+
+    def __init__(self, lang: Text, lexicon_format: Text = "dict", fuzzy_distance: int = 0, oov_guesses: int = 0,
+                 metrics: Optional[Metrics] = None, hot_words: Optional[Iterable[Text]] = None,
+                 hot_size: int = 10000):
         """
         :param lang: Language. Valid values are contained in SUPPORTED_LANGUAGES.
+        :param lexicon_format: In memory representation of the lemma dictionaries. Valid values are:
+          - "dict": Python dictionaries. Fastest lookups.
+          - "dawg": Compressed minimal automata (see LemmaDawg). Precompiled `lemmatization-<lang>.dawg` and
+            `lemmatization-norm-<lang>.dawg` resources are used if available; otherwise the automata are compiled
+            from the lemmatization list on load.
+          - "tiered": The "dawg" automata behind small dictionaries with the most frequent words (see
+            TieredLexicon). Requires hot_words.
+        :param fuzzy_distance: If greater than 0, words not found in the dictionary are looked up with a tolerance
+          of up to fuzzy_distance edits (see DeletionIndex), and the lemmas of the closest words are returned.
+        :param oov_guesses: If greater than 0, the lemmas of words not found in the dictionary (nor by fuzzy lookup)
+          are guessed with suffix rules learned from the dictionary (see SuffixRuleGuesser), and up to oov_guesses
+          ranked lemmas are returned.
+        :param metrics: If given, load time and lookup, OOV and ambiguity counters are recorded into it (and the
+          lookups answered by each tier, for the "tiered" format).
+        :param hot_words: For the "tiered" format, words by decreasing frequency (e.g. from read_frequency_list).
+        :param hot_size: For the "tiered" format, number of most frequent words in the hot tier.
         """
         super().__init__(lang)
         if lang not in self.SUPPORTED_LANGUAGES:
             raise UnsupportedLanguageException("Language '{}' is not supported".format(lang))
-        self.lemma_dict = self._build_dictionary(lang)
-        self.lemma_dict_norm = self._build_dictionary_norm(self.lemma_dict)
+        if lexicon_format not in self.LEXICON_FORMATS:
+            raise ValueError("Lexicon format '{}' is not supported".format(lexicon_format))
+        self.lexicon_format = lexicon_format
+        self.metrics = metrics
+        self._metrics_labels = (("lang", lang),)
+        start_time = time.perf_counter()
+        if lexicon_format == "dawg":
+            self._lexicon = _Lexicon(*self._load_dawgs(lang))
+        elif lexicon_format == "tiered":
+            if hot_words is None:
+                raise ValueError("The 'tiered' lexicon format requires hot words")
+            hot_words = [w.lower() for w in islice(hot_words, hot_size)]
+            lemma_dawg, lemma_dawg_norm = self._load_dawgs(lang)
+            self._lexicon = _Lexicon(TieredLexicon.from_lexicon(lemma_dawg, hot_words, hot_size),
+                                     TieredLexicon.from_lexicon(lemma_dawg_norm, hot_words, hot_size))
+            if metrics is not None:
+                metrics.register_collector(self._tier_counters)
+        else:
+            lemma_dict = self._build_dictionary(lang)
+            self._lexicon = _Lexicon(lemma_dict, self._build_dictionary_norm(lemma_dict))
+        self.fuzzy_index = None
+        if fuzzy_distance > 0:
+            self.fuzzy_index = DeletionIndex(self.lemma_dict.keys(), fuzzy_distance)
+        self.oov_guesses = oov_guesses
+        self.suffix_guesser = None
+        if oov_guesses > 0:
+            self.suffix_guesser = SuffixRuleGuesser.from_dict(self.lemma_dict)
+        if metrics is not None:
+            metrics.observe("dictionary_load_seconds", time.perf_counter() - start_time, self._metrics_labels)
+        self._tokenizer = Tokenizer(lang)
+        self._word_tokenizer = Tokenizer(lang, punctuation=False)
+        self._update_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = None
+
+    @property
+    def lemma_dict(self) -> Mapping:
+        """
+        Dictionary word -> list of lemmas.
+        """
+        return self._lexicon.lemma_dict
+
+    @property
+    def lemma_dict_norm(self) -> Mapping:
+        """
+        Dictionary word -> list of normalized lemmas. Normalized words are also included.
+        """
+        return self._lexicon.lemma_dict_norm
 
     def _add_lemmatization_entry(self, lemma_dict: Dict[Text, List[Text]], word, lemma):
         """
@@ -106,44 +419,333 @@ class DictionaryLemmatizer(Lemmatizer):
         :return: The dictionary of lemmas.
         """
         lemma_dict = {}
-        with resource_stream(__name__, "data/lemmatization-{}.txt".format(lang)) as f:
-            for s in f.readlines():
-                l = s.decode('utf-8-sig').strip().split()
-                if l is None or len(l) < 2:
-                    continue
-                self._add_lemmatization_entry(lemma_dict, l[1], l[0])
-                # Ensure that lemmas themselves are also included into the dictionary
-                self._add_lemmatization_entry(lemma_dict, l[0], l[0])
+        # Every lemma has many forms: keep a single copy of each lemma string
+        lemmas = {}
+        for lemma, word in read_lemmatization_pairs(lang):
+            lemma = lemmas.setdefault(lemma, lemma)
+            self._add_lemmatization_entry(lemma_dict, word, lemma)
+            # Ensure that lemmas themselves are also included into the dictionary
+            self._add_lemmatization_entry(lemma_dict, lemma, lemma)
+        self._share_lemma_lists(lemma_dict)
         return lemma_dict
 
+    @staticmethod
+    def _share_lemma_lists(lemma_dict: Dict[Text, List[Text]]):
+        """
+        Make all the words with the same lemmas share a single list, which must not be modified afterwards (deltas
+        replace lists instead of modifying them, and get_lemma and get_lema_norm return copies).
+        :param lemma_dict:
+        """
+        shared = {}
+        for word, lemmas in lemma_dict.items():
+            lemma_dict[word] = shared.setdefault(tuple(lemmas), lemmas)
+
     def _build_dictionary_norm(self, lemma_dict:Dict[Text, List[Text]]) -> Dict[Text, List[Text]]:
         """
-        Normalize a dictionary of lemmas.
+        Normalize a dictionary of lemmas. Lemmas are normalized once per distinct list of lemmas, and normalized
+        strings equal to the original ones are not copied.
         :param lemma_dict:
         :return: Normalized dictionary of lemmas.
         """
         res = {}
+        normalized_lists = {}
+        normalized_strings = {}
         for word, lemmas in lemma_dict.items():
-            _normalized_lemmas = [_normalize_word(w) for w in lemmas]
+            _normalized_lemmas = normalized_lists.get(id(lemmas))
+            if _normalized_lemmas is None:
+                _normalized_lemmas = []
+                for lemma in lemmas:
+                    _normalized_lemma = normalized_strings.get(lemma)
+                    if _normalized_lemma is None:
+                        _normalized_lemma = _normalize_word(lemma)
+                        if _normalized_lemma == lemma:
+                            _normalized_lemma = lemma
+                        normalized_strings[lemma] = _normalized_lemma
+                    _normalized_lemmas.append(_normalized_lemma)
+                # Lists are shared: lemma_dict keeps them alive, so their ids are not reused
+                normalized_lists[id(lemmas)] = _normalized_lemmas
             res[word] = _normalized_lemmas
             res[_normalize_word(word)] = _normalized_lemmas
+        self._share_lemma_lists(res)
         return res
 
+    def apply_delta(self, delta: Iterable[Tuple[Text, Text, Text]]) -> List[Tuple[Text, Text, Text]]:
+        """
+        Incrementally add or remove (lemma, word) pairs, without rebuilding the dictionaries.
+
+        Only the affected entries are recomputed. They are kept in small overlays over the dictionaries (folded into
+        new dictionaries once they grow), and both views replace the current ones in a single assignment:
+        concurrent lookups see either the old or the new state, never a partial one.
+        Only the "dict" lexicon format supports deltas. The fuzzy index and the suffix guesser are not updated: fuzzy
+        lookups skip the removed words, and do not find the added ones.
+
+        :param delta: Iterable of (operation, lemma, word), where operation is "+" (add) or "-" (remove).
+        :return: The operations which changed an entry, one per changed word: adding a pair may also add the lemma
+          as a word, as ("+", lemma, lemma). Applying their inverses reverts the delta.
+        """
+        if self.lexicon_format != "dict":
+            raise ValueError("Deltas are not supported by the '{}' lexicon format".format(self.lexicon_format))
+        with self._update_lock:
+            lexicon = self._lexicon
+            changes = {}
+            applied = []
+
+            def _get_lemmas(w: Text) -> List[Text]:
+                lemmas = changes[w] if w in changes else lexicon.lemma_dict.get(w)
+                return [] if lemmas is None else lemmas
+
+            for operation, lemma, word in delta:
+                if operation == "+":
+                    for w in (word, lemma):
+                        lemmas = _get_lemmas(w)
+                        if lemma not in lemmas:
+                            # Lists may be in use by readers: replace them instead of modifying them
+                            changes[w] = lemmas + [lemma]
+                            applied.append(("+", lemma, w))
+                elif operation == "-":
+                    lemmas = _get_lemmas(word)
+                    if lemma in lemmas:
+                        lemmas = [l for l in lemmas if l != lemma]
+                        changes[word] = lemmas if len(lemmas) > 0 else None
+                        applied.append(("-", lemma, word))
+                else:
+                    raise ValueError("Unknown delta operation '{}'".format(operation))
+            if len(changes) == 0:
+                return applied
+            norm_changes = {}
+            for word, lemmas in changes.items():
+                normalized_word = _normalize_word(word)
+                if lemmas is not None:
+                    normalized_lemmas = [_normalize_word(l) for l in lemmas]
+                    norm_changes[word] = normalized_lemmas
+                    norm_changes[normalized_word] = normalized_lemmas
+                    continue
+                norm_changes[word] = None
+                normalized_word_lemmas = _get_lemmas(normalized_word)
+                if len(normalized_word_lemmas) > 0:
+                    norm_changes[normalized_word] = [_normalize_word(l) for l in normalized_word_lemmas]
+                elif normalized_word != word:
+                    norm_changes[normalized_word] = None
+            self._lexicon = _Lexicon(_with_changes(lexicon.lemma_dict, changes),
+                                     _with_changes(lexicon.lemma_dict_norm, norm_changes))
+            return applied
+
+    @staticmethod
+    def read_delta_file(path: Text) -> List[Tuple[Text, Text, Text]]:
+        """
+        Read a delta file. Every line contains an operation ("+" to add, "-" to remove), a lemma and a word,
+        separated by tabs. Empty lines and lines starting with "#" are ignored.
+        :param path:
+        :return: List of (operation, lemma, word).
+        """
+        res = []
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                line = line.strip()
+                if len(line) == 0 or line.startswith("#"):
+                    continue
+                l = line.split()
+                if len(l) < 3:
+                    raise ValueError("Invalid delta line: '{}'".format(line))
+                res.append((l[0], l[1], l[2]))
+        return res
+
+    def apply_delta_file(self, path: Text) -> List[Tuple[Text, Text, Text]]:
+        """
+        Apply the changes of a delta file (see read_delta_file and apply_delta).
+        :param path:
+        :return: The operations which changed an entry (see apply_delta).
+        """
+        return self.apply_delta(self.read_delta_file(path))
+
+    def watch_delta_file(self, path: Text, interval: float = 1.0):
+        """
+        Apply a delta file, and apply its changes whenever it changes, from a background thread: operations removed
+        from the file are reverted, and new ones are applied. The file may be edited in place or replaced.
+        :param path:
+        :param interval: Seconds between checks.
+        """
+        self.stop_watching()
+        self._stop_watching = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, args=(path, interval, self._stop_watching), daemon=True)
+        self._watcher.start()
+
+    def _watch(self, path: Text, interval: float, stop: threading.Event):
+        last_state = None
+        last_error = None
+        operations = set()
+        # Changes made by the operations of the file, which are reverted when no remaining operation makes them
+        applied = set()
+        while not stop.is_set():
+            try:
+                st = os.stat(path)
+                state = (st.st_mtime_ns, st.st_size, st.st_ino)
+                if state != last_state:
+                    last_state = state
+                    new_operations = self.read_delta_file(path)
+                    kept = {c for operation in new_operations for c in self._delta_changes(*operation)}
+                    reverted = [c for c in applied if c not in kept]
+                    self.apply_delta([(_INVERSE_DELTA_OPERATIONS[op], lemma, word) for op, lemma, word in reverted])
+                    applied.difference_update(reverted)
+                    applied.update(self.apply_delta([o for o in new_operations if o not in operations]))
+                    operations = set(new_operations)
+                last_error = None
+            except (OSError, ValueError) as e:
+                # Warn once, not at every check
+                error = (type(e), str(e))
+                if error != last_error:
+                    logging.warning("Could not apply delta file {}: {}".format(path, e))
+                    last_error = error
+            stop.wait(interval)
+
+    @staticmethod
+    def _delta_changes(operation: Text, lemma: Text, word: Text) -> List[Tuple[Text, Text, Text]]:
+        """
+        :return: The changes that a delta operation may make (see apply_delta).
+        """
+        if operation == "+":
+            return [("+", lemma, word), ("+", lemma, lemma)]
+        return [(operation, lemma, word)]
+
+    def stop_watching(self):
+        """
+        Stop watching the delta file, if any.
+        """
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def __getstate__(self) -> Dict:
+        """
+        Pickled copies (e.g. sent to worker processes) have their own lock, do not watch the delta file and do not
+        record metrics, which would not be seen by the original process.
+        """
+        state = dict(self.__dict__)
+        state["metrics"] = None
+        del state["_update_lock"]
+        state["_watcher"] = None
+        state["_stop_watching"] = None
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._update_lock = threading.Lock()
+
+    def _load_dawgs(self, lang: Text) -> Tuple[LemmaDawg, LemmaDawg]:
+        """
+        Load (or compile) the automata for a language.
+        :param lang: Language. Valid values are contained in SUPPORTED_LANGUAGES.
+        :return: The automata of lemmas and of normalized lemmas.
+        """
+        dawg_path = "data/lemmatization-{}.dawg".format(lang)
+        dawg_norm_path = "data/lemmatization-norm-{}.dawg".format(lang)
+        if _resource_exists(dawg_path) and _resource_exists(dawg_norm_path):
+            with _open_resource(dawg_path) as f:
+                lemma_dawg = LemmaDawg.read(f)
+            with _open_resource(dawg_norm_path) as f:
+                lemma_dawg_norm = LemmaDawg.read(f)
+            return lemma_dawg, lemma_dawg_norm
+        lemma_dict = self._build_dictionary(lang)
+        lemma_dawg_norm = LemmaDawg.from_dict(self._build_dictionary_norm(lemma_dict))
+        return LemmaDawg.from_dict(lemma_dict), lemma_dawg_norm
+
+    def get_fuzzy_candidates(self, word: Text, max_distance: int = None) -> List[Tuple[Text, int]]:
+        """
+        Get the dictionary words close to a (possibly misspelled) word.
+        :param word:
+        :param max_distance: Maximum edit distance. If None, the fuzzy_distance of the lemmatizer.
+        :return: List of (word, distance) pairs, sorted by distance. Empty if fuzzy lookup is disabled.
+        """
+        if self.fuzzy_index is None:
+            return []
+        return self.fuzzy_index.lookup(word.lower(), max_distance)
+
+    def _get_lemma_oov(self, word: Text, normalized: bool) -> List[Text]:
+        """
+        Get the lemmas of a lower cased word which is not in the dictionary.
+        :param word:
+        :param normalized: Whether normalized lemmas are requested.
+        :return: List of possible lemmas.
+        """
+        if self.fuzzy_index is not None:
+            candidates = self.fuzzy_index.lookup_closest(word)
+            if len(candidates) > 0:
+                lemma_dict = self.lemma_dict_norm if normalized else self.lemma_dict
+                res = []
+                for candidate, _ in candidates:
+                    # Words removed by deltas stay in the index
+                    for lemma in lemma_dict.get(candidate, ()):
+                        if lemma not in res:
+                            res.append(lemma)
+                if len(res) > 0:
+                    return res
+        if self.suffix_guesser is not None:
+            res = [lemma for lemma, _ in self.suffix_guesser.guess(word, self.oov_guesses)]
+            if normalized:
+                res = [_normalize_word(lemma) for lemma in res]
+            return res
+        return [word]
+
+    def _tier_counters(self) -> Dict[Tuple[Text, Labels], int]:
+        """
+        :return: Lookups answered by each tier of the "tiered" format (see TieredLexicon.tier_stats), as Metrics
+          counters.
+        """
+        res = {}
+        for lexicon, lemma_dict in (("lemmas", self.lemma_dict), ("normalized", self.lemma_dict_norm)):
+            for tier, value in lemma_dict.tier_stats().items():
+                labels = self._metrics_labels + (("lexicon", lexicon), ("tier", tier))
+                res[("dictionary_tier_lookups_total", labels)] = value
+        return res
+
+    def _record_lookup(self, lemmas: Optional[List[Text]]):
+        self.metrics.inc("dictionary_lookups_total", 1, self._metrics_labels)
+        if lemmas is None:
+            self.metrics.inc("dictionary_oov_total", 1, self._metrics_labels)
+        elif len(lemmas) > 1:
+            self.metrics.inc("dictionary_ambiguous_total", 1, self._metrics_labels)
+
     def get_lemma(self, word) -> List[Text]:
         """
         Get the lemmas corresponding to a word.
         :param word:
-        :return: List of possible lemmas.
+        :return: List of possible lemmas. It is a copy: the lists of the dictionary are shared by many words.
         """
-        return self.lemma_dict.get(word.lower(), [word.lower()])
+        _word = word.lower()
+        lemmas = self._lexicon.lemma_dict.get(_word)
+        if self.metrics is not None:
+            self._record_lookup(lemmas)
+        if lemmas is None:
+            return self._get_lemma_oov(_word, False)
+        return list(lemmas)
 
     def get_lema_norm(self, word) -> List[Text]:
         """
         Get the normalized lemmas corresponding to a word.
         :param word:
-        :return: List of possible lemmas.
+        :return: List of possible lemmas. It is a copy: the lists of the dictionary are shared by many words.
         """
-        return self.lemma_dict_norm.get(word.lower(), [word.lower()])
+        _word = word.lower()
+        lemmas = self._lexicon.lemma_dict_norm.get(_word)
+        if self.metrics is not None:
+            self._record_lookup(lemmas)
+        if lemmas is None:
+            return self._get_lemma_oov(_word, True)
+        return list(lemmas)
+
+    def lemmatize_text(self, text: Text, punctuation: bool = False, normalized: bool = False) -> List[LemmatizedToken]:
+        """
+        Tokenize and lemmatize a text (see Tokenizer for the tokenization rules of the language).
+        :param text:
+        :param punctuation: Whether to return punctuation tokens too (their lemma is themselves).
+        :param normalized: Whether to return normalized lemmas (get_lema_norm) instead of lemmas (get_lemma).
+        :return: List of tokens, with their character offsets in the text and their lemmas.
+        """
+        get_lemma = self.get_lema_norm if normalized else self.get_lemma
+        tokenizer = self._tokenizer if punctuation else self._word_tokenizer
+        return [LemmatizedToken(t.text, t.start, t.end, get_lemma(t.text) if t.is_word else [t.text])
+                for t in tokenizer.iter_tokens(text)]
 
 
 class SpanishPosLemmatizer(Lemmatizer):
@@ -156,9 +758,22 @@ class SpanishPosLemmatizer(Lemmatizer):
         "AUX"
     }
 
-    def __init__(self):
-        self.dict_lemmatizer = DictionaryLemmatizer("es")
+    def __init__(self, metrics: Optional[Metrics] = None, sentence_cache_size: int = 0,
+                 sentence_cache_ttl: Optional[float] = None):
+        """
+        :param metrics: If given, tagging and lookup times (and the metrics of the underlying DictionaryLemmatizer)
+          are recorded into it, as well as the hit rate of the sentence cache ("sentences").
+        :param sentence_cache_size: If greater than 0, the results of up to this number of sentences are cached, so
+          that repeated sentences are not tagged again. Sentences are cached by model and by text, with runs of
+          white space collapsed (and are tagged that way).
+        :param sentence_cache_ttl: If given, cached sentences expire after this number of seconds.
+        """
+        self.metrics = metrics
+        self.dict_lemmatizer = DictionaryLemmatizer("es", metrics=metrics)
         self.infinitives = self._read_verbs()
+        self.sentence_cache = None
+        if sentence_cache_size > 0:
+            self.sentence_cache = LRUCache(sentence_cache_size, sentence_cache_ttl)
 
     def get_lemma(self, word: Text, is_verb: bool) -> List[Text]:
         """
@@ -179,21 +794,46 @@ class SpanishPosLemmatizer(Lemmatizer):
                 return [word]
             return res
 
-    def _get_pos(self, parsed_sentence: Doc) -> List[Text]:
+    def _get_pos(self, parsed_sentence: "Doc") -> List[Text]:
         """
         :param parsed_sentence: Spacy parsed sentence.
         :return: List of POS tags corresponding to the parsed_sentence.
         """
         return [t.pos_ for t in parsed_sentence]
 
-    def _get_pos_is_verb(self, parsed_sentence: Doc) -> List[bool]:
+    def _get_pos_is_verb(self, parsed_sentence: "Doc") -> List[bool]:
         """
         :param parsed_sentence: Spacy parsed sentence.
         :return: List of booleans telling whether the corresponding word is a verb.
         """
         return [t in self.VERB_POS_TAGS for t in self._get_pos(parsed_sentence)]
 
-    def get_lemma_sentence(self, sentence: Text, nlp_model: Language) -> List[List[Text]]:
+    @staticmethod
+    def _sentence_cache_key(sentence: Text, nlp_model: "Language") -> Tuple:
+        """
+        :param sentence: Normalized sentence.
+        :param nlp_model: Spacy language model.
+        :return: Key of the sentence in the sentence cache: models are identified by their language, name and
+          version (or by the object itself, if they have no metadata).
+        """
+        meta = getattr(nlp_model, "meta", None)
+        if isinstance(meta, dict):
+            return meta.get("lang"), meta.get("name"), meta.get("version"), sentence
+        return id(nlp_model), sentence
+
+    def _get_cached_sentence(self, key: Tuple) -> Optional[List[List[Text]]]:
+        """
+        :param key: Sentence cache key.
+        :return: A copy of the cached result, or None.
+        """
+        res = self.sentence_cache.get(key)
+        if self.metrics is not None:
+            self.metrics.cache_access("sentences", res is not None)
+        if res is None:
+            return None
+        return [list(lemmas) for lemmas in res]
+
+    def get_lemma_sentence(self, sentence: Text, nlp_model: "Language") -> List[List[Text]]:
         """
         Lemmatize a sentence.
 
@@ -201,7 +841,94 @@ class SpanishPosLemmatizer(Lemmatizer):
         :param nlp_model: Spacy language model.
         :return: List of lists of lemmas (one list of lemmas per sentence word).
         """
+        if self.sentence_cache is not None:
+            sentence = " ".join(sentence.split())
+            key = self._sentence_cache_key(sentence, nlp_model)
+            res = self._get_cached_sentence(key)
+            if res is not None:
+                return res
+        res = self._tag_and_lemmatize(sentence, nlp_model)
+        if self.sentence_cache is not None:
+            self.sentence_cache.put(key, [list(lemmas) for lemmas in res])
+        return res
+
+    def _tag_and_lemmatize(self, sentence: Text, nlp_model: "Language") -> List[List[Text]]:
+        if self.metrics is not None:
+            start_time = time.perf_counter()
         parsed_sentence = nlp_model(sentence, disable = ['parser', 'ner'])
+        if self.metrics is not None:
+            tagging_time = time.perf_counter()
+            self.metrics.observe("pos_tagging_seconds", tagging_time - start_time)
+        res = self._get_lemma_parsed(parsed_sentence)
+        if self.metrics is not None:
+            end_time = time.perf_counter()
+            self.metrics.observe("pos_lookup_seconds", end_time - tagging_time)
+            self.metrics.observe("sentence_seconds", end_time - start_time)
+            self.metrics.inc("sentences_total")
+            self.metrics.inc("sentence_tokens_total", len(res))
+        return res
+
+    def get_lemma_sentences(self, sentences: List[Text], nlp_model: "Language",
+                            batch_size: int = 64) -> List[List[List[Text]]]:
+        """
+        Lemmatize several sentences, tagging them in batches with nlp_model.pipe (much faster than tagging them
+        one by one).
+
+        :param sentences: List of sentences.
+        :param nlp_model: Spacy language model.
+        :param batch_size: Spacy batch size.
+        :return: One result of get_lemma_sentence per sentence.
+        """
+        if self.sentence_cache is not None:
+            return self._get_lemma_sentences_cached(sentences, nlp_model, batch_size)
+        return self._tag_and_lemmatize_batch(sentences, nlp_model, batch_size)
+
+    def _get_lemma_sentences_cached(self, sentences: List[Text], nlp_model: "Language",
+                                    batch_size: int) -> List[List[List[Text]]]:
+        """
+        get_lemma_sentences with the sentence cache: only the distinct sentences not in the cache are tagged.
+        """
+        res = []
+        misses = {}
+        for i, sentence in enumerate(sentences):
+            sentence = " ".join(sentence.split())
+            key = self._sentence_cache_key(sentence, nlp_model)
+            cached = self._get_cached_sentence(key)
+            res.append(cached)
+            if cached is None:
+                misses.setdefault(key, (sentence, []))[1].append(i)
+        if len(misses) > 0:
+            keys = list(misses)
+            results = self._tag_and_lemmatize_batch([misses[key][0] for key in keys], nlp_model, batch_size)
+            for key, result in zip(keys, results):
+                self.sentence_cache.put(key, [list(lemmas) for lemmas in result])
+                positions = misses[key][1]
+                res[positions[0]] = result
+                for i in positions[1:]:
+                    res[i] = [list(lemmas) for lemmas in result]
+        return res
+
+    def _tag_and_lemmatize_batch(self, sentences: List[Text], nlp_model: "Language",
+                                 batch_size: int) -> List[List[List[Text]]]:
+        if self.metrics is not None:
+            start_time = time.perf_counter()
+        parsed_sentences = list(nlp_model.pipe(sentences, batch_size=batch_size, disable=['parser', 'ner']))
+        if self.metrics is not None:
+            tagging_time = time.perf_counter()
+            self.metrics.observe("pos_tagging_seconds", tagging_time - start_time)
+        res = [self._get_lemma_parsed(parsed_sentence) for parsed_sentence in parsed_sentences]
+        if self.metrics is not None:
+            end_time = time.perf_counter()
+            self.metrics.observe("pos_lookup_seconds", end_time - tagging_time)
+            self.metrics.inc("sentences_total", len(res))
+            self.metrics.inc("sentence_tokens_total", sum(len(r) for r in res))
+        return res
+
+    def _get_lemma_parsed(self, parsed_sentence: "Doc") -> List[List[Text]]:
+        """
+        :param parsed_sentence: Spacy parsed sentence.
+        :return: List of lists of lemmas (one list of lemmas per sentence word).
+        """
         pos_bool_list = self._get_pos_is_verb(parsed_sentence)
         res = []
         for i, t in enumerate(parsed_sentence):
@@ -214,8 +941,8 @@ class SpanishPosLemmatizer(Lemmatizer):
         :return: Set of verb infinitives.
         """
         res = set()
-#        with resource_stream(__name__, "language/lemma/es/verb_data/verbs_list") as f:
-        with resource_stream(__name__, "language/lemma/es/verb_data/verbs_list_final") as f:
+#        with _open_resource("language/lemma/es/verb_data/verbs_list") as f:
+        with _open_resource("language/lemma/es/verb_data/verbs_list_final") as f:
             for l in f.readlines():
                 _l = l.decode("utf8").strip()
                 if len(_l) > 0:
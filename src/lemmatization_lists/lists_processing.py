@@ -1,7 +1,148 @@
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Callable, Iterable, Iterator, List, Optional, Text, Tuple
+import logging
 import os
-import typing
-from lemmatization_lists.lemmatizers import DictionaryLemmatizer
-from tqdm import tqdm
+import tempfile
+import time
+from lemmatization_lists.external_sort import DEFAULT_BUFFER_SIZE, external_sort
+from lemmatization_lists.lemmatizers import DictionaryLemmatizer, _find_lemmatization_list, _normalize_word, \
+    _open_resource, _parse_lemmatization_line, get_available_languages, open_lemmatization_list
+
+_CHUNK_SIZE = 50000
+
+# Lists up to this size are processed in memory, which is 2 to 3 times faster than the external sorts (see
+# benchmarks.benchmark_lists_processing) and takes about 15 times the size of the list in memory
+IN_MEMORY_MAX_SIZE = 32 * 1024 * 1024
+
+# Assumed compression ratio of the compressed lists
+_COMPRESSION_RATIO = 8
+
+Record = Tuple[Text, ...]
+
+
+def _normalize_chunk(chunk: Tuple[int, List[bytes]]) -> List[Record]:
+    """
+    :param chunk: Number of the first line of the chunk, and lines of a lemmatization list.
+    :return: (word, position, lemma, normalized word, normalized lemma) records of the lines. As in
+      DictionaryLemmatizer, every lemma is also a word with itself as lemma. Positions are zero padded, so that
+      sorting keeps the order of the list.
+    """
+    first_line, lines = chunk
+    res = []
+    for i, s in enumerate(lines, first_line):
+        pair = _parse_lemmatization_line(s)
+        if pair is None:
+            continue
+        lemma, word = pair
+        normalized_lemma = _normalize_word(lemma)
+        res.append((word, "{:012d}".format(2 * i), lemma, _normalize_word(word), normalized_lemma))
+        res.append((lemma, "{:012d}".format(2 * i + 1), lemma, normalized_lemma, normalized_lemma))
+    return res
+
+
+def _map_bounded(fn: Callable, items: Iterable, executor: Optional[Executor], window: int) -> Iterator:
+    """
+    Like executor.map, but with at most `window` items submitted and not yet consumed, so that the input is read as
+    the results are consumed.
+    :param fn:
+    :param items:
+    :param executor: If None, items are processed in the calling thread.
+    :param window: Maximum number of pending futures.
+    :return: Iterator over the results, in order.
+    """
+    if executor is None:
+        yield from map(fn, items)
+        return
+    futures = deque()
+    for item in items:
+        futures.append(executor.submit(fn, item))
+        if len(futures) >= window:
+            yield futures.popleft().result()
+    while len(futures) > 0:
+        yield futures.popleft().result()
+
+
+def _normalized_entries(records: Iterator[Record]) -> Iterator[Record]:
+    """
+    :param records: Records of _normalize_chunk, sorted.
+    :return: (key, order, normalized lemmas...) records with every assignment done by
+      DictionaryLemmatizer._build_dictionary_norm: words are processed in order of first appearance, and each one
+      sets its normalized lemmas for itself and for its normalized form.
+    """
+    for word, group in groupby(records, key=itemgetter(0)):
+        first_position = None
+        lemmas = []
+        normalized_lemmas = []
+        for _, position, lemma, normalized_word, normalized_lemma in group:
+            if first_position is None:
+                first_position = position
+            if lemma not in lemmas:
+                lemmas.append(lemma)
+                normalized_lemmas.append(normalized_lemma)
+        yield (word, first_position + "0") + tuple(normalized_lemmas)
+        yield (normalized_word, first_position + "1") + tuple(normalized_lemmas)
+
+
+def _list_size(lang: Text) -> int:
+    """
+    :param lang: Language.
+    :return: Approximate uncompressed size in bytes of the lemmatization list of the language.
+    """
+    name = _find_lemmatization_list(lang)
+    if name is None:
+        raise FileNotFoundError("No lemmatization list for language '{}'".format(lang))
+    with _open_resource(name) as f:
+        size = f.seek(0, os.SEEK_END)
+    return size if name.endswith(".txt") else size * _COMPRESSION_RATIO
+
+
+def list_process(lang: Text, dest_file: Text, executor: Optional[Executor] = None,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, tmp_dir: Optional[Text] = None,
+                 in_memory: Optional[bool] = None):
+    """
+    Generate an improved version of the lemmatization list of a language:
+    - Remove accents.
+    - Add primitive lemma forms.
+
+    The pairs are those of DictionaryLemmatizer.lemma_dict_norm (when several words normalize to the same key, the
+    last one wins), sorted by word. Lists which fit in memory are processed with a DictionaryLemmatizer. Larger
+    ones are streamed and normalized by chunks (in parallel if an executor is given), and aggregated with external
+    sorts, so memory does not grow with the size of the list.
+
+    :param lang: Language.
+    :param dest_file: Path of the normalized list.
+    :param executor: Optional process pool to normalize the chunks (external sorts only).
+    :param buffer_size: Approximate size in bytes of the sort buffers (see external_sort).
+    :param tmp_dir: Directory for the temporary files (default: the system one).
+    :param in_memory: Whether to process the list in memory. If None, only lists up to IN_MEMORY_MAX_SIZE bytes are.
+    """
+    if in_memory is None:
+        in_memory = _list_size(lang) <= IN_MEMORY_MAX_SIZE
+    if in_memory:
+        lemma_dict_norm = DictionaryLemmatizer(lang).lemma_dict_norm
+        with open(dest_file, "w", encoding="utf-8", buffering=1 << 20) as out:
+            for word in sorted(lemma_dict_norm):
+                out.writelines("{}\t{}\n".format(l, word) for l in lemma_dict_norm[word])
+        return
+    # Enough pending chunks to keep the workers busy
+    window = 2 * (os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as dir_name, open_lemmatization_list(lang) as f:
+        chunks = iter(lambda: list(islice(f, _CHUNK_SIZE)), [])
+        numbered_chunks = ((i * _CHUNK_SIZE, chunk) for i, chunk in enumerate(chunks))
+        records = (r for chunk_records in _map_bounded(_normalize_chunk, numbered_chunks, executor, window)
+                   for r in chunk_records)
+        entries = external_sort(_normalized_entries(external_sort(records, dir_name, buffer_size)), dir_name,
+                                buffer_size)
+        with open(dest_file, "w", encoding="utf-8", buffering=1 << 20) as out:
+            for key, group in groupby(entries, key=itemgetter(0)):
+                # Last writer wins
+                for entry in group:
+                    pass
+                out.writelines("{}\t{}\n".format(l, key) for l in entry[2:])
+
 
 def es_list_process(dest_file:str):
     """
@@ -9,17 +150,33 @@ def es_list_process(dest_file:str):
     - Remove accents.
     - Add primitive lemma forms.
 
-    :param list_file:
     :param dest_file:
     """
-    lemmatizer = DictionaryLemmatizer("es")
-    with open(dest_file, "w") as f:
-        _tmp_dict = {}
-        for word, lemmas in tqdm(lemmatizer.lemma_dict_norm.items()):
-            for l in lemmas:
-                f.write("{}\t{}\n".format(l, word))
+    list_process("es", dest_file)
 
-if __name__ == "__main__":
-    dest_file = "src/lemmatization_lists/data/lemmatization-norm-es.txt"
-    es_list_process(dest_file)
 
+def lists_process(dest_dir: Text, langs: List[Text] = None, processes: int = None):
+    """
+    Generate the normalized lists `lemmatization-norm-<lang>.txt` of several languages.
+    :param dest_dir: Destination directory.
+    :param langs: Languages. If None, all the available ones.
+    :param processes: Size of the process pool (default: number of CPUs).
+    """
+    if langs is None:
+        langs = get_available_languages()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for lang in langs:
+            start_time = time.time()
+            list_process(lang, os.path.join(dest_dir, "lemmatization-norm-{}.txt".format(lang)), executor)
+            logging.info("{} processed in {:.2f} s".format(lang, time.time() - start_time))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate normalized lemmatization lists.")
+    parser.add_argument("--dest-dir", default="src/lemmatization_lists/data")
+    parser.add_argument("--processes", type=int, default=None, help="Size of the process pool (default: CPUs)")
+    parser.add_argument("langs", nargs="*", help="Languages (default: all the available ones)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    lists_process(args.dest_dir, args.langs or None, args.processes)
@@ -0,0 +1,343 @@
+"""
+Load tests of the sentence lemmatizers: a sentence corpus is replayed at a fixed concurrency (threads, processes or
+asyncio tasks) against one of the targets below, and latency percentiles, throughput and RSS over time are reported.
+
+- "pos": SpanishPosLemmatizer.get_lemma_sentence, with a spaCy model (--spacy-model) or, by default, a stub tagger
+  which tags with a regular expression, so that the harness runs without downloading spaCy models.
+- "spanish": SpanishLemmatizer.lemmatize_text (a temporary verbs database is built if --verb-db is not given).
+- "dictionary": DictionaryLemmatizer.get_lemma on every token of the sentence.
+
+    python -m lemmatization_lists.load_tests --target dictionary --lang en --corpus sentences.txt \\
+        --mode threads --concurrency 8 --requests 10000
+
+Every worker sends its next request as soon as the previous one is answered (closed loop). Latencies are measured
+per request, from its submission to its result.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Text
+import asyncio
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from .benchmarks import rss_mb
+
+
+MODES = [
+    "threads",
+    "processes",
+    "asyncio"
+]
+
+TARGETS = [
+    "pos",
+    "spanish",
+    "dictionary"
+]
+
+DEFAULT_SENTENCES = [
+    "Me gustaría ver el segundo episodio de Star Trek",
+    "El perro de San Roque no tiene rabo porque Ramón Rodríguez se lo ha robado.",
+    "El camino al infierno está empedrado de buenas intenciones.",
+    "Compramos las puertas que nos recomendaron en la tienda del barrio.",
+    "Los niños jugaban en el parque mientras sus padres conversaban."
+]
+
+_TOKEN_REG_EXP = re.compile(r"\w+|[^\w\s]")
+
+
+class _StubToken(object):
+
+    __slots__ = ("text", "pos_")
+
+    def __init__(self, text: Text, pos: Text):
+        self.text = text
+        self.pos_ = pos
+
+    def __str__(self) -> Text:
+        return self.text
+
+
+class StubTagger(object):
+    """
+    Stand-in for a spaCy Spanish model: splits words and punctuation and tags as VERB the words with verbal endings.
+    Only meant to exercise the lemmatizers without spaCy models.
+    """
+
+    VERB_REG_EXP = re.compile(r"\w{2,}(?:ar|er|ir|ado|ido|ando|iendo|amos|emos|imos|aba|ía|aron|ieron|ó|é)$")
+
+    def __call__(self, text: Text, disable: Optional[List[Text]] = None) -> List[_StubToken]:
+        return [_StubToken(t, "VERB" if self.VERB_REG_EXP.match(t.lower()) else "NOUN")
+                for t in _TOKEN_REG_EXP.findall(text)]
+
+    def pipe(self, texts, batch_size: int = 64, disable: Optional[List[Text]] = None):
+        for t in texts:
+            yield self(t)
+
+
+def build_target(target: Text, lang: Text = "es", spacy_model: Optional[Text] = None,
+                 verb_db: Optional[Text] = None) -> Callable[[Text], object]:
+    """
+    :param target: One of TARGETS.
+    :param lang: Language of the "dictionary" target.
+    :param spacy_model: Spacy model of the "pos" target. If None, a StubTagger.
+    :param verb_db: Spanish verbs database of the "spanish" target (required).
+    :return: Function lemmatizing one sentence.
+    """
+    if target == "pos":
+        from .lemmatizers import SpanishPosLemmatizer
+        if spacy_model is not None:
+            import spacy
+            nlp_model = spacy.load(spacy_model)
+        else:
+            nlp_model = StubTagger()
+        lemmatizer = SpanishPosLemmatizer()
+        return lambda sentence: lemmatizer.get_lemma_sentence(sentence, nlp_model)
+    if target == "spanish":
+        from .language.lemma.es.lemma_tools import SpanishLemmatizer
+        if verb_db is None:
+            raise ValueError("The 'spanish' target requires a verbs database")
+        spanish_lemmatizer = SpanishLemmatizer(db_file_path=verb_db)
+        return lambda sentence: spanish_lemmatizer.lemmatize_text(_TOKEN_REG_EXP.findall(sentence))
+    if target == "dictionary":
+        from .lemmatizers import DictionaryLemmatizer
+        dictionary_lemmatizer = DictionaryLemmatizer(lang)
+        return lambda sentence: [dictionary_lemmatizer.get_lemma(t) for t in _TOKEN_REG_EXP.findall(sentence)]
+    raise ValueError("Unknown target '{}'".format(target))
+
+
+def _build_verb_db(dest_dir: Text, num_verbs: int = 500, seed: int = 0) -> Text:
+    from .language.lemma.es.lemma_tools import _VERB_LIST_PATH, SpanishVerbDatabaseBuilder
+    with open(_VERB_LIST_PATH, "r") as f:
+        verbs = [l.strip() for l in f if len(l.strip()) > 0 and not l.startswith("#")]
+    db_file_path = os.path.join(dest_dir, "spanish_verbs.db")
+    sample = random.Random(seed).sample(verbs, min(num_verbs, len(verbs)))
+    SpanishVerbDatabaseBuilder(db_file_path).insert_data(sample)
+    return db_file_path
+
+
+def percentiles(latencies: List[float]) -> Dict[Text, float]:
+    """
+    :param latencies: Latencies in seconds.
+    :return: Nearest rank p50, p95, p99, max and mean latencies, in milliseconds.
+    """
+    if len(latencies) == 0:
+        return {}
+    values = sorted(latencies)
+    res = {}
+    for p in (50, 95, 99):
+        res["p{}_ms".format(p)] = values[max(0, math.ceil(p / 100 * len(values)) - 1)] * 1000
+    res["max_ms"] = values[-1] * 1000
+    res["mean_ms"] = sum(values) / len(values) * 1000
+    return res
+
+
+class RssSampler(threading.Thread):
+    """
+    Background sampling of the RSS of the current process.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._start_time = time.perf_counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            self.samples.append((round(time.perf_counter() - self._start_time, 3), round(rss_mb(), 1)))
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self) -> List:
+        """
+        :return: List of (seconds since start, RSS in MB) samples.
+        """
+        self._stop_event.set()
+        self.join()
+        self.samples.append((round(time.perf_counter() - self._start_time, 3), round(rss_mb(), 1)))
+        return self.samples
+
+
+def _timed_loop(f: Callable[[Text], object], sentences: List[Text]) -> List[float]:
+    latencies = []
+    for s in sentences:
+        start_time = time.perf_counter()
+        f(s)
+        latencies.append(time.perf_counter() - start_time)
+    return latencies
+
+
+def run_threads(f: Callable[[Text], object], sentences: List[Text], concurrency: int) -> List[float]:
+    """
+    :return: Latencies of f over the sentences, sent by `concurrency` threads.
+    """
+    chunks = [sentences[i::concurrency] for i in range(concurrency)]
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(itertools.chain.from_iterable(executor.map(_timed_loop, [f] * concurrency, chunks)))
+
+
+async def _async_worker(loop, executor, f, sentences: List[Text], latencies: List[float]):
+    for s in sentences:
+        start_time = time.perf_counter()
+        await loop.run_in_executor(executor, f, s)
+        latencies.append(time.perf_counter() - start_time)
+
+
+async def _run_asyncio(f, sentences: List[Text], concurrency: int, executor_workers: int) -> List[float]:
+    loop = asyncio.get_running_loop()
+    latencies = []
+    with ThreadPoolExecutor(executor_workers) as executor:
+        await asyncio.gather(*[_async_worker(loop, executor, f, sentences[i::concurrency], latencies)
+                               for i in range(concurrency)])
+    return latencies
+
+
+def run_asyncio(f: Callable[[Text], object], sentences: List[Text], concurrency: int,
+                executor_workers: Optional[int] = None) -> List[float]:
+    """
+    :return: Latencies of f over the sentences, sent by `concurrency` asyncio tasks which run f in a pool of
+      executor_workers threads (default: concurrency). Latencies include the time waiting for a free thread, as seen
+      by async callers.
+    """
+    if executor_workers is None:
+        executor_workers = concurrency
+    return asyncio.run(_run_asyncio(f, sentences, concurrency, executor_workers))
+
+
+_process_target = None
+
+
+def _init_process(target_args):
+    global _process_target
+    _process_target = build_target(*target_args)
+
+
+def _warm_up_process(sentences: List[Text]):
+    _timed_loop(_process_target, sentences)
+    # Keep the worker busy, so that the other warm up tasks go to the other workers
+    time.sleep(0.1)
+
+
+def _process_loop(sentences: List[Text]):
+    return _timed_loop(_process_target, sentences), rss_mb()
+
+
+def run_processes(target_args, sentences: List[Text], concurrency: int, warmup: int = 20):
+    """
+    :param target_args: Arguments of build_target, which is called in every process.
+    :return: (latencies, RSS in MB of every worker process after its run, elapsed seconds).
+    """
+    chunks = [sentences[i::concurrency] for i in range(concurrency)]
+    with ProcessPoolExecutor(concurrency, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_process, initargs=(target_args,)) as executor:
+        # Wait for all the workers to be loaded and warmed up before starting the clock
+        for _ in executor.map(_warm_up_process, [sentences[:warmup]] * concurrency):
+            pass
+        start_time = time.perf_counter()
+        results = list(executor.map(_process_loop, chunks))
+        elapsed = time.perf_counter() - start_time
+    return list(itertools.chain.from_iterable(r[0] for r in results)), [round(r[1], 1) for r in results], elapsed
+
+
+def run_load_test(target: Text, sentences: List[Text], mode: Text = "threads", concurrency: int = 4,
+                  num_requests: int = 1000, warmup: int = 20, lang: Text = "es", spacy_model: Optional[Text] = None,
+                  verb_db: Optional[Text] = None, rss_interval: float = 0.5,
+                  executor_workers: Optional[int] = None) -> Dict:
+    """
+    :param target: One of TARGETS.
+    :param sentences: Corpus, replayed cyclically.
+    :param mode: One of MODES.
+    :param concurrency: Number of concurrent clients.
+    :param num_requests: Number of measured requests (sentences).
+    :param warmup: Number of requests sent before measuring (by every worker process in processes mode).
+    :param lang: See build_target.
+    :param spacy_model: See build_target.
+    :param verb_db: See build_target. If None, a temporary database is built for the "spanish" target.
+    :param rss_interval: Seconds between RSS samples.
+    :param executor_workers: Threads running the target in asyncio mode (see run_asyncio).
+    :return: Report dictionary.
+    """
+    if mode not in MODES:
+        raise ValueError("Unknown mode '{}'".format(mode))
+    if len(sentences) == 0:
+        raise ValueError("Empty corpus")
+    requests = list(itertools.islice(itertools.cycle(sentences), num_requests))
+    tmp_dir = None
+    if target == "spanish" and verb_db is None:
+        tmp_dir = tempfile.mkdtemp()
+        verb_db = _build_verb_db(tmp_dir)
+    try:
+        sampler = RssSampler(rss_interval)
+        sampler.start()
+        target_args = (target, lang, spacy_model, verb_db)
+        load_time = None
+        worker_rss = None
+        if mode == "processes":
+            latencies, worker_rss, elapsed = run_processes(target_args, requests, concurrency, warmup)
+        else:
+            start_time = time.perf_counter()
+            f = build_target(*target_args)
+            load_time = time.perf_counter() - start_time
+            _timed_loop(f, requests[:warmup])
+            start_time = time.perf_counter()
+            if mode == "threads":
+                latencies = run_threads(f, requests, concurrency)
+            else:
+                latencies = run_asyncio(f, requests, concurrency, executor_workers)
+            elapsed = time.perf_counter() - start_time
+        rss_samples = sampler.stop()
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir)
+    report = {
+        "target": target,
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "load_s": load_time,
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(latencies) / elapsed,
+        "latency": percentiles(latencies),
+        "rss_mb": rss_samples
+    }
+    if worker_rss is not None:
+        report["worker_rss_mb"] = worker_rss
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Sentence lemmatization load tests.")
+    parser.add_argument("--target", choices=TARGETS, default="pos")
+    parser.add_argument("--mode", choices=MODES, default="threads")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--corpus", help="File with one sentence per line (default: a few built-in sentences)")
+    parser.add_argument("--lang", default="es", help="Language of the dictionary target")
+    parser.add_argument("--spacy-model", help="Spacy model of the pos target (default: stub tagger)")
+    parser.add_argument("--verb-db", help="Spanish verbs database of the spanish target")
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--executor-workers", type=int,
+                        help="Threads running the target in asyncio mode (default: concurrency)")
+    args = parser.parse_args()
+    if args.target == "spanish" and args.verb_db is None:
+        parser.error("--verb-db is required by the spanish target")
+
+    _sentences = DEFAULT_SENTENCES
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as _f:
+            _sentences = [l.strip() for l in _f if len(l.strip()) > 0]
+    print(json.dumps(run_load_test(args.target, _sentences, args.mode, args.concurrency, args.requests, args.warmup,
+                                   args.lang, args.spacy_model, args.verb_db, args.rss_interval,
+                                   args.executor_workers), indent=2))
@@ -0,0 +1,176 @@
+"""
+Lightweight metrics for the lemmatizers: counters, latency histograms and cache hit rates, exported as a snapshot
+dictionary or in Prometheus text format.
+
+Instrumentation is optional: lemmatizers only record metrics when a Metrics instance is given to them, so the cost
+when disabled is a single `is None` check per call.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Text, Tuple
+import threading
+import time
+
+
+# Histogram buckets (upper bounds, in seconds)
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Labels are tuples of (name, value) pairs, so that they can be precomputed and used as dictionary keys.
+Labels = Tuple[Tuple[Text, Text], ...]
+
+
+class Histogram(object):
+    """
+    Histogram of observed values, with fixed buckets.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        """
+        :return: Number of observations lower or equal to every bucket bound (the last one is the total).
+        """
+        res = []
+        total = 0
+        for c in self.counts:
+            total += c
+            res.append(total)
+        return res
+
+
+class Metrics(object):
+    """
+    Thread safe registry of counters and histograms. Counters maintained elsewhere (e.g. by a TieredLexicon) are
+    exported through collectors.
+    """
+
+    def __init__(self, prefix: Text = "lemmatization_", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param prefix: Prefix of the metric names in Prometheus format.
+        :param buckets: Buckets of the histograms.
+        """
+        self.prefix = prefix
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name: Text, value: int = 1, labels: Labels = ()):
+        """
+        Increment a counter.
+        """
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: Text, value: float, labels: Labels = ()):
+        """
+        Add an observation (typically a duration in seconds) to a histogram.
+        """
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: Text, labels: Labels = ()):
+        """
+        Context manager observing the duration of its block in a histogram.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time, labels)
+
+    def cache_access(self, cache: Text, hit: bool, labels: Labels = ()):
+        """
+        Record a cache access. Hit rates are reported in snapshots.
+        """
+        self.inc("cache_hits_total" if hit else "cache_misses_total", 1, (("cache", cache),) + labels)
+
+    def register_collector(self, collect: Callable[[], Dict[Tuple[Text, Labels], int]]):
+        """
+        Register a function returning the current values of some counters, as {(name, labels): value}. It is called
+        by every snapshot, so the counters cost nothing to the code that updates them.
+        """
+        with self._lock:
+            self._collectors.append(collect)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def snapshot(self) -> Dict:
+        """
+        :return: Dictionary with the current values of all metrics:
+          {"counters": {name: [{"labels": {...}, "value": v}]},
+           "histograms": {name: [{"labels": {...}, "count": n, "sum": s, "buckets": {bound: cumulative count}}]},
+           "cache_hit_rates": {cache: rate}}
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            collectors = list(self._collectors)
+            histograms = {key: (h.count, h.sum, h.cumulative_counts()) for key, h in self._histograms.items()}
+        for collect in collectors:
+            counters.update(collect())
+        res = {"counters": {}, "histograms": {}, "cache_hit_rates": {}}
+        for (name, labels), value in sorted(counters.items()):
+            res["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), (count, total, cumulative) in sorted(histograms.items()):
+            res["histograms"].setdefault(name, []).append({
+                "labels": dict(labels),
+                "count": count,
+                "sum": total,
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], cumulative))
+            })
+        accesses = {}
+        for (name, labels), value in counters.items():
+            if name in ("cache_hits_total", "cache_misses_total"):
+                cache = dict(labels)["cache"]
+                hits, total = accesses.get(cache, (0, 0))
+                accesses[cache] = (hits + (value if name == "cache_hits_total" else 0), total + value)
+        for cache, (hits, total) in sorted(accesses.items()):
+            res["cache_hit_rates"][cache] = hits / total if total > 0 else 0.0
+        return res
+
+    def to_prometheus(self) -> Text:
+        """
+        :return: All metrics in Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in snapshot["counters"].items():
+            lines.append("# TYPE {}{} counter".format(self.prefix, name))
+            for s in series:
+                lines.append("{}{}{} {}".format(self.prefix, name, _format_labels(s["labels"]), s["value"]))
+        for name, series in snapshot["histograms"].items():
+            lines.append("# TYPE {}{} histogram".format(self.prefix, name))
+            for s in series:
+                for bound, count in s["buckets"].items():
+                    labels = dict(s["labels"], le=bound)
+                    lines.append("{}{}_bucket{} {}".format(self.prefix, name, _format_labels(labels), count))
+                lines.append("{}{}_sum{} {}".format(self.prefix, name, _format_labels(s["labels"]), s["sum"]))
+                lines.append("{}{}_count{} {}".format(self.prefix, name, _format_labels(s["labels"]), s["count"]))
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[Text, Text]) -> Text:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                          for k, v in labels.items()) + "}"
@@ -0,0 +1,328 @@
+"""
+Standalone lemmatization server, so that many clients share one warm copy of the lexicons instead of each of them
+loading its own.
+
+    python -m lemmatization_lists.server --langs en es --port 8080
+    python -m lemmatization_lists.server --langs es --spacy-model es_core_news_sm --unix-socket /tmp/lemmas.sock
+
+Endpoints (JSON in, JSON out):
+
+    GET  /health
+    GET  /metrics                (Prometheus text format, with --metrics)
+    POST /lemmatize              {"lang": "en", "words": ["walked"], "normalized": false}
+                                 -> {"lemmas": [["walk"]]}
+    POST /lemmatize_sentences    {"sentences": ["Compramos las puertas"]}
+                                 -> {"lemmas": [[["comprar"], ["el"], ["puerta"]]]}
+
+Sentences of concurrent requests are coalesced into micro-batches, which are tagged together with spaCy's
+`nlp.pipe`: a batch is closed when it reaches max_batch_size sentences or batch_window seconds after its first
+sentence arrived.
+"""
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Text
+import json
+import logging
+import queue
+import socketserver
+import threading
+import time
+
+from .lemmatizers import DictionaryLemmatizer, SpanishPosLemmatizer
+from .metrics import Metrics
+from .tiered import read_frequency_list
+
+
+class MicroBatcher(object):
+    """
+    Coalesce items submitted concurrently into batches processed by a pool of worker threads.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 64,
+                 batch_window: float = 0.005, workers: int = 1, metrics: Optional[Metrics] = None):
+        """
+        :param process_batch: Function from a list of items to the list of their results.
+        :param max_batch_size: Maximum number of items per batch.
+        :param batch_window: Maximum number of seconds to wait for more items once a batch has been started.
+        :param workers: Number of worker threads (batches processed concurrently).
+        :param metrics: If given, the number and sizes of the batches are recorded into it.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.metrics = metrics
+        self._queue = queue.Queue()
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for w in self._workers:
+            w.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        :param item:
+        :return: Future of the result of the item.
+        """
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items: List[Any]) -> List[Any]:
+        """
+        Submit several items and wait for their results.
+        """
+        return [f.result() for f in [self.submit(item) for item in items]]
+
+    def _next_batch(self) -> Optional[List]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Leave the stop signal for the next iteration
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if len(batch) == 0:
+                continue
+            if self.metrics is not None:
+                self.metrics.inc("server_batches_total")
+                self.metrics.inc("server_batched_items_total", len(batch))
+            try:
+                results = self.process_batch([item for item, _ in batch])
+                if len(results) != len(batch):
+                    # Results could not be matched with their items: no future would be left waiting forever
+                    raise RuntimeError("{} results for a batch of {} items".format(len(results), len(batch)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self):
+        """
+        Stop the workers once the pending items have been processed.
+        """
+        for _ in self._workers:
+            self._queue.put(None)
+        for w in self._workers:
+            w.join()
+
+
+class LemmatizationService(object):
+    """
+    Preloaded lemmatizers behind the server endpoints.
+    """
+
+    def __init__(self, lemmatizers: Dict[Text, DictionaryLemmatizer],
+                 pos_lemmatizer: Optional[SpanishPosLemmatizer] = None, nlp_model=None, max_batch_size: int = 64,
+                 batch_window: float = 0.005, workers: int = 1, metrics: Optional[Metrics] = None):
+        """
+        :param lemmatizers: Dictionary language -> DictionaryLemmatizer.
+        :param pos_lemmatizer: SpanishPosLemmatizer serving /lemmatize_sentences (requires nlp_model).
+        :param nlp_model: Spacy language model.
+        :param max_batch_size: See MicroBatcher.
+        :param batch_window: See MicroBatcher.
+        :param workers: See MicroBatcher.
+        :param metrics: If given, request and batch metrics are recorded into it.
+        """
+        self.lemmatizers = lemmatizers
+        self.pos_lemmatizer = pos_lemmatizer
+        self.nlp_model = nlp_model
+        self.metrics = metrics
+        self.start_time = time.time()
+        self.sentence_batcher = None
+        if pos_lemmatizer is not None:
+            self.sentence_batcher = MicroBatcher(
+                lambda sentences: pos_lemmatizer.get_lemma_sentences(sentences, nlp_model, max_batch_size),
+                max_batch_size, batch_window, workers, metrics)
+
+    def lemmatize(self, lang: Text, words: List[Text], normalized: bool = False) -> List[List[Text]]:
+        lemmatizer = self.lemmatizers.get(lang)
+        if lemmatizer is None:
+            raise ValueError("Language '{}' is not loaded".format(lang))
+        if not isinstance(words, list) or not all(isinstance(w, str) for w in words):
+            raise ValueError("Words must be a list of strings")
+        get_lemma = lemmatizer.get_lema_norm if normalized else lemmatizer.get_lemma
+        return [get_lemma(w) for w in words]
+
+    def lemmatize_sentences(self, sentences: List[Text]) -> List[List[List[Text]]]:
+        if self.sentence_batcher is None:
+            raise ValueError("POS lemmatization is not enabled")
+        # Invalid sentences must not fail the batches shared with other requests
+        if not isinstance(sentences, list) or not all(isinstance(s, str) for s in sentences):
+            raise ValueError("Sentences must be a list of strings")
+        return self.sentence_batcher.map(sentences)
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok",
+            "languages": sorted(self.lemmatizers),
+            "pos_lemmatization": self.sentence_batcher is not None,
+            "uptime_s": time.time() - self.start_time
+        }
+
+    def close(self):
+        if self.sentence_batcher is not None:
+            self.sentence_batcher.close()
+
+
+class LemmatizationRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/1.1 (keep-alive) handler of the server endpoints. The service is the `service` attribute of the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes, content_type: Text = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, obj: Any):
+        self._send(status, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._send_json(200, service.health())
+        elif self.path == "/metrics" and service.metrics is not None:
+            self._send(200, service.metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        service = self.server.service
+        start_time = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+            if self.path == "/lemmatize":
+                res = service.lemmatize(request["lang"], request["words"], request.get("normalized", False))
+            elif self.path == "/lemmatize_sentences":
+                res = service.lemmatize_sentences(request["sentences"])
+            else:
+                self._send_json(404, {"error": "Not found"})
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception:
+            logging.exception("Error processing {}".format(self.path))
+            self._send_json(500, {"error": "Internal error"})
+            return
+        self._send_json(200, {"lemmas": res})
+        if service.metrics is not None:
+            labels = (("path", self.path),)
+            service.metrics.observe("server_request_seconds", time.perf_counter() - start_time, labels)
+            service.metrics.inc("server_requests_total", 1, labels)
+
+    def address_string(self) -> Text:
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: LemmatizationService, host: Text = "127.0.0.1", port: int = 8080,
+                unix_socket: Optional[Text] = None) -> socketserver.BaseServer:
+    """
+    :param service: Service to expose.
+    :param host: TCP host (ignored if unix_socket is given).
+    :param port: TCP port (0 for an ephemeral port).
+    :param unix_socket: If given, path of a Unix socket to listen on instead of TCP.
+    :return: The server (not started: call serve_forever).
+    """
+    if unix_socket is not None:
+        server = _ThreadingUnixHTTPServer(unix_socket, LemmatizationRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), LemmatizationRequestHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    parser = argparse.ArgumentParser(description="Lemmatization server.")
+    parser.add_argument("--langs", nargs="+", default=["es"], help="Languages of the dictionary lemmatizers")
+    parser.add_argument("--lexicon-format", default="dict", choices=DictionaryLemmatizer.LEXICON_FORMATS)
+    parser.add_argument("--frequency-list", action="append", default=[], metavar="LANG=PATH",
+                        help="Frequency list (one word per line) of a language, for the tiered lexicon format. "
+                             "Repeat for every language")
+    parser.add_argument("--hot-size", type=int, default=10000, help="Number of words in the hot tier")
+    parser.add_argument("--spacy-model", help="Spacy model enabling /lemmatize_sentences (e.g. es_core_news_sm)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--batch-window", type=float, default=5.0, help="Micro-batch window, in milliseconds")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1, help="Number of tagging worker threads")
+    parser.add_argument("--sentence-cache-size", type=int, default=0,
+                        help="Number of sentences whose lemmas are cached (default: no cache)")
+    parser.add_argument("--sentence-cache-ttl", type=float, help="Expiration of cached sentences, in seconds")
+    parser.add_argument("--metrics", action="store_true", help="Record metrics, exposed in /metrics")
+    args = parser.parse_args()
+    _frequency_lists = {}
+    for _arg in args.frequency_list:
+        _lang, _sep, _path = _arg.partition("=")
+        if not _sep or not _path:
+            parser.error("--frequency-list must be LANG=PATH, not '{}'".format(_arg))
+        _frequency_lists[_lang] = _path
+    if args.lexicon_format == "tiered":
+        _missing = [_lang for _lang in args.langs if _lang not in _frequency_lists]
+        if len(_missing) > 0:
+            parser.error("The tiered lexicon format requires a --frequency-list for: {}".format(", ".join(_missing)))
+    logging.basicConfig(level=logging.INFO)
+
+    _metrics = Metrics() if args.metrics else None
+    _lemmatizers = {}
+    for _lang in args.langs:
+        logging.info("Loading {}".format(_lang))
+        _hot_words = None
+        if _lang in _frequency_lists:
+            _hot_words = read_frequency_list(_frequency_lists[_lang], args.hot_size)
+        _lemmatizers[_lang] = DictionaryLemmatizer(_lang, lexicon_format=args.lexicon_format, metrics=_metrics,
+                                                   hot_words=_hot_words, hot_size=args.hot_size)
+    _pos_lemmatizer = None
+    _nlp_model = None
+    if args.spacy_model:
+        import spacy
+        logging.info("Loading {}".format(args.spacy_model))
+        _nlp_model = spacy.load(args.spacy_model)
+        _pos_lemmatizer = SpanishPosLemmatizer(metrics=_metrics, sentence_cache_size=args.sentence_cache_size,
+                                               sentence_cache_ttl=args.sentence_cache_ttl)
+    _service = LemmatizationService(_lemmatizers, _pos_lemmatizer, _nlp_model, args.max_batch_size,
+                                    args.batch_window / 1000, args.workers, _metrics)
+    if args.unix_socket and os.path.exists(args.unix_socket):
+        os.remove(args.unix_socket)
+    _server = make_server(_service, args.host, args.port, args.unix_socket)
+    logging.info("Listening on {}".format(args.unix_socket or "{}:{}".format(args.host, args.port)))
+    try:
+        _server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _server.server_close()
+        _service.close()
@@ -0,0 +1,150 @@
+"""
+Lemma guessing for out of vocabulary words, based on suffix rewrite rules learned from a lemmatization list.
+
+Every (word, lemma) pair defines a rule: strip the last `strip` characters of the word and append a lemma suffix
+(e.g. "walked" -> "walk" is (2, "")). Rules are counted for the word suffixes made of the stripped characters plus
+up to `max_context` characters of context, and stored in a trie of reversed suffixes. An unknown word is lemmatized
+with the rules of the longest suffix of the word found in the trie.
+"""
+from typing import Dict, Iterable, List, Optional, Text, Tuple
+
+
+class _SuffixNode(object):
+    """
+    Node of the reversed suffix trie.
+    """
+
+    __slots__ = ("children", "rules")
+
+    def __init__(self):
+        self.children = None
+        self.rules = None
+
+
+class SuffixRuleGuesser(object):
+    """
+    Ranked lemma guesses for unknown words, by longest matching learned suffix rule.
+    """
+
+    def __init__(self, max_context: int = 3, min_stem: int = 2, max_rules: int = 5):
+        """
+        :param max_context: Maximum number of characters preceding the stripped suffix used to select rules.
+        :param min_stem: Minimum number of characters left after stripping.
+        :param max_rules: Maximum number of rules kept per suffix.
+        """
+        self.max_context = max_context
+        self.min_stem = min_stem
+        self.max_rules = max_rules
+        self._root = _SuffixNode()
+        self._root.rules = {}
+
+    @classmethod
+    def from_dict(cls, lemma_dict: Dict[Text, List[Text]], **kwargs) -> "SuffixRuleGuesser":
+        """
+        Learn rules from a dictionary of lemmas.
+        :param lemma_dict: Dictionary word -> list of lemmas.
+        :param kwargs: Constructor arguments.
+        :return: The trained guesser.
+        """
+        guesser = cls(**kwargs)
+        guesser.learn((word, lemma) for word, lemmas in lemma_dict.items() for lemma in lemmas)
+        guesser.compact()
+        return guesser
+
+    def learn(self, pairs: Iterable[Tuple[Text, Text]]):
+        """
+        Count the rules of a sequence of (word, lemma) pairs.
+        :param pairs:
+        """
+        for word, lemma in pairs:
+            p = 0
+            n = min(len(word), len(lemma))
+            while p < n and word[p] == lemma[p]:
+                p += 1
+            strip = len(word) - p
+            rule = (strip, lemma[p:])
+            max_length = min(len(word), strip + self.max_context)
+            node = self._root
+            for length in range(max_length + 1):
+                if length >= strip:
+                    self._count(node, rule)
+                if length == max_length:
+                    break
+                if node.children is None:
+                    node.children = {}
+                c = word[len(word) - 1 - length]
+                child = node.children.get(c)
+                if child is None:
+                    child = _SuffixNode()
+                    node.children[c] = child
+                node = child
+
+    @staticmethod
+    def _count(node: _SuffixNode, rule: Tuple[int, Text]):
+        if node.rules is None:
+            node.rules = {}
+        node.rules[rule] = node.rules.get(rule, 0) + 1
+
+    def compact(self):
+        """
+        Keep only the max_rules most frequent rules of every suffix, as tuples of (count, strip, lemma suffix)
+        sorted by decreasing count, and prune the suffixes which do not change the rules of their parent.
+        """
+        self._compact(self._root, None)
+
+    def _compact(self, node: _SuffixNode, parent_rules: Optional[Tuple]) -> bool:
+        """
+        :return: True if the node can be removed.
+        """
+        if node.rules is not None:
+            ranked = sorted(((count, rule[0], rule[1]) for rule, count in node.rules.items()),
+                            key=lambda r: (-r[0], r[1], r[2]))
+            node.rules = tuple(ranked[:self.max_rules])
+        rules = node.rules if node.rules is not None else parent_rules
+        if node.children is not None:
+            for c in list(node.children):
+                if self._compact(node.children[c], rules):
+                    del node.children[c]
+            if len(node.children) == 0:
+                node.children = None
+        return node.children is None and (node.rules is None or self._same_ranking(node.rules, parent_rules))
+
+    @staticmethod
+    def _same_ranking(rules: Tuple, other_rules: Optional[Tuple]) -> bool:
+        if other_rules is None or len(rules) != len(other_rules):
+            return False
+        return all(r[1:] == o[1:] for r, o in zip(rules, other_rules))
+
+    def guess(self, word: Text, max_guesses: int = 3) -> List[Tuple[Text, float]]:
+        """
+        :param word: Word to lemmatize.
+        :param max_guesses: Maximum number of guesses.
+        :return: List of (lemma, score) pairs sorted by decreasing score. The score is the relative frequency of
+          the rule among the rules of the matched suffix.
+        """
+        node = self._root
+        rules = node.rules
+        for i in range(len(word) - 1, -1, -1):
+            if node.children is None:
+                break
+            node = node.children.get(word[i])
+            if node is None:
+                break
+            if node.rules is not None and self._applicable(node.rules, word):
+                rules = node.rules
+        res = []
+        total = sum(r[0] for r in rules if len(word) - r[1] >= self.min_stem)
+        for count, strip, suffix in rules:
+            if len(word) - strip < self.min_stem:
+                continue
+            lemma = word[:len(word) - strip] + suffix
+            if all(lemma != l for l, _ in res):
+                res.append((lemma, count / total))
+            if len(res) >= max_guesses:
+                break
+        if len(res) == 0:
+            res.append((word, 1.0))
+        return res
+
+    def _applicable(self, rules: Tuple, word: Text) -> bool:
+        return any(len(word) - r[1] >= self.min_stem for r in rules)
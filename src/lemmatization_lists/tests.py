@@ -1,6 +1,40 @@
-from .lemmatizers import DictionaryLemmatizer
+from .benchmarks import compare, zipf_stream
+from .cache import LRUCache
+from .columnar import lemmatize_arrow, lemmatize_series
+from .dawg import LemmaDawg
+from .external_sort import external_sort, lemmatize_vocabulary, lemmatize_vocabulary_file
+from .fuzzy import DeletionIndex
+from .suffix_rules import SuffixRuleGuesser
+from .tiered import TieredLexicon, read_frequency_list
+from .tokenizer import Tokenizer
+from .vocabulary import LemmaVocabulary, UNKNOWN_ID
+from .util.FileProcessor import DocTreeVisitor, LemmatizerFileProcessor
+from .lemmatizers import DictionaryLemmatizer, LEMMATIZATION_LIST_EXTENSIONS, SpanishPosLemmatizer, _decompressing_stream, \
+    _normalize_word, get_available_languages, zstandard
+from .language_id import BloomFilter, LanguageIdentifier, LanguageRouter
+from .lists_processing import _normalize_chunk, list_process
+from .load_tests import StubTagger, percentiles, run_load_test
+from .metrics import Metrics
+from .server import LemmatizationService, MicroBatcher, make_server
+from .language.lemma.es.lemma_tools import SpanishCliticAnalyzer, SpanishLemmatizer, SpanishVerbDatabaseBuilder, \
+    SpanishVerbAnalyzer, SpanishVerbFlexioner
 
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import http.client
+import io
+import json
+import lzma
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import unidecode
 
 
 class TestDictionaryLemmatizer(unittest.TestCase):
@@ -21,5 +55,710 @@ class TestDictionaryLemmatizer(unittest.TestCase):
 
         self.assertEqual({"compra", "comprar"}, set(lemmatizer.get_lemma("compras")))
 
+    def test_shared_lists(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        self.assertIs(lemmatizer.lemma_dict["walked"], lemmatizer.lemma_dict["walking"])
+        self.assertIs(lemmatizer.lemma_dict_norm["walked"], lemmatizer.lemma_dict_norm["walking"])
+        # Callers get copies, which they may modify
+        lemmatizer.get_lemma("walked").append("x")
+        lemmatizer.get_lema_norm("walked").append("x")
+        self.assertEqual(["walk"], lemmatizer.get_lemma("walking"))
+        self.assertEqual(["walk"], lemmatizer.get_lema_norm("walking"))
+        self.assertIn("pl", DictionaryLemmatizer.SUPPORTED_LANGUAGES)
+
+    def test_normalize_word(self):
+        for word in ["Canción", "Žluťoučký", "straße", "Болгарски", "walked"]:
+            self.assertEqual(unidecode.unidecode(word.lower()), _normalize_word(word))
+
+
+@unittest.skipUnless("pl" in get_available_languages(), "Polish lemmatization list not available")
+class TestPolishLemmatizer(unittest.TestCase):
+
+    def test_dawg(self):
+        lemmatizer = DictionaryLemmatizer("pl", lexicon_format="dawg")
+        self.assertIn("kot", lemmatizer.get_lemma("Kotami"))
+        self.assertIn("zolw", lemmatizer.get_lema_norm("żółwie"))
+        self.assertEqual(["nieznanesłowo"], lemmatizer.get_lemma("nieznanesłowo"))
+
+
+class TestImportTime(unittest.TestCase):
+
+    # Seconds. Importing spacy alone takes longer than this.
+    IMPORT_TIME_BUDGET = 0.5
+
+    def test_import_time(self):
+        code = "import sys, time\n" \
+               "start_time = time.perf_counter()\n" \
+               "import lemmatization_lists.lemmatizers\n" \
+               "print(time.perf_counter() - start_time)\n" \
+               "print(' '.join(m for m in ('spacy', 'pkg_resources') if m in sys.modules))\n"
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", code], cwd=src_dir, check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout.split("\n")
+        self.assertEqual("", output[1])
+        self.assertLess(float(output[0]), self.IMPORT_TIME_BUDGET)
+
+
+class TestDeltas(unittest.TestCase):
+
+    def test_delta(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        lemmas = lemmatizer.get_lemma("walked")
+        lemmatizer.apply_delta([("+", "wálk", "walked"), ("-", "walk", "walked"), ("+", "frob", "frobbed")])
+        self.assertEqual(["walk"], lemmas)
+        self.assertEqual(["wálk"], lemmatizer.get_lemma("walked"))
+        self.assertEqual(["walk"], lemmatizer.get_lema_norm("walked"))
+        self.assertEqual(["frob"], lemmatizer.get_lemma("frobbed"))
+        self.assertEqual(["frob"], lemmatizer.get_lemma("frob"))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "delta.txt")
+            with open(path, "w") as f:
+                f.write("# Fixes\n-\tfrob\tfrobbed\n")
+            lemmatizer.apply_delta_file(path)
+        self.assertEqual(["frobbed"], lemmatizer.get_lemma("frobbed"))
+        self.assertNotIn("frobbed", lemmatizer.lemma_dict_norm)
+
+    def test_pickle(self):
+        lemmatizer = DictionaryLemmatizer("en", metrics=Metrics())
+        lemmatizer.apply_delta([("+", "frob", "frobbed")])
+        # Spawned processes (the default on macOS and Windows) receive pickled lemmatizers
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            self.assertEqual([["walk"], ["frob"]], list(executor.map(lemmatizer.get_lemma, ["walked", "frobbed"])))
+        copy = pickle.loads(pickle.dumps(lemmatizer))
+        copy.apply_delta([("+", "frob", "frobs")])
+        self.assertEqual(["frob"], copy.get_lemma("frobs"))
+        self.assertIsNone(copy.metrics)
+
+    def test_delta_fuzzy(self):
+        lemmatizer = DictionaryLemmatizer("en", fuzzy_distance=1)
+        self.assertEqual(["walk"], lemmatizer.get_lemma("walkedd"))
+        lemmatizer.apply_delta([("-", "walk", "walked")])
+        self.assertNotIn("walk", lemmatizer.get_lemma("walkedd"))
+        self.assertNotIn("walk", lemmatizer.get_lema_norm("walkedd"))
+
+    def _wait_for(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail("Timeout")
+
+    def test_watch_delta_file(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        size = len(lemmatizer.lemma_dict)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "delta.txt")
+            with open(path, "w") as f:
+                f.write("+\tfrob\tfrobbed\n+\tfrob\tfrobbing\n-\twalk\twalked\n")
+            lemmatizer.watch_delta_file(path, interval=0.01)
+            try:
+                self._wait_for(lambda: lemmatizer.get_lemma("frobbing") == ["frob"])
+                self.assertEqual(["frob"], lemmatizer.get_lemma("frobbed"))
+                self.assertEqual(size + 3 - 1, len(lemmatizer.lemma_dict))
+                # Removed lines are reverted
+                with open(path + ".tmp", "w") as f:
+                    f.write("+\tfrob\tfrobbed\n")
+                os.replace(path + ".tmp", path)
+                self._wait_for(lambda: lemmatizer.get_lemma("walked") == ["walk"])
+                self.assertEqual(["frobbing"], lemmatizer.get_lemma("frobbing"))
+                self.assertEqual(["frob"], lemmatizer.get_lemma("frobbed"))
+                self.assertEqual(["frob"], lemmatizer.get_lema_norm("frob"))
+                self.assertEqual(size + 2, len(lemmatizer.lemma_dict))
+                self.assertEqual(set(lemmatizer.lemma_dict), set(lemmatizer.lemma_dict.keys()))
+                with self.assertLogs(level="WARNING") as logs:
+                    os.remove(path)
+                    time.sleep(0.1)
+                self.assertEqual(1, len(logs.output))
+            finally:
+                lemmatizer.stop_watching()
+
+
+class TestExternalSort(unittest.TestCase):
+
+    def test_external_sort(self):
+        records = [(str(i % 97), str(i)) for i in range(1000)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertEqual(sorted(records), list(external_sort(records, tmp_dir, buffer_size=2000, fan_in=3)))
+            self.assertEqual([], os.listdir(tmp_dir))
+
+    def test_lemmatize_vocabulary(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        tokens = ["walking", "Walked", "children", "walking", "UNKNOWNWORD", "n't", "was"]
+        res = list(lemmatize_vocabulary("en", tokens, buffer_size=1 << 16, fan_in=4))
+        self.assertEqual(sorted(set(tokens), key=lambda t: (t.lower(), t)), [t for t, _ in res])
+        for token, lemmas in res:
+            self.assertEqual(lemmatizer.get_lemma(token), lemmas)
+        self.assertEqual([("a\rb", ["a\rb"]), ("c", ["c"])], list(lemmatize_vocabulary("en", ["c", "a\rb"])))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            src_file = os.path.join(tmp_dir, "vocabulary.txt")
+            dest_file = os.path.join(tmp_dir, "lemmas.tsv")
+            with open(src_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(tokens) + "\n")
+            self.assertEqual(6, lemmatize_vocabulary_file("en", src_file, dest_file, tmp_dir, buffer_size=1 << 16))
+            with open(dest_file, "r", encoding="utf-8") as f:
+                self.assertIn("children\tchild\n", f.readlines())
+
+
+class TestColumnar(unittest.TestCase):
+
+    def test_columnar(self):
+        import pandas as pd
+        import pyarrow
+        lemmatizer = DictionaryLemmatizer("en")
+        tokens = ["walked", None, "Children", "walked", "fell"]
+
+        lemmas = lemmatize_series(lemmatizer, pd.Series(tokens, index=list("abcde")))
+        self.assertEqual("category", lemmas.dtype.name)
+        self.assertEqual(["walk", "child", "fall"], list(lemmas.cat.categories))
+        self.assertEqual(["walk", None, "child", "walk", "fall"], [None if pd.isna(l) else l for l in lemmas])
+        self.assertEqual(list("abcde"), list(lemmas.index))
+        self.assertEqual([["walk"], None, ["child"], ["walk"], ["fall", "fell"]],
+                         lemmatize_series(lemmatizer, pd.Series(tokens), output="list").tolist())
+
+        lemmas = lemmatize_arrow(lemmatizer, pyarrow.chunked_array([tokens[:2], tokens[2:]]))
+        self.assertIsInstance(lemmas, pyarrow.DictionaryArray)
+        self.assertEqual(["walk", None, "child", "walk", "fall"], lemmas.to_pylist())
+        self.assertEqual([["walk"], None, ["child"], ["walk"], ["fall", "fell"]],
+                         lemmatize_arrow(lemmatizer, pyarrow.array(tokens), output="list").to_pylist())
+
+
+class TestTokenizer(unittest.TestCase):
+
+    def test_tokenizer(self):
+        self.assertEqual([("Hello", 0, 5, True), (",", 5, 6, False), ("well-known", 7, 17, True), ("!", 17, 18, False)],
+                         Tokenizer().tokenize("Hello, well-known!"))
+        self.assertEqual(["I", "do", "n't", "think", "the", "bo'sun", "'s", "here"],
+                         Tokenizer("en").words("I don't think the bo'sun's here"))
+        self.assertEqual(["L'", "home", "va", "d'", "allí"], Tokenizer("ast").words("L'home va d'allí"))
+
+    def test_lemmatize_text(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        tokens = lemmatizer.lemmatize_text("The children don't walk.", punctuation=True)
+        self.assertEqual(["the", "child", "do", "not", "walk", "."], [t.lemmas[0] for t in tokens])
+        self.assertEqual((13, 15), (tokens[2].start, tokens[2].end))
+        self.assertEqual(["child"], [t.lemmas[0] for t in lemmatizer.lemmatize_text("Children!")])
+
+
+class TestLanguageIdentifier(unittest.TestCase):
+
+    def test_bloom_filter(self):
+        bloom_filter = BloomFilter.for_capacity(1000, 0.01)
+        bloom_filter.add(str(i) for i in range(1000))
+        self.assertTrue(all(str(i) in bloom_filter for i in range(1000)))
+        self.assertLess(sum("x{}".format(i) in bloom_filter for i in range(1000)), 30)
+
+    def test_identify(self):
+        identifier = LanguageIdentifier.build(["cs", "en", "hu"])
+        self.assertEqual("en", identifier.identify("The children walked home"))
+        self.assertEqual("hu", identifier.identify("Jó napot kívánok, hogy van?"))
+        self.assertIsNone(identifier.identify("Qwzx vbnm", min_score=0.5))
+
+        f = io.BytesIO()
+        identifier.write(f)
+        f.seek(0)
+        router = LanguageRouter(LanguageIdentifier.read(f))
+        lang, tokens = router.lemmatize_text("The children walked home")
+        self.assertEqual(("en", ["the", "child", "walk", "home"]), (lang, [t.lemmas[0] for t in tokens]))
+
+
+class TestLemmaVocabulary(unittest.TestCase):
+
+    def test_vocabulary(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        vocabulary = LemmaVocabulary(lemmatizer)
+        fall, fell = vocabulary.get_lemma_ids("fell")
+        self.assertEqual(["fall", "fell"], vocabulary.decode_array([fall, fell]))
+        self.assertIs(vocabulary.get_lemma_ids("fell"), vocabulary.get_lemma_ids("Fell"))
+        self.assertEqual(UNKNOWN_ID, vocabulary.get_lemma_id("UNKNOWNWORD"))
+        self.assertEqual([fall, vocabulary.get_id("walk"), UNKNOWN_ID],
+                         vocabulary.get_lemma_id_array(["fell", "walked", "UNKNOWNWORD"]).tolist())
+        ids, offsets = vocabulary.get_all_lemma_id_arrays(["fell", "walked"])
+        self.assertEqual(([fall, fell, vocabulary.get_id("walk")], [0, 2, 3]), (ids.tolist(), offsets.tolist()))
+
+        growing = LemmaVocabulary(lemmatizer, add_unknown=True)
+        unknown_id = growing.get_lemma_id("UNKNOWNWORD")
+        self.assertEqual((len(vocabulary), "unknownword"), (unknown_id, growing.decode(unknown_id)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "vocabulary-en.txt")
+            growing.save(path)
+            loaded = LemmaVocabulary.load(path, lemmatizer)
+        self.assertEqual((fall, fell), loaded.get_lemma_ids("fell"))
+        self.assertEqual(unknown_id, loaded.get_id("unknownword"))
+
+
+class TestTieredLexicon(unittest.TestCase):
+
+    def test_tiers(self):
+        lemma_dict = {"compras": ["compra", "comprar"], "compramos": ["comprar"], "puertas": ["puerta"]}
+        lexicon = TieredLexicon.from_lexicon(LemmaDawg.from_dict(lemma_dict), ["puertas", "sillas", "compras"], 2)
+        self.assertEqual({"puertas": ["puerta"]}, lexicon.hot)
+        self.assertEqual(["puerta"], lexicon.get("puertas"))
+        self.assertEqual(["compra", "comprar"], lexicon.get("compras"))
+        self.assertIsNone(lexicon.get("sillas"))
+        self.assertEqual({"hot": 1, "cold": 1, "miss": 1}, lexicon.tier_stats())
+        self.assertEqual(lemma_dict, dict(lexicon))
+
+    def test_tiered_lemmatizer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "frequencies.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("The 1000\nwalked 20\nchildren 10\n")
+            hot_words = read_frequency_list(path, 2)
+        self.assertEqual(["the", "walked"], hot_words)
+        lemmatizer = DictionaryLemmatizer("en")
+        metrics = Metrics()
+        tiered_lemmatizer = DictionaryLemmatizer("en", lexicon_format="tiered", hot_words=hot_words, metrics=metrics)
+        for word in ["walked", "Walked", "children", "UNKNOWNWORD"]:
+            self.assertEqual(lemmatizer.get_lemma(word), tiered_lemmatizer.get_lemma(word))
+            self.assertEqual(lemmatizer.get_lema_norm(word), tiered_lemmatizer.get_lema_norm(word))
+        self.assertEqual({"hot": 2, "cold": 1, "miss": 1}, tiered_lemmatizer.lemma_dict.tier_stats())
+        counters = metrics.snapshot()["counters"]["dictionary_tier_lookups_total"]
+        self.assertIn({"labels": {"lang": "en", "lexicon": "lemmas", "tier": "hot"}, "value": 2}, counters)
+        self.assertIn('lemmatization_dictionary_tier_lookups_total{lang="en",lexicon="normalized",tier="miss"} 1',
+                      metrics.to_prometheus())
+        with self.assertRaises(ValueError):
+            DictionaryLemmatizer("en", lexicon_format="tiered")
+
+
+class TestLemmaDawg(unittest.TestCase):
+
+    def test_dawg(self):
+        lemma_dict = {
+            "compras": ["compra", "comprar"],
+            "compramos": ["comprar"],
+            "comprar": ["comprar"],
+            "puertas": ["puerta"],
+            "fui": ["ser", "ir"]
+        }
+        dawg = LemmaDawg.from_dict(lemma_dict)
+        self.assertEqual(lemma_dict, dict(dawg))
+        self.assertEqual(["ser", "ir"], dawg.get("fui"))
+        self.assertIsNone(dawg.get("compr"))
+        self.assertNotIn("compra", dawg)
+        self.assertEqual(["compramos", "comprar", "compras"], list(dawg.keys_with_prefix("compr")))
+
+        f = io.BytesIO()
+        dawg.write(f)
+        f.seek(0)
+        self.assertEqual(lemma_dict, dict(LemmaDawg.read(f)))
+
+    def test_dawg_lemmatizer(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        dawg_lemmatizer = DictionaryLemmatizer("en", lexicon_format="dawg")
+        for word in ["walked", "Walking", "better", "UNKNOWNWORD"]:
+            self.assertEqual(lemmatizer.get_lemma(word), dawg_lemmatizer.get_lemma(word))
+            self.assertEqual(lemmatizer.get_lema_norm(word), dawg_lemmatizer.get_lema_norm(word))
+
+
+class TestFuzzyLookup(unittest.TestCase):
+
+    def test_deletion_index(self):
+        index = DeletionIndex(["puerta", "puertas", "compra", "comprar", "abracadabra"], max_distance=2)
+        self.assertEqual([("puerta", 1), ("puertas", 2)], index.lookup("puerra"))
+        self.assertEqual([("compra", 1), ("comprar", 1)], index.lookup_closest("compar"))
+        self.assertEqual([("abracadabra", 2)], index.lookup("abarcadabar"))
+        self.assertEqual([], index.lookup("xyz"))
+
+    def test_fuzzy_lemmatizer(self):
+        lemmatizer = DictionaryLemmatizer("en", fuzzy_distance=2)
+        self.assertEqual(["university"], lemmatizer.get_lemma("univresities"))
+        self.assertEqual(["child"], lemmatizer.get_lemma("Chilrden"))
+        self.assertEqual(("walking", 1), lemmatizer.get_fuzzy_candidates("walkking")[0])
+        self.assertEqual(["qqqqqqqq"], lemmatizer.get_lemma("QQQQQQQQ"))
+
+
+class TestSuffixRuleGuesser(unittest.TestCase):
+
+    def test_guesser(self):
+        lemma_dict = {
+            "cantamos": ["cantar"],
+            "bailamos": ["bailar"],
+            "comemos": ["comer"],
+            "puertas": ["puerta"],
+            "casas": ["casa"]
+        }
+        guesser = SuffixRuleGuesser.from_dict(lemma_dict)
+        self.assertEqual("saltar", guesser.guess("saltamos")[0][0])
+        self.assertEqual([("beber", 1.0)], guesser.guess("bebemos", 1))
+        self.assertEqual([("mesa", 1.0)], guesser.guess("mesas"))
+
+    def test_guesser_lemmatizer(self):
+        lemmatizer = DictionaryLemmatizer("en", oov_guesses=2)
+        self.assertEqual("glorp", lemmatizer.get_lemma("Glorping")[0])
+        self.assertEqual(["walk"], lemmatizer.get_lemma("walked"))
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_zipf_stream(self):
+        words = ["a", "b", "c", "d"]
+        stream = zipf_stream(words, 1000, seed=1)
+        self.assertEqual(stream, zipf_stream(words, 1000, seed=1))
+        self.assertTrue(set(stream) <= set(words))
+
+    def test_compare(self):
+        baseline = {"results": {"dictionary_en": {"load_s": 1.0, "get_lemma_per_s": 1000.0, "entries": 10}}}
+        results = {"results": {"dictionary_en": {"load_s": 1.1, "get_lemma_per_s": 700.0, "entries": 20}}}
+        regressions = compare(results, baseline, tolerance=0.2)
+        self.assertEqual(1, len(regressions))
+        self.assertTrue(regressions[0].startswith("dictionary_en.get_lemma_per_s"))
+
+
+class TestLoadTests(unittest.TestCase):
+
+    def test_percentiles(self):
+        latencies = [i / 1000 for i in range(1, 101)]
+        self.assertEqual({"p50_ms": 50, "p95_ms": 95, "p99_ms": 99, "max_ms": 100},
+                         {k: round(v) for k, v in percentiles(latencies).items() if k != "mean_ms"})
+
+    def test_stub_tagger(self):
+        self.assertEqual([("Compramos", "VERB"), ("puertas", "NOUN"), (".", "NOUN")],
+                         [(str(t), t.pos_) for t in StubTagger()("Compramos puertas.")])
+
+    def test_load_test(self):
+        for mode in ("threads", "asyncio"):
+            report = run_load_test("dictionary", ["The children walked home."], mode, concurrency=2,
+                                   num_requests=50, lang="en")
+            self.assertEqual(50, report["requests"])
+            self.assertLessEqual(report["latency"]["p50_ms"], report["latency"]["p99_ms"])
+            self.assertGreater(len(report["rss_mb"]), 0)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_metrics(self):
+        metrics = Metrics()
+        metrics.inc("lookups_total", labels=(("lang", "en"),))
+        metrics.inc("lookups_total", 2, labels=(("lang", "en"),))
+        metrics.observe("lookup_seconds", 0.002)
+        metrics.cache_access("sentences", True)
+        metrics.cache_access("sentences", False)
+        snapshot = metrics.snapshot()
+        self.assertEqual([{"labels": {"lang": "en"}, "value": 3}], snapshot["counters"]["lookups_total"])
+        self.assertEqual(1, snapshot["histograms"]["lookup_seconds"][0]["count"])
+        self.assertEqual({"sentences": 0.5}, snapshot["cache_hit_rates"])
+        prometheus = metrics.to_prometheus()
+        self.assertIn('lemmatization_lookups_total{lang="en"} 3', prometheus)
+        self.assertIn('lemmatization_lookup_seconds_bucket{le="0.001"} 0', prometheus)
+        self.assertIn('lemmatization_lookup_seconds_bucket{le="+Inf"} 1', prometheus)
+
+    def test_dictionary_metrics(self):
+        metrics = Metrics()
+        lemmatizer = DictionaryLemmatizer("en", metrics=metrics)
+        for word in ["walked", "UNKNOWNWORD", "left"]:
+            lemmatizer.get_lemma(word)
+        counters = {name: series[0]["value"] for name, series in metrics.snapshot()["counters"].items()}
+        self.assertEqual({"dictionary_lookups_total": 3, "dictionary_oov_total": 1, "dictionary_ambiguous_total": 1},
+                         counters)
+
+
+class TestListsProcessing(unittest.TestCase):
+
+    def test_normalize_chunk(self):
+        lines = ["\ufeffcanción\tcanciones\r\n".encode("utf-8"), "\r\n".encode("utf-8"),
+                 "comer\tcomí\r\n".encode("utf-8")]
+        self.assertEqual([("canciones", "{:012d}".format(20), "canción", "canciones", "cancion"),
+                          ("canción", "{:012d}".format(21), "canción", "cancion", "cancion"),
+                          ("comí", "{:012d}".format(24), "comer", "comi", "comer"),
+                          ("comer", "{:012d}".format(25), "comer", "comer", "comer")],
+                         _normalize_chunk((10, lines)))
+
+    def test_list_process(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        with tempfile.TemporaryDirectory() as dir_name:
+            for in_memory in (None, False):
+                dest_file = os.path.join(dir_name, "lemmatization-norm-en.txt")
+                list_process("en", dest_file, buffer_size=1 << 20, tmp_dir=dir_name, in_memory=in_memory)
+                res = {}
+                with open(dest_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        lemma, word = line.rstrip("\n").split("\t")
+                        res.setdefault(word, []).append(lemma)
+                self.assertEqual(lemmatizer.lemma_dict_norm, res)
+
+
+class TestCompressedLists(unittest.TestCase):
+
+    def test_decompressing_stream(self):
+        content = "\ufeffcanción\tcanciones\r\ncomer\tcomí\r\n".encode("utf-8")
+        compressed = {
+            ".txt": content,
+            ".txt.gz": gzip.compress(content),
+            ".txt.xz": lzma.compress(content)
+        }
+        if zstandard is not None:
+            compressed[".txt.zst"] = zstandard.ZstdCompressor().compress(content)
+        for extension, data in compressed.items():
+            self.assertIn(extension, LEMMATIZATION_LIST_EXTENSIONS)
+            with _decompressing_stream(io.BytesIO(data), extension) as f:
+                self.assertEqual(content.splitlines(keepends=True), list(f))
+
+
+class TestDocTreeVisitor(unittest.TestCase):
+
+    def test_lemmatize_tree(self):
+        lemmatizer = DictionaryLemmatizer("en")
+        with tempfile.TemporaryDirectory() as input_dir, tempfile.TemporaryDirectory() as output_dir:
+            os.makedirs(os.path.join(input_dir, "a", "b"))
+            for path, text in [("1.txt", "The children walked."), ("a/2.txt", "Mice"), ("a/b/3.txt", "was\nbetter"),
+                               ("a/b/b.bin", "ignored"), ("a/5.TXT", "Geese")]:
+                with open(os.path.join(input_dir, path), "w") as f:
+                    f.write(text)
+            # Symbolic links are not followed
+            os.symlink(input_dir, os.path.join(input_dir, "a", "b", "loop"))
+            for workers, use_processes in [(1, False), (4, False), (2, True)]:
+                visitor = DocTreeVisitor(input_dir, inc=[r".*\.bin$", r"(?i).*\.txt$"], exc=[r".*/(\w)/\1\.bin$"],
+                                         workers=workers, use_processes=use_processes)
+                stats = visitor.process(LemmatizerFileProcessor(lemmatizer, input_dir, output_dir))
+                self.assertEqual((4, 1, 0), (stats["processed"], stats["excluded"], stats["errors"]))
+            with open(os.path.join(output_dir, "1.txt.lemmas")) as f:
+                self.assertEqual("the child walk\n", f.read())
+            with open(os.path.join(output_dir, "a", "b", "3.txt.lemmas")) as f:
+                self.assertEqual("be\nbetter\n", f.read())
+
+
+@unittest.skipUnless("es" in get_available_languages(), "Spanish lemmatization list not available")
+class TestSpanishPosLemmatizer(unittest.TestCase):
+
+    def test_sentence_cache(self):
+        metrics = Metrics()
+        lemmatizer = SpanishPosLemmatizer(metrics=metrics, sentence_cache_size=10)
+        tagger = StubTagger()
+        res = lemmatizer.get_lemma_sentence("ponme la última llamada", tagger)
+        self.assertEqual(res, lemmatizer.get_lemma_sentence(" ponme  la última llamada", tagger))
+        batch = lemmatizer.get_lemma_sentences(["pon la tele", "ponme la última llamada", "pon la tele"], tagger)
+        self.assertEqual([batch[0], res, batch[0]], batch)
+        self.assertEqual(0.4, metrics.snapshot()["cache_hit_rates"]["sentences"])
+        self.assertEqual(2, metrics.snapshot()["counters"]["sentences_total"][0]["value"])
+
+
+class TestSpanishVerbFlexioner(unittest.TestCase):
+
+    def test_paradigm(self):
+        flexioner = SpanishVerbFlexioner()
+        paradigm = flexioner.get_paradigm("cantar")
+        self.assertIs(paradigm, flexioner.get_paradigm("cantar"))
+        self.assertEqual(list(paradigm.forms), flexioner.get_all_simple_forms("cantar"))
+        self.assertEqual("cantamos", paradigm.get_form(1, False, 1, 1))
+        self.assertEqual(("cantara", "cantase"), paradigm.get_forms(1, True, 2, 2))
+        self.assertEqual("cantando", paradigm.get_non_personal_form(2))
+        self.assertEqual("pon", flexioner.get_form("poner", 2, True, 1, 3))
+        self.assertIsNone(flexioner.get_paradigm("puerta"))
+
+        table = flexioner.export_paradigms(["cantar", "temer", "puerta"])
+        self.assertEqual(2 * len(paradigm.forms), len(table))
+        row = table[(table["infinitive"] == "temer") & (table["type"] == 3)][0]
+        self.assertEqual(("temido", 0), (row["form"], row["person"]))
+
+
+class TestSpanishVerbAnalyzer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.db_file_path = os.path.join(cls.tmp_dir.name, "spanish_verbs.db")
+        SpanishVerbDatabaseBuilder(cls.db_file_path).insert_data(["cantar", "temer", "lavar", "poner"])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_accent_insensitive(self):
+        analyzer = SpanishVerbAnalyzer(self.db_file_path)
+
+        self.assertEqual({"cantara"}, {f.verb for f in analyzer.get_verb_info("cantara")})
+        self.assertEqual({"cantara", "cantará"},
+                         {f.verb for f in analyzer.get_verb_info("cantara", accent_insensitive=True)})
+        self.assertEqual({"cantar"}, {f.infinitive for f in analyzer.get_verb_info("CANTARA", True)})
+
+        self.assertTrue(analyzer.get_verb_info("temido")[0].is_participle)
+        self.assertFalse(analyzer.is_verb("puerta", accent_insensitive=True))
+        analyzer.close()
+
+    def test_clitics(self):
+        analyzer = SpanishCliticAnalyzer(self.db_file_path)
+
+        form = analyzer.analyze("Cántamelo")[0]
+        self.assertEqual(("canta", ["me", "lo"], "cantar"), (form.verbal_form.verb, form.clitics, form.lemma))
+        form = analyzer.analyze("cantándoselo")[0]
+        self.assertEqual(("cantando", ["se", "lo"], "cantar"), (form.verbal_form.verb, form.clitics, form.lemma))
+        self.assertEqual(["me"], analyzer.analyze("ponme")[0].clitics)
+        self.assertEqual("temer", analyzer.analyze("temerlo")[0].infinitive)
+        # Readings without clitics come first
+        self.assertEqual([], analyzer.analyze("cantase")[0].clitics)
+        self.assertEqual([], analyzer.analyze("puertas"))
+
+        self.assertEqual({"lavarse"}, {f.lemma for f in analyzer.analyze("lávate")})
+        self.assertEqual({"lavarse"}, {f.lemma for f in analyzer.analyze("lavémonos")})
+        self.assertTrue(analyzer.analyze("lavarse")[0].is_pronominal)
+        self.assertFalse(analyzer.analyze("temerlo")[0].is_pronominal)
+        analyzer.close()
+
+        self.assertTrue(SpanishCliticAnalyzer.has_clitics("cántamelo"))
+        self.assertFalse(SpanishCliticAnalyzer.has_clitics("puertas"))
+        self.assertEqual(["cantar"], SpanishLemmatizer(db_file_path=self.db_file_path).get_lemmas("cántamelo", "VERB"))
+        self.assertNotEqual(["cantar"], SpanishLemmatizer(db_file_path=self.db_file_path, clitics=False).get_lemmas(
+            "cántamelo", "VERB"))
+
+
+class TestServer(unittest.TestCase):
+
+    class _UpperLemmatizer(object):
+
+        def __init__(self):
+            self.batches = []
+
+        def get_lemma_sentences(self, sentences, nlp_model, batch_size):
+            self.batches.append(len(sentences))
+            return [[[w.upper()] for w in s.split()] for s in sentences]
+
+    def test_micro_batcher(self):
+        lemmatizer = self._UpperLemmatizer()
+        batcher = MicroBatcher(lambda items: lemmatizer.get_lemma_sentences(items, None, 8), max_batch_size=8,
+                               batch_window=0.05)
+        futures = [batcher.submit("a b {}".format(i)) for i in range(10)]
+        self.assertEqual([["A"], ["B"], ["3"]], futures[3].result())
+        batcher.close()
+        self.assertEqual([8, 2], lemmatizer.batches)
+
+        batcher = MicroBatcher(lambda items: items[1:], batch_window=0.05)
+        futures = [batcher.submit(i) for i in range(3)]
+        for future in futures:
+            self.assertRaises(RuntimeError, future.result, 1)
+        batcher.close()
+
+    def test_server(self):
+        lemmatizer = self._UpperLemmatizer()
+        service = LemmatizationService({"en": DictionaryLemmatizer("en")}, lemmatizer, batch_window=0.05)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        connection = http.client.HTTPConnection(*server.server_address)
+
+        def request(method, path, body=None):
+            connection.request(method, path, None if body is None else json.dumps(body))
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+
+        self.assertEqual(["en"], request("GET", "/health")[1]["languages"])
+        self.assertEqual((200, {"lemmas": [["walk"], ["unknownword"]]}),
+                         request("POST", "/lemmatize", {"lang": "en", "words": ["Walked", "UNKNOWNWORD"]}))
+        self.assertEqual(400, request("POST", "/lemmatize", {"lang": "xx", "words": []})[0])
+        self.assertEqual(400, request("POST", "/lemmatize", {"lang": "en", "words": ["walked", 1]})[0])
+        self.assertEqual({"lemmas": [[["A"]], [["B"], ["C"]]]},
+                         request("POST", "/lemmatize_sentences", {"sentences": ["a", "b c"]})[1])
+        self.assertEqual([2], lemmatizer.batches)
+        self.assertEqual(400, request("POST", "/lemmatize_sentences", {"sentences": "a b"})[0])
+        service.sentence_batcher.process_batch = lambda sentences: []
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(500, request("POST", "/lemmatize_sentences", {"sentences": ["a"]})[0])
+        connection.close()
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def _read_test_db_config():
+    import configparser
+    config_parser = configparser.ConfigParser()
+    config_parser.read(os.environ["LEMMATIZATION_LISTS_TEST_DB_CONFIG"])
+    return config_parser
+
+
+_skip_without_db = unittest.skipUnless(
+    os.environ.get("LEMMATIZATION_LISTS_TEST_DB_CONFIG"),
+    "Set LEMMATIZATION_LISTS_TEST_DB_CONFIG to a config file with a [DATABASE] section")
+
+
+@_skip_without_db
+class TestDBConnectionManager(unittest.TestCase):
+
+    def test_pool(self):
+        from .database.mysql_utils import DBConnectionManagerInitializer, PoolExhaustedError
+        config_parser = _read_test_db_config()
+        config_parser.set("DATABASE", "max_connections", "2")
+        config_parser.set("DATABASE", "ping_interval", "0")
+        manager = DBConnectionManagerInitializer(config_parser)
+
+        with manager.pooled_connection() as c1:
+            c2 = manager.checkout_connection()
+            self.assertRaises(PoolExhaustedError, manager.checkout_connection, 0.1)
+            manager.release_connection(c2)
+        with manager.pooled_connection() as c3:
+            # The most recently released connection is reused, after a ping
+            self.assertIs(c1, c3)
+            cursor = c3.cursor()
+            cursor.execute("SELECT 1")
+            self.assertEqual((1,), cursor.fetchone())
+
+        stats = manager.get_pool_stats()
+        self.assertEqual((2, 2, 0), (stats["open"], stats["idle"], stats["in_use"]))
+        self.assertEqual((2, 1, 0), (stats["created"], stats["timeouts"], stats["failed_pings"]))
+        self.assertGreaterEqual(stats["pings"], 1)
+
+        # The shared connection stays checked out
+        shared = manager.get_connection()
+        self.assertIs(shared, manager.get_connection())
+        self.assertEqual(1, manager.get_pool_stats()["in_use"])
+        manager.close_all()
+        self.assertEqual(0, manager.get_pool_stats()["open"])
+
+
+@_skip_without_db
+class TestMySQLLexiconStore(unittest.TestCase):
+
+    def test_store(self):
+        from .database.lexicon_store import MySQLLexiconStore
+        from .database.mysql_utils import DBConnectionManagerInitializer
+        metrics = Metrics()
+        store = MySQLLexiconStore(DBConnectionManagerInitializer(_read_test_db_config()), "test", batch_size=2,
+                                  metrics=metrics)
+        self.assertEqual(8, store.load([("walk", "walked"), ("walk", "walks"), ("saw", "saw"), ("see", "saw"),
+                                        ("café", "cafés")]))
+
+        self.assertEqual([["walk"], ["saw", "see"], ["unknown"], ["walk"]],
+                         store.get_lemmas(["Walked", "saw", "unknown", "walks"]))
+        self.assertEqual(["walk"], store.get_lemma("walked"))
+        self.assertEqual({"lexicon": 0.2}, metrics.snapshot()["cache_hit_rates"])
+        self.assertEqual(["cafe"], store.get_lema_norm("cafes"))
+        self.assertEqual(["walk", "walked", "walks"], store.get_forms("walk"))
+        # Results are copies of the cached lists
+        store.get_lemma("walked").append("x")
+        self.assertEqual(["walk"], store.get_lemma("walked"))
+        # Characters outside the BMP
+        store.load([("🙂", "🙂🙂")])
+        self.assertEqual(["🙂"], store.get_lemma("🙂🙂"))
+
+
+class TestLexiconStoreNormalization(unittest.TestCase):
+
+    def test_select_lemmas_norm(self):
+        from .database.lexicon_store import MySQLLexiconStore
+        lemmatizer = DictionaryLemmatizer("en")
+        rows = [(word, _normalize_word(word), _normalize_word(lemma), word_order)
+                for word_order, (word, lemmas) in enumerate(lemmatizer.lemma_dict.items()) for lemma in lemmas]
+        rows.sort(key=lambda r: r[0])
+        words = list(lemmatizer.lemma_dict_norm)
+        self.assertEqual(lemmatizer.lemma_dict_norm, MySQLLexiconStore._select_lemmas_norm(rows, words))
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_cache(self):
+        cache = LRUCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.put("c", 3)
+        # "b" was the least recently used entry
+        self.assertEqual((True, False, True), ("a" in cache, "b" in cache, "c" in cache))
+        self.assertIsNone(cache.get("b"))
+
+        cache = LRUCache(ttl=0.0)
+        cache.put("a", 1)
+        self.assertEqual("missing", cache.get("a", "missing"))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,115 @@
+"""
+Frequency tiered lemma dictionaries.
+
+Token frequencies are very skewed: a few thousand forms make up most of any text. A TieredLexicon keeps the lemmas of
+the most frequent forms (the hot tier) in a small Python dictionary, and the whole lexicon (the cold tier) in a
+compact LemmaDawg which is only walked on hot tier misses.
+
+Frequency lists are not bundled: they are plain text files with one word per line (any further fields, such as
+counts, are ignored), most frequent first.
+"""
+from collections.abc import Mapping
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Text
+import sys
+
+
+def read_frequency_list(path: Text, size: int) -> List[Text]:
+    """
+    :param path: Frequency list: one word per line, most frequent first.
+    :param size: Number of words to read.
+    :return: The size most frequent words, lower cased.
+    """
+    res = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) > 0:
+                res.append(fields[0].lower())
+                if len(res) >= size:
+                    break
+    return res
+
+
+class TieredLexicon(Mapping):
+    """
+    Read only mapping word -> list of lemmas with a hot and a cold tier.
+
+    `get` counts the lookups answered by each tier (`hot_hits`, `cold_hits`) and the misses. Counters are updated
+    without locking, so they may lose a few increments under concurrent lookups.
+    """
+
+    def __init__(self, hot: Dict[Text, List[Text]], cold: Mapping):
+        """
+        :param hot: Lemmas of the most frequent words. They must also be in the cold tier.
+        :param cold: Whole lexicon (e.g. a LemmaDawg).
+        """
+        self.hot = hot
+        self.cold = cold
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_lexicon(cls, cold: Mapping, hot_words: Iterable[Text], hot_size: int = 10000) -> "TieredLexicon":
+        """
+        :param cold: Whole lexicon.
+        :param hot_words: Words by decreasing frequency. Words not in the lexicon are skipped.
+        :param hot_size: Maximum number of words in the hot tier.
+        :return: The tiered lexicon.
+        """
+        hot = {}
+        shared = {}
+        for word in islice(hot_words, hot_size):
+            lemmas = cold.get(word)
+            if lemmas is not None:
+                hot[word] = shared.setdefault(tuple(lemmas), lemmas)
+        return cls(hot, cold)
+
+    def get(self, word: Text, default=None):
+        lemmas = self.hot.get(word)
+        if lemmas is not None:
+            self.hot_hits += 1
+            return lemmas
+        lemmas = self.cold.get(word)
+        if lemmas is None:
+            self.misses += 1
+            return default
+        self.cold_hits += 1
+        return lemmas
+
+    def __getitem__(self, word: Text) -> List[Text]:
+        lemmas = self.hot.get(word)
+        if lemmas is None:
+            return self.cold[word]
+        return lemmas
+
+    def __contains__(self, word) -> bool:
+        return word in self.hot or word in self.cold
+
+    def __iter__(self) -> Iterator[Text]:
+        return iter(self.cold)
+
+    def __len__(self) -> int:
+        return len(self.cold)
+
+    def tier_stats(self) -> Dict[Text, int]:
+        """
+        :return: Number of lookups answered by each tier, and of misses.
+        """
+        return {"hot": self.hot_hits, "cold": self.cold_hits, "miss": self.misses}
+
+    def reset_stats(self):
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.misses = 0
+
+    def memory_size(self) -> int:
+        """
+        :return: Approximate size in bytes of both tiers.
+        """
+        hot_lists = {id(l): l for l in self.hot.values()}.values()
+        hot_size = sys.getsizeof(self.hot) + sum(sys.getsizeof(w) for w in self.hot) \
+            + sum(sys.getsizeof(l) + sum(sys.getsizeof(lemma) for lemma in l) for l in hot_lists)
+        cold_size = self.cold.memory_size() if hasattr(self.cold, "memory_size") else sys.getsizeof(self.cold)
+        return hot_size + cold_size
@@ -0,0 +1,81 @@
+"""
+Fast regular expression tokenizer, so that text can be lemmatized without a tagger.
+
+Words are runs of word characters, joined by inner hyphens and apostrophes ("well-known", "bo'sun"). A few
+languages split apostrophes the way their lemmatization lists do:
+
+- English clitics are separate tokens ("don't" -> "do" "n't", "it's" -> "it" "'s").
+- Elided articles and prepositions of Romance languages are separate tokens ("l'home" -> "l'" "home").
+
+Any other non space character is a punctuation token.
+"""
+from typing import Iterator, List, NamedTuple, Optional, Text
+import re
+
+
+_DEFAULT_WORD_PATTERN = r"\w+(?:[-'’]\w+)*"
+
+_WORD_PATTERNS = {
+    "en": r"\w+(?=n['’]t\b)|n['’]t\b|['’](?:s|m|d|ll|re|ve)\b|\w+(?:-\w+|['’](?!(?:s|m|d|ll|re|ve|t)\b)\w+)*",
+}
+
+# Languages with elided words ending in an apostrophe
+_ELISION_LANGUAGES = ["ast", "ca", "fr", "it"]
+for _lang in _ELISION_LANGUAGES:
+    _WORD_PATTERNS[_lang] = r"\w+['’](?=\w)|\w+(?:-\w+)*"
+
+
+class Token(NamedTuple):
+    text: Text
+    start: int
+    end: int
+    is_word: bool
+
+
+class Tokenizer(object):
+    """
+    Language aware regular expression tokenizer.
+    """
+
+    def __init__(self, lang: Optional[Text] = None, punctuation: bool = True):
+        """
+        :param lang: Language. Languages without specific rules use the default ones.
+        :param punctuation: Whether to return punctuation tokens.
+        """
+        self.lang = lang
+        self.punctuation = punctuation
+        word_pattern = _WORD_PATTERNS.get(lang, _DEFAULT_WORD_PATTERN)
+        self._word_reg_exp = re.compile(word_pattern, re.IGNORECASE)
+        if punctuation:
+            self._reg_exp = re.compile(r"(?P<word>{})|[^\w\s]".format(word_pattern), re.IGNORECASE)
+        else:
+            self._reg_exp = self._word_reg_exp
+
+    def iter_tokens(self, text: Text) -> Iterator[Token]:
+        """
+        :param text:
+        :return: Iterator over the tokens of the text.
+        """
+        if self.punctuation:
+            for m in self._reg_exp.finditer(text):
+                yield Token(m.group(), m.start(), m.end(), m.lastgroup is not None)
+        else:
+            for m in self._reg_exp.finditer(text):
+                yield Token(m.group(), m.start(), m.end(), True)
+
+    def tokenize(self, text: Text) -> List[Token]:
+        """
+        :param text:
+        :return: List of tokens with their character offsets.
+        """
+        if self.punctuation:
+            return [Token(m.group(), m.start(), m.end(), m.lastgroup is not None)
+                    for m in self._reg_exp.finditer(text)]
+        return [Token(m.group(), m.start(), m.end(), True) for m in self._reg_exp.finditer(text)]
+
+    def words(self, text: Text) -> List[Text]:
+        """
+        :param text:
+        :return: List of the words of the text (no offsets, fastest).
+        """
+        return self._word_reg_exp.findall(text)
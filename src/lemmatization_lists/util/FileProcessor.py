@@ -1,6 +1,23 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import logging
 import re
 import os
+import time
+
+from lemmatization_lists.tokenizer import Tokenizer
+
+# File processor of a worker process, set once by _init_worker so that it is not pickled for every file
+_worker_file_processor = None
+
+
+def _init_worker(file_processor):
+    global _worker_file_processor
+    _worker_file_processor = file_processor
+
+
+def _process_in_worker(dir_name, file_name):
+    return _worker_file_processor.process(dir_name, file_name)
+
 
 class FileProcessor:
     '''
@@ -19,12 +36,75 @@ class FileProcessor:
         return None
 
 
+class LemmatizerFileProcessor(FileProcessor):
+    '''
+    File processor that lemmatizes text files with a shared lemmatizer (e.g. DictionaryLemmatizer).
+    Every word is replaced by its lemmas; line structure is preserved.
+    '''
+
+    def __init__(self, lemmatizer, input_dir=None, output_dir=None, suffix='.lemmas', all_lemmas=False,
+                 encoding='utf-8'):
+        '''
+        :param lemmatizer: Lemmatizer providing get_lemma(word). It is shared by all the files (and threads).
+        :param input_dir: Root of the processed tree. Output files mirror the tree structure below it.
+        :param output_dir: Directory to write the lemmatized files to. If None, nothing is written.
+        :param suffix: Suffix appended to the names of the output files.
+        :param all_lemmas: If True, every word is replaced by all its lemmas joined by '|'. Otherwise by the first.
+        :param encoding: Encoding of input and output files.
+        '''
+        self.lemmatizer = lemmatizer
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.suffix = suffix
+        self.all_lemmas = all_lemmas
+        self.encoding = encoding
+        # Tokenization rules of the language of the lemmatizer, if known
+        self.tokenizer = Tokenizer(getattr(lemmatizer, 'lang', None), punctuation=False)
+
+    def lemmatize_line(self, line):
+        '''
+        :param line:
+        :return: List with the lemmas of every word of the line.
+        '''
+        res = []
+        for word in self.tokenizer.words(line):
+            lemmas = self.lemmatizer.get_lemma(word)
+            res.append('|'.join(lemmas) if self.all_lemmas else lemmas[0])
+        return res
+
+    def process(self, dir_name, file_name):
+        '''
+        Lemmatize one file.
+        :return: Number of lemmatized words.
+        '''
+        num_words = 0
+        out = None
+        if self.output_dir is not None:
+            rel_dir = os.path.relpath(dir_name, self.input_dir) if self.input_dir is not None else ''
+            out_dir = os.path.join(self.output_dir, rel_dir)
+            os.makedirs(out_dir, exist_ok=True)
+            out = open(os.path.join(out_dir, file_name + self.suffix), 'w', encoding=self.encoding)
+        try:
+            with open(os.path.join(dir_name, file_name), 'r', encoding=self.encoding, errors='replace') as f:
+                for line in f:
+                    lemmas = self.lemmatize_line(line)
+                    num_words += len(lemmas)
+                    if out is not None:
+                        out.write(' '.join(lemmas) + '\n')
+        finally:
+            if out is not None:
+                out.close()
+        return num_words
+
+
 class DocTreeVisitor:
     '''
     This class executes a given function on the files conatined in a directory (including all its subdirectories).
     This class implements the the Visitor design pattern.
+    Files may be processed in parallel by a pool of threads or processes.
     '''
-    def __init__(self, dirpath, inc=None, exc=None):
+    def __init__(self, dirpath, inc=None, exc=None, workers=1, use_processes=False, max_pending=None,
+                 progress_interval=10.0):
         '''
         :param dirpath: Path of the directory to explore.
         :param inc: List of regular expressions matching the files to be included into
@@ -32,51 +112,123 @@ class DocTreeVisitor:
         :param exc: List of regular expressions matching the files to be excluded into
          the processing among those cosidered as included in the inc parameter. If left
          None, no file will be excluded.
+        :param workers: Number of files processed in parallel. With 1, files are processed in the calling thread.
+        :param use_processes: Use a process pool instead of a thread pool (the file processor must be picklable; it
+         is sent once to every worker process).
+        :param max_pending: Maximum number of files submitted to the pool and not yet processed (default
+         2 * workers). The tree walk waits when the limit is reached, which bounds memory on huge trees.
+        :param progress_interval: Seconds between progress log messages.
         '''
         self.dirpath = dirpath
         self.inc = inc
         self.exc = exc
+        self.workers = workers
+        self.use_processes = use_processes
+        self.max_pending = max_pending if max_pending is not None else 2 * workers
+        self.progress_interval = progress_interval
 
-        self.inc_reg_exps = []
-        if inc:
-            for e in inc:
-                self.inc_reg_exps.append(re.compile(e))
-        self.exc_reg_exps = []
-        if exc:
-            for e in exc:
-                self.exc_reg_exps.append(re.compile(e))
+        # Regular expressions are compiled once (and separately: inline flags and backreferences are per expression)
+        self.inc_reg_exps = [re.compile(e) for e in inc] if inc else None
+        self.exc_reg_exps = [re.compile(e) for e in exc] if exc else None
 
 
     def process(self, file_processor):
-        os.path.walk(self.dirpath, self._process_dir, file_processor)
-
-    def _process_dir(self, file_processor, dirname, names):
-        for name in names:
-            path = os.path.join(dirname, name)
-            if os.path.isfile(path):
-                if self._matches(path):
+        '''
+        Process all the matching files of the tree.
+        :param file_processor: FileProcessor.
+        :return: Dictionary with processing statistics: number of processed, excluded and failed files, processed
+         bytes and elapsed seconds.
+        '''
+        stats = {'processed': 0, 'excluded': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0}
+        start_time = time.time()
+        self._last_progress = start_time
+        if self.workers <= 1:
+            for dirname, name, size in self._walk(stats):
+                try:
                     file_processor.process(dirname, name)
-                else:
-                    logging.log(logging.INFO, 'File excluded: ' + path)
-
-    def _matches(self, s):
-        if len(self.inc_reg_exps) > 0:
-            # Check wether file should not be included
-            not_included = True
-            for r in self.inc_reg_exps:
-                if (r.match(s) != None):
-                    not_included = False
-                    break
-            if not_included:
-                return False
-
-        if len(self.exc_reg_exps) > 0:
-            # Check wether file should be excluded
-            for r in self.exc_reg_exps:
-                if (r.match(s) != None):
-                    return False
-        return True
+                    stats['processed'] += 1
+                    stats['bytes'] += size
+                except Exception:
+                    logging.exception('Error processing ' + os.path.join(dirname, name))
+                    stats['errors'] += 1
+                self._log_progress(stats, start_time)
+        else:
+            if self.use_processes:
+                executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                               initargs=(file_processor,))
+                process = _process_in_worker
+            else:
+                executor = ThreadPoolExecutor(max_workers=self.workers)
+                process = file_processor.process
+            with executor:
+                pending = {}
+                for dirname, name, size in self._walk(stats):
+                    if len(pending) >= self.max_pending:
+                        self._collect(pending, stats, start_time)
+                    future = executor.submit(process, dirname, name)
+                    pending[future] = (dirname, name, size)
+                while len(pending) > 0:
+                    self._collect(pending, stats, start_time)
+        stats['seconds'] = time.time() - start_time
+        self._log_progress(stats, start_time, force=True)
+        return stats
 
+    def _collect(self, pending, stats, start_time):
+        '''
+        Wait for at least one pending file to be processed.
+        '''
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            dirname, name, size = pending.pop(future)
+            try:
+                future.result()
+                stats['processed'] += 1
+                stats['bytes'] += size
+            except Exception:
+                logging.exception('Error processing ' + os.path.join(dirname, name))
+                stats['errors'] += 1
+        self._log_progress(stats, start_time)
 
+    def _log_progress(self, stats, start_time, force=False):
+        now = time.time()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        elapsed = max(now - start_time, 1e-9)
+        logging.info('Processed {} files ({} errors), {:.1f} files/s, {:.2f} MB/s'.format(
+            stats['processed'], stats['errors'], stats['processed'] / elapsed,
+            stats['bytes'] / (1024 * 1024) / elapsed))
 
+    def _walk(self, stats):
+        '''
+        :return: Generator of (dirname, name, size) of the matching files of the tree.
+        '''
+        stack = [self.dirpath]
+        while len(stack) > 0:
+            dirname = stack.pop()
+            try:
+                entries = sorted(os.scandir(dirname), key=lambda e: e.name)
+            except OSError:
+                logging.exception('Cannot read directory ' + dirname)
+                continue
+            subdirs = []
+            for entry in entries:
+                # Symbolic links are not followed, as in os.walk: they could make cycles
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    if self._matches(entry.path):
+                        yield dirname, entry.name, entry.stat().st_size
+                    else:
+                        stats['excluded'] += 1
+                        logging.log(logging.INFO, 'File excluded: ' + entry.path)
+            stack.extend(reversed(subdirs))
 
+    def _matches(self, s):
+        if self.inc_reg_exps is not None and not any(e.match(s) for e in self.inc_reg_exps):
+            # File should not be included
+            return False
+        if self.exc_reg_exps is not None and any(e.match(s) for e in self.exc_reg_exps):
+            # File should be excluded
+            return False
+        return True
@@ -0,0 +1,155 @@
+"""
+Integer lemma ids, for indexers which turn lemmas into term ids right away.
+
+A LemmaVocabulary assigns a stable id to every lemma of a DictionaryLemmatizer (ids of a fresh vocabulary follow the
+lexicographic order of the lemmas; a saved vocabulary keeps its ids and appends new lemmas at the end) and maps every
+word to the tuple of the ids of its lemmas, so lookups return precomputed objects instead of allocating lists of
+strings.
+"""
+from typing import Iterable, List, Optional, Text, Tuple
+import threading
+import numpy as np
+
+from .lemmatizers import DictionaryLemmatizer
+
+
+# Id of the words without lemmas, when the vocabulary does not grow with unknown words.
+UNKNOWN_ID = -1
+
+
+class LemmaVocabulary(object):
+    """
+    Bidirectional mapping between lemmas and integer ids, with word -> lemma ids lookups.
+    """
+
+    def __init__(self, lemmatizer: DictionaryLemmatizer, lemmas: Optional[List[Text]] = None,
+                 normalized: bool = False, add_unknown: bool = False):
+        """
+        :param lemmatizer: Lemmatizer whose dictionary is indexed.
+        :param lemmas: Known lemmas, in id order (e.g. a saved vocabulary). Lemmas of the dictionary not in this list
+          get the following ids, in lexicographic order.
+        :param normalized: Whether to index normalized lemmas (as returned by get_lema_norm).
+        :param add_unknown: If True, unknown words are added to the vocabulary as their own lemma (as get_lemma
+          does); otherwise their id is UNKNOWN_ID.
+        """
+        self.lang = lemmatizer.lang
+        self.normalized = normalized
+        self.add_unknown = add_unknown
+        self.lemmas = list(lemmas) if lemmas is not None else []
+        self._lemma_ids = {lemma: i for i, lemma in enumerate(self.lemmas)}
+        lemma_dict = lemmatizer.lemma_dict_norm if normalized else lemmatizer.lemma_dict
+        new_lemmas = {lemma for lemmas in lemma_dict.values() for lemma in lemmas if lemma not in self._lemma_ids}
+        for lemma in sorted(new_lemmas):
+            self._lemma_ids[lemma] = len(self.lemmas)
+            self.lemmas.append(lemma)
+        # Equal tuples of ids are shared: most words have the same lemmas as others
+        shared = {}
+        self._word_ids = {}
+        for word, lemmas in lemma_dict.items():
+            ids = tuple(self._lemma_ids[lemma] for lemma in lemmas)
+            self._word_ids[word] = shared.setdefault(ids, ids)
+        self._first_ids = {word: ids[0] for word, ids in self._word_ids.items()}
+        self._unknown_ids = (UNKNOWN_ID,)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lemmas)
+
+    def _add_word(self, word: Text) -> Tuple[int, ...]:
+        with self._lock:
+            ids = self._word_ids.get(word)
+            if ids is None:
+                lemma_id = self._lemma_ids.get(word)
+                if lemma_id is None:
+                    lemma_id = len(self.lemmas)
+                    self.lemmas.append(word)
+                    self._lemma_ids[word] = lemma_id
+                ids = (lemma_id,)
+                self._first_ids[word] = lemma_id
+                self._word_ids[word] = ids
+            return ids
+
+    def get_lemma_ids(self, word: Text) -> Tuple[int, ...]:
+        """
+        :param word:
+        :return: Ids of the lemmas of the word (in the order of DictionaryLemmatizer.get_lemma). The tuple is shared
+          by all the words with the same lemmas.
+        """
+        _word = word.lower()
+        ids = self._word_ids.get(_word)
+        if ids is None:
+            return self._add_word(_word) if self.add_unknown else self._unknown_ids
+        return ids
+
+    def get_lemma_id(self, word: Text) -> int:
+        """
+        :param word:
+        :return: Id of the first lemma of the word.
+        """
+        return self.get_lemma_ids(word)[0]
+
+    def get_lemma_id_array(self, words: Iterable[Text]) -> np.ndarray:
+        """
+        :param words:
+        :return: int32 array with the id of the first lemma of every word.
+        """
+        if self.add_unknown:
+            get_lemma_ids = self.get_lemma_ids
+            return np.fromiter((get_lemma_ids(w)[0] for w in words), dtype=np.int32)
+        first_ids = self._first_ids
+        return np.fromiter((first_ids.get(w.lower(), UNKNOWN_ID) for w in words), dtype=np.int32)
+
+    def get_all_lemma_id_arrays(self, words: Iterable[Text]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :param words:
+        :return: (ids, offsets) int32 arrays: the ids of the lemmas of the i-th word are
+          ids[offsets[i]:offsets[i + 1]].
+        """
+        ids = []
+        offsets = [0]
+        for w in words:
+            ids.extend(self.get_lemma_ids(w))
+            offsets.append(len(ids))
+        return np.array(ids, dtype=np.int32), np.array(offsets, dtype=np.int32)
+
+    def get_id(self, lemma: Text) -> int:
+        """
+        :param lemma:
+        :return: Id of the lemma, or UNKNOWN_ID.
+        """
+        return self._lemma_ids.get(lemma, UNKNOWN_ID)
+
+    def decode(self, lemma_id: int) -> Optional[Text]:
+        """
+        :param lemma_id:
+        :return: The lemma with the given id, or None for UNKNOWN_ID.
+        """
+        return None if lemma_id == UNKNOWN_ID else self.lemmas[lemma_id]
+
+    def decode_array(self, lemma_ids: Iterable[int]) -> List[Optional[Text]]:
+        return [self.decode(int(i)) for i in lemma_ids]
+
+    def save(self, path: Text):
+        """
+        Save the lemmas, one per line in id order, so that a vocabulary loaded later keeps the same ids.
+        :param path:
+        """
+        with self._lock:
+            lemmas = list(self.lemmas)
+        with open(path, "w", encoding="utf-8") as f:
+            for lemma in lemmas:
+                f.write(lemma)
+                f.write("\n")
+
+    @classmethod
+    def load(cls, path: Text, lemmatizer: DictionaryLemmatizer, **kwargs) -> "LemmaVocabulary":
+        """
+        Load a vocabulary saved with `save`.
+        :param path:
+        :param lemmatizer: Lemmatizer whose dictionary is indexed. Its lemmas not in the saved vocabulary get new ids.
+        :param kwargs: Other constructor arguments.
+        :return: The vocabulary.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            lemmas = [l.rstrip("\n") for l in f]
+        return cls(lemmatizer, lemmas, **kwargs)